@@ -34,6 +34,11 @@ AWS_STORAGE_BUCKET_NAME = os.environ.get("AWS_STORAGE_BUCKET_NAME")
 AWS_S3_REGION_NAME = os.environ.get("AWS_S3_REGION_NAME")
 AWS_S3_FILE_OVERWRITE = True
 AWS_DEFAULT_ACL = None
+# Image URLs end up in cached fragments for hours (recipes/templatetags/recipe_fragments.py), they must
+# not be presigned URLs expiring after an hour: the images are served from a public-read bucket or a
+# custom domain (CloudFront) in front of it
+AWS_QUERYSTRING_AUTH = False
+AWS_S3_CUSTOM_DOMAIN = os.environ.get("AWS_S3_CUSTOM_DOMAIN")
 
 AWS_S3_OBJECT_PARAMETERS ={
     'CacheControl': 'max-age=0,' # File will not be cached
@@ -137,7 +142,7 @@ WSGI_APPLICATION = 'mywebsite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 CACHES = {
-    "default": {
+    "redis": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache"
     }
 }
@@ -203,11 +208,75 @@ except ValueError as e:
 # Redis configuration
 redis_url = os.getenv("REDIS_URL") if ENV == 'development' else os.getenv("LOCAL_REDIS_URL")
 if redis_url:
-    CACHES['default']['LOCATION'] = redis_url
+    CACHES['redis'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': redis_url,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # One pool per process, shared by its threads, the pub/sub listener and the filter sets
+            'CONNECTION_POOL_KWARGS': {
+                'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+                'health_check_interval': 30,
+                # A retry doubles the wait, the circuit breaker of the default cache handles failures
+                'retry_on_timeout': False,
+            },
+            # Short, so a slow Redis costs little before the circuit opens
+            'SOCKET_CONNECT_TIMEOUT': float(os.getenv('REDIS_CONNECT_TIMEOUT', 0.5)),
+            'SOCKET_TIMEOUT': float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.5)),
+            # Cached values are tuples of plain values, which pickle loads the fastest
+            'SERIALIZER': 'django_redis.serializers.pickle.PickleSerializer',
+            'PICKLE_VERSION': -1,
+            'COMPRESSOR': 'utils.helpers.redis_compressors.ThresholdCompressor',
+        },
+    }
+
+# Redis behind a circuit breaker falling back to a bounded per-worker cache
+# (see utils/helpers/resilient_cache.py): an outage slows pages down instead of failing them
+CACHES['default'] = {
+    'BACKEND': 'utils.helpers.resilient_cache.ResilientCache',
+    'LOCATION': 'redis',
+    'OPTIONS': {
+        'FAILURE_THRESHOLD': 5,
+        'PROBE_INTERVAL': 5,
+        'FALLBACK_MAX_ENTRIES': int(os.getenv('FALLBACK_CACHE_MAX_ENTRIES', 5000)),
+        'FALLBACK_TIMEOUT': 60,
+    },
+}
+
+# Per-worker LRU in front of the Redis cache for the recipe pages, lists and fragments
+# (see utils/helpers/two_tier_cache.py), local copies are dropped through Redis pub/sub
+CACHES['two_tier'] = {
+    'BACKEND': 'utils.helpers.two_tier_cache.TwoTierCache',
+    'LOCATION': 'default',
+    'OPTIONS': {
+        'MAX_BYTES': int(os.getenv('LOCAL_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+        'MAX_ITEM_BYTES': 1024 * 1024,
+        'LOCAL_TIMEOUT': 60,
+    },
+}
+RECIPE_CACHE_ALIAS = 'two_tier'
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+# Sessions are read from the cache but stored in the database, a Redis outage logs nobody out
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_CACHE_ALIAS = 'default'
 
+# Recipe search backend: 'database' (full-text/trigram queries) or 'memory' (per-worker inverted index,
+# see recipes/indexes/recipe_index.py), the database queries stay the fallback path
+RECIPE_SEARCH_BACKEND = os.getenv('RECIPE_SEARCH_BACKEND', 'database')
+
+# Responsive variants of the recipe images (see recipes/handlers/image_variants.py): the widths encoded
+# per ladder and the 'sizes' attribute telling browsers how wide the ladder's images are displayed.
+# Formats are listed by preference, AVIF is smaller but much slower to encode.
+RECIPE_IMAGE_LADDERS = {
+    'card': {'widths': (320, 480, 640, 960), 'sizes': '(max-width: 767px) 100vw, (max-width: 1399px) 33vw, 440px'},
+    'detail': {'widths': (480, 768, 1024, 1280), 'sizes': '(max-width: 767px) 100vw, (max-width: 1399px) 50vw, 660px'},
+    'hero': {'widths': (1280, 1920), 'sizes': '100vw'},
+}
+RECIPE_IMAGE_FORMATS = ['avif', 'webp', 'jpeg'] if os.getenv('RECIPE_IMAGE_AVIF') == 'true' else ['webp', 'jpeg']
+# Whether a 'manage.py process_images' worker runs the image jobs (see recipes/handlers/image_jobs.py).
+# Without one, the web process runs them itself once the upload is committed.
+RECIPE_IMAGE_WORKER = os.getenv('RECIPE_IMAGE_WORKER') == 'true'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -6,6 +6,8 @@ from django.conf.urls.static import static
 from django.conf import settings
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 
+from utils.views import CacheStatsView
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,6 +16,7 @@ urlpatterns = [
     path('', include('users.urls')),
     path('', include('django.contrib.auth.urls')),
     path('recipes/', include('recipes.urls')),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache_stats'),
 ]
 
 
@@ -1,5 +1,7 @@
 from django import forms
 from ..models.recipe_models import Category, Tag
+from ..handlers.pagination import SORT_CHOICES
+from ..handlers.filter_handler import MATCH_ANY, MATCH_ALL
 
 class RecipeFilterForm(forms.Form):
     category = forms.ModelMultipleChoiceField(
@@ -12,3 +14,24 @@ class RecipeFilterForm(forms.Form):
         required=False,
         widget=forms.CheckboxSelectMultiple
     )
+    match = forms.ChoiceField(
+        choices=[(MATCH_ANY, 'Match any selected'), (MATCH_ALL, 'Match all selected')],
+        required=False,
+        initial=MATCH_ANY,
+        widget=forms.RadioSelect
+    )
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def set_facet_counts(self, counts: dict) -> None:
+        """
+        Shows the number of matching recipes next to every option, e.g. "Breakfast (312)".
+        ``counts`` is the {facet: {option_id: count}} mapping from filter_handler.get_facet_counts.
+        """
+        for facet, facet_counts in counts.items():
+            self.fields[facet].label_from_instance = (
+                lambda option, facet_counts=facet_counts: f'{option.name} ({facet_counts.get(option.pk, 0)})'
+            )
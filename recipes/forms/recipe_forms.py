@@ -1,8 +1,9 @@
 from django import forms
+from django.urls import reverse_lazy
 
 from ..models.recipe_models import Recipe, RecipeIngredient, RecipeStep, RecipeSubRecipe, RecipeImage
 from django.forms import BaseInlineFormSet, ModelForm, inlineformset_factory
-from utils.models import ImageHandler
+from ..handlers import image_jobs
 
 class RecipeFormManager:
     """Manager class to handle formset creation and management"""
@@ -45,11 +46,14 @@ class RecipeImageForm(ModelForm):
         if not self.cleaned_data.get('picture') and 'picture' not in self.changed_data:
             return None  # No image to save
         instance = super().save(commit=False)
+        uploaded = 'picture' in self.changed_data and bool(instance.picture)
+        if uploaded:
+            # Converted and thumbnailed by the image workers, see handlers/image_jobs.py
+            instance.status = RecipeImage.PENDING
         if commit:
             instance.save()
-            # Create thumbnail after saving the image
-            if instance.picture:
-                instance.create_thumbnail(instance.thumbnail_folder, instance.picture.name, size=(600, 600))
+            if uploaded:
+                image_jobs.enqueue(instance)
         return instance
     
     def is_valid(self) -> bool:
@@ -58,12 +62,6 @@ class RecipeImageForm(ModelForm):
         return super().is_valid()
     
 
-    def clean_picture(self):
-        picture = self.cleaned_data.get('picture')
-        if picture and not picture.name.endswith('.jpeg') and not picture.name.endswith('.jpg'):
-            picture = ImageHandler.convert_to_jpeg(picture)
-        return picture
-
 class RecipeForm(ModelForm):
     class Meta:
         model = Recipe
@@ -217,6 +215,12 @@ class RecipeIngredientForm(ModelForm):
     class Meta:
         model = RecipeIngredient
         fields = ['name', 'quantity', 'measurement']
+        widgets = {
+            'name': forms.TextInput(attrs={
+                'autocomplete': 'off',
+                'data-autocomplete-url': reverse_lazy('recipes:ingredient_autocomplete'),
+            })
+        }
         error_messages = {
             'name': {
                 'reuired': "Please enter the ingredient name — it can’t be blank."
@@ -0,0 +1,135 @@
+"""
+Invalidation of the cached recipe values, driven by the model signals in ``recipes/signals.py``.
+
+Signals only record what changed. When the transaction commits, the changed recipes are expanded
+to every recipe whose cached values show them, and all of those recipe groups and the affected
+lists are invalidated in one batch (see ``CacheManager.invalidate_many``).
+
+What the cached values of a recipe (detail page, forms, card) show:
+
+- its own row, ingredients, steps, images, categories and tags;
+- the ingredients and steps of its sub recipes, recursively: every change reaches the ancestors
+  of the recipe through the sub recipe graph;
+- the titles of its parent recipes: a change to the recipe row reaches its direct sub recipes.
+
+The lists show recipe rows of their kind and are filtered by categories and tags, and are sorted
+by ``last_updated``: a change to an ingredient, step or image touches its recipe, in one
+``update()`` for the whole transaction, which also invalidates the list of its kind. Search
+results and facet counts depend on the same rows and are invalidated with them.
+"""
+import threading
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models.recipe_models import Recipe, RecipeSubRecipe
+from .cache_manager import cache_manager, LIST_NAMESPACES, SEARCH_NAMESPACES
+
+
+def related_recipe_ids(recipe_ids, parent_ids=()) -> set:
+    """
+    Returns the recipes, their ancestors and the direct sub recipes of ``parent_ids``.
+    """
+    links = RecipeSubRecipe.objects.values_list
+    affected = set(recipe_ids)
+    if parent_ids:
+        affected.update(links('sub_recipe_id', flat=True).filter(parent_recipe_id__in=parent_ids))
+    frontier = set(recipe_ids)
+    while frontier:
+        parents = set(links('parent_recipe_id', flat=True).filter(sub_recipe_id__in=frontier))
+        # The graph has no cycles (see RecipeSubRecipe.clean), but a bad row must not loop forever
+        frontier = parents - affected
+        affected |= frontier
+    return affected
+
+
+def touch_recipes(recipe_ids) -> set:
+    """
+    Bumps ``last_updated`` of the recipes in one query, which sends no signal.
+    Returns the list namespaces showing them.
+    """
+    recipes = Recipe.objects.filter(pk__in=recipe_ids)
+    kinds = set(recipes.values_list('is_sub_recipe', flat=True))
+    recipes.update(last_updated=timezone.now())
+    return {LIST_NAMESPACES[kind] for kind in kinds}
+
+
+class InvalidationBatch:
+    """
+    Changes recorded since the last flush.
+    """
+
+    def __init__(self):
+        self.recipe_ids = set()
+        # Recipes whose row changed: the detail pages of their sub recipes list them
+        self.parent_ids = set()
+        self.namespaces = set()
+        # Recipes whose content changed: their last_updated is touched
+        self.touched_ids = set()
+
+    def __bool__(self):
+        return bool(self.recipe_ids or self.namespaces or self.touched_ids)
+
+
+class CacheDependencyTracker:
+    """
+    Collects the changes of the current thread and invalidates them once committed.
+
+    Every change schedules a flush on commit, the first one of a transaction invalidates all of
+    its changes and the others find nothing left to do. Outside of a transaction every change is
+    invalidated at once. Changes of a rolled back transaction are invalidated with the next flush,
+    which is harmless.
+    """
+
+    def __init__(self, manager=None, using=None):
+        self.manager = manager or cache_manager
+        self.using = using
+        self._local = threading.local()
+
+    @property
+    def batch(self) -> InvalidationBatch:
+        if not hasattr(self._local, 'batch'):
+            self._local.batch = InvalidationBatch()
+        return self._local.batch
+
+    def _record(self, recipe_ids=(), parent_ids=(), namespaces=(), touched_ids=()) -> None:
+        batch = self.batch
+        batch.recipe_ids.update(recipe_id for recipe_id in recipe_ids if recipe_id is not None)
+        batch.parent_ids.update(recipe_id for recipe_id in parent_ids if recipe_id is not None)
+        batch.namespaces.update(namespaces)
+        batch.touched_ids.update(recipe_id for recipe_id in touched_ids if recipe_id is not None)
+        transaction.on_commit(self.flush, using=self.using)
+
+    def flush(self) -> None:
+        batch, self._local.batch = self.batch, InvalidationBatch()
+        if not batch:
+            return
+        if batch.touched_ids:
+            batch.namespaces.update(touch_recipes(batch.touched_ids))
+        recipe_ids = related_recipe_ids(batch.recipe_ids, batch.parent_ids) if batch.recipe_ids else set()
+        self.manager.invalidate_many(recipe_ids, batch.namespaces)
+
+    def recipe_changed(self, recipe_id, is_sub_recipe: bool) -> None:
+        """
+        The recipe row was saved or deleted.
+        """
+        self._record([recipe_id], parent_ids=[recipe_id],
+                     namespaces=[LIST_NAMESPACES[bool(is_sub_recipe)], *SEARCH_NAMESPACES])
+
+    def recipe_content_changed(self, recipe_id) -> None:
+        """
+        An ingredient, step or image of the recipe was saved or deleted.
+        """
+        self._record([recipe_id], namespaces=SEARCH_NAMESPACES, touched_ids=[recipe_id])
+
+    def sub_recipe_link_changed(self, parent_recipe_id, sub_recipe_id) -> None:
+        self._record([parent_recipe_id, sub_recipe_id])
+
+    def filters_changed(self, recipe_ids=()) -> None:
+        """
+        Categories or tags changed, on the given recipes or on their own.
+        """
+        self._record(recipe_ids, namespaces=[*LIST_NAMESPACES.values(), *SEARCH_NAMESPACES])
+
+
+dependency_tracker = CacheDependencyTracker()
@@ -0,0 +1,373 @@
+"""
+Single entry point for the cached recipe pages, forms, list ids and cards.
+
+Keys are built as ``cache:<namespace>:<schema>:<namespace generation>:<parts>``, with
+``.r<recipe id>.<group generation>`` appended to the keys belonging to one recipe:
+
+- the schema is a fingerprint of the fields of the recipes models plus ``SCHEMA_VERSION``, so a
+  deploy changing a model (or the shape of a cached value) reads new keys instead of unpickling
+  objects of the previous schema;
+- the namespace generation invalidates a whole namespace (the recipe list for instance);
+- the group generation invalidates every key of one recipe (detail page, ingredients and steps
+  forms) in one call, without enumerating them.
+
+Every namespace has its own timeout, listed in ``NAMESPACES``. A cache outage never breaks a page:
+reads miss and values are computed as if nothing was cached.
+
+Values are stored as ``(value, expires at, compute seconds)`` and outlive their timeout by
+``STALE_TIMEOUT`` seconds, which is what lets ``get_or_set`` refresh them without stampedes.
+"""
+import functools
+import hashlib
+import math
+import random
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.template import engines
+
+from utils.helpers.single_flight import SingleFlight
+
+# Bump when a cached value changes shape without any model change
+SCHEMA_VERSION = 7
+# Seconds an expired value is still served while a single request recomputes it
+STALE_TIMEOUT = 60 * 5
+# Above 1 refreshes earlier, below 1 later (see CacheManager._is_fresh)
+XFETCH_BETA = 1.0
+REFRESH_LOCK_TIMEOUT = 30
+
+
+class CachePolicy(NamedTuple):
+    timeout: int
+    # Keys of the namespace belong to a recipe group
+    per_recipe: bool = False
+    # Keys embed the namespace generation; key-based namespaces never need to be invalidated
+    generational: bool = True
+
+
+NAMESPACES = {
+    'recipe_list': CachePolicy(60 * 60),
+    'sub_recipe_list': CachePolicy(60 * 15),
+    'recipe_detail': CachePolicy(60 * 60, per_recipe=True),
+    'sub_recipe_detail': CachePolicy(60 * 60, per_recipe=True),
+    'ingredients_form': CachePolicy(60 * 60, per_recipe=True),
+    'steps_form': CachePolicy(60 * 60, per_recipe=True),
+    # Slim card projections of the list pages (see handlers/recipe_cards.py)
+    'recipe_card': CachePolicy(60 * 60 * 6, per_recipe=True),
+    # Rendered template fragments, keyed on what they show (see templatetags/recipe_fragments.py)
+    'fragment': CachePolicy(60 * 60 * 24, generational=False),
+    # Search results and the facet counts derived from them (see handlers/search_cache.py)
+    'search': CachePolicy(60 * 10),
+    'facets': CachePolicy(60 * 10),
+}
+LIST_NAMESPACES = {False: 'recipe_list', True: 'sub_recipe_list'}
+SEARCH_NAMESPACES = ('search', 'facets')
+
+
+def schema_fingerprint(app_label: str = 'recipes') -> str:
+    """
+    Short hash of the concrete fields (name, type, column, nullability, target) of the app's models.
+    """
+    description = [str(SCHEMA_VERSION)]
+    for model in sorted(apps.get_app_config(app_label).get_models(), key=lambda model: model._meta.label):
+        description.append(model._meta.label)
+        for field in model._meta.concrete_fields:
+            related = field.related_model._meta.label if field.related_model else ''
+            description.append(f'{field.name}:{field.get_internal_type()}:{field.column}:{field.null}:{related}')
+    return hashlib.sha1('|'.join(description).encode()).hexdigest()[:8]
+
+
+@functools.lru_cache(maxsize=None)
+def templates_fingerprint() -> str:
+    """
+    Short hash of the project's template sources, computed once per process. Cached HTML and the HTTP
+    validators carry it, so a deploy changing a template never serves the previous markup.
+    """
+    base_dir = Path(settings.BASE_DIR).resolve()
+    digest = hashlib.sha1()
+    for engine in engines.all():
+        for directory in getattr(engine, 'template_dirs', ()):
+            directory = Path(directory).resolve()
+            # Templates of installed packages only change with their version
+            if not directory.is_relative_to(base_dir) or not directory.is_dir():
+                continue
+            for path in sorted(directory.rglob('*.html')):
+                digest.update(str(path.relative_to(base_dir)).encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()[:8]
+
+
+class CacheManager:
+    """
+    Namespaced, schema-versioned cache with per-namespace timeouts and per-recipe invalidation.
+    """
+
+    def __init__(self, alias: str = None, namespaces: dict = None):
+        self.alias = alias
+        self.namespaces = NAMESPACES if namespaces is None else namespaces
+        self._schema = None
+        self.single_flight = SingleFlight(cache=lambda: self.cache)
+
+    @property
+    def cache(self):
+        # RECIPE_CACHE_ALIAS is the two-tier cache (settings.py), unless the caches are overridden without it
+        alias = self.alias or getattr(settings, 'RECIPE_CACHE_ALIAS', 'default')
+        return caches[alias if alias in settings.CACHES else 'default']
+
+    @property
+    def schema(self) -> str:
+        # Computed on first use, the app registry is not ready at import time
+        if self._schema is None:
+            self._schema = schema_fingerprint()
+        return self._schema
+
+    def policy(self, namespace: str) -> CachePolicy:
+        try:
+            return self.namespaces[namespace]
+        except KeyError:
+            raise ValueError(f'Unknown cache namespace: {namespace}') from None
+
+    @staticmethod
+    def namespace_generation_key(namespace: str) -> str:
+        return f'cache_generation:{namespace}'
+
+    @staticmethod
+    def group_generation_key(recipe_id) -> str:
+        return f'cache_generation:recipe:{recipe_id}'
+
+    @staticmethod
+    def changes_generation_key() -> str:
+        # Moves with every invalidation, whatever it drops
+        return 'cache_generation:changes'
+
+    def _generations(self, keys: list) -> dict:
+        generations = self.cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                # A fresh counter starts from the clock, so an evicted counter never falls back
+                # to a generation that still has entries
+                initial = time.time_ns()
+                if not self.cache.add(key, initial, timeout=None):
+                    initial = self.cache.get(key, initial)
+                generations[key] = initial
+        return generations
+
+    def keys(self, namespace: str, recipe_ids: list, *parts) -> dict:
+        """
+        Returns {recipe id: current key} for values of several recipes, reading every generation at once.
+        """
+        policy = self.policy(namespace)
+        if policy.per_recipe:
+            # Values shared by every recipe (the forms of a new recipe) live in a group of their own
+            recipe_ids = ['new' if recipe_id is None else recipe_id for recipe_id in recipe_ids]
+        namespace_key = self.namespace_generation_key(namespace) if policy.generational else None
+        group_keys = {recipe_id: self.group_generation_key(recipe_id) for recipe_id in recipe_ids} \
+            if policy.per_recipe else {}
+        generation_keys = [namespace_key, *group_keys.values()] if namespace_key else list(group_keys.values())
+        generations = self._generations(generation_keys) if generation_keys else {}
+        prefix = ':'.join(['cache', namespace, self.schema, str(generations.get(namespace_key, 0)), *map(str, parts)])
+        if not policy.per_recipe:
+            return {recipe_id: prefix for recipe_id in recipe_ids}
+        return {recipe_id: f'{prefix}.r{recipe_id}.{generations[group_key]}'
+                for recipe_id, group_key in group_keys.items()}
+
+    def key(self, namespace: str, *parts, recipe_id=None) -> str:
+        """
+        Returns the current key of a value, e.g. ``key('recipe_detail', recipe_id=3)``.
+        """
+        keys = self.keys(namespace, [recipe_id], *parts)
+        return next(iter(keys.values()))
+
+    def version(self, namespace: str, recipe_id=None) -> str:
+        """
+        Returns a token that changes whenever what the namespace shows (for the recipe) may have changed,
+        the HTTP validator of the pages rendered from it (see handlers/conditional.py). Per-recipe
+        namespaces follow the recipe group, the others any invalidation, since a list also shows the
+        cards, covers and facet counts of its recipes.
+        """
+        if self.policy(namespace).per_recipe:
+            return self.key(namespace, recipe_id=recipe_id)
+        key = self.changes_generation_key()
+        return f'cache:{namespace}:{self.schema}:{self._generations([key])[key]}'
+
+    def _timeout(self, namespace: str, timeout=None) -> int:
+        return self.policy(namespace).timeout if timeout is None else timeout
+
+    @staticmethod
+    def _wrap(value, timeout: int, delta: float = 0.0) -> tuple:
+        return value, time.time() + timeout, delta
+
+    @staticmethod
+    def _is_fresh(entry: tuple, early_refresh: bool = False) -> bool:
+        """
+        Tells whether the entry is still within its timeout. With ``early_refresh`` it may expire a
+        little early (XFetch): the closer the expiry and the longer the value took to compute, the
+        more likely, so one request refreshes a hot key before its expiry stampedes everyone.
+        """
+        _, expires_at, delta = entry
+        now = time.time()
+        if early_refresh and delta:
+            now -= delta * XFETCH_BETA * math.log(1.0 - random.random())
+        return now < expires_at
+
+    def _compute(self, compute, timeout: int) -> tuple:
+        started = time.monotonic()
+        value = compute()
+        return self._wrap(value, timeout, time.monotonic() - started)
+
+    def _store(self, key: str, compute, timeout: int) -> tuple:
+        entry = self._compute(compute, timeout)
+        try:
+            self.cache.set(key, entry, timeout + STALE_TIMEOUT)
+        except Exception:
+            pass
+        return entry
+
+    def get(self, namespace: str, *parts, recipe_id=None, default=None):
+        try:
+            entry = self.cache.get(self.key(namespace, *parts, recipe_id=recipe_id))
+        except Exception:
+            return default
+        return entry[0] if entry is not None and self._is_fresh(entry) else default
+
+    def set(self, namespace: str, value, *parts, recipe_id=None, timeout=None) -> bool:
+        """
+        Stores the value for the namespace's timeout (unless given), returns False if the cache failed.
+        """
+        try:
+            key = self.key(namespace, *parts, recipe_id=recipe_id)
+            timeout = self._timeout(namespace, timeout)
+            self.cache.set(key, self._wrap(value, timeout), timeout + STALE_TIMEOUT)
+        except Exception:
+            return False
+        return True
+
+    def get_or_set(self, namespace: str, compute, *parts, recipe_id=None, timeout=None):
+        """
+        Returns the cached value, or the result of ``compute()`` after caching it, without stampedes:
+
+        - concurrent misses of a key are coalesced, a single request (per cluster) computes it;
+        - a hot key is refreshed shortly before it expires, by a single request (see ``_is_fresh``);
+        - once expired, the previous value is still served for ``STALE_TIMEOUT`` seconds while the
+          request holding the refresh lock recomputes it.
+        """
+        timeout = self._timeout(namespace, timeout)
+        try:
+            key = self.key(namespace, *parts, recipe_id=recipe_id)
+            entry = self.cache.get(key)
+        except Exception:
+            return compute()
+        if entry is not None:
+            if self._is_fresh(entry, early_refresh=True):
+                return entry[0]
+            try:
+                refreshing = self.cache.add(f'{key}:refresh', 1, REFRESH_LOCK_TIMEOUT)
+            except Exception:
+                refreshing = False
+            if not refreshing:
+                return entry[0]
+            try:
+                return self._store(key, compute, timeout)[0]
+            finally:
+                self._release(f'{key}:refresh')
+        started, computed = [], []
+
+        def compute_entry():
+            started.append(True)
+            computed.append(self._compute(compute, timeout))
+            return computed[0]
+
+        try:
+            return self.single_flight.get_or_compute(key, compute_entry, timeout=timeout + STALE_TIMEOUT)[0]
+        except Exception:
+            # A cache failure returns the value uncached, errors of compute() itself propagate
+            if computed:
+                return computed[0][0]
+            if started:
+                raise
+            return compute()
+
+    def get_many(self, namespace: str, recipe_ids: list) -> dict:
+        """
+        Returns {recipe id: value} for the recipes having a cached value in a per-recipe namespace.
+        """
+        try:
+            keys = self.keys(namespace, recipe_ids)
+            entries = self.cache.get_many(list(keys.values()))
+        except Exception:
+            return {}
+        return {recipe_id: entries[key][0] for recipe_id, key in keys.items()
+                if key in entries and self._is_fresh(entries[key])}
+
+    def set_many(self, namespace: str, values: dict, timeout=None) -> bool:
+        """
+        Stores {recipe id: value} in a per-recipe namespace, returns False if the cache failed.
+        """
+        if not values:
+            return True
+        try:
+            keys = self.keys(namespace, list(values))
+            timeout = self._timeout(namespace, timeout)
+            entries = {keys[recipe_id]: self._wrap(value, timeout) for recipe_id, value in values.items()}
+            self.cache.set_many(entries, timeout + STALE_TIMEOUT)
+        except Exception:
+            return False
+        return True
+
+    def _release(self, lock_key: str) -> None:
+        try:
+            self.cache.delete(lock_key)
+        except Exception:
+            pass
+
+    def delete(self, namespace: str, *parts, recipe_id=None) -> None:
+        try:
+            self.cache.delete(self.key(namespace, *parts, recipe_id=recipe_id))
+        except Exception:
+            pass
+
+    def _bump(self, keys: list) -> None:
+        """
+        Moves the generations to new values in two round trips, however many there are.
+        """
+        if not keys:
+            return
+        try:
+            generations = self.cache.get_many(keys)
+            # Never below the clock, like a fresh counter (see _generations)
+            now = time.time_ns()
+            self.cache.set_many({key: max(generations.get(key, 0) + 1, now) for key in keys}, timeout=None)
+        except Exception:
+            # The cache is unreachable, so no stale value can be served from it either
+            pass
+
+    def invalidate_namespace(self, namespace: str) -> None:
+        self.invalidate_many(namespaces=[namespace])
+
+    def invalidate_recipe_group(self, recipe_id) -> None:
+        """
+        Drops every cached value of the recipe.
+        """
+        self.invalidate_many([recipe_id])
+
+    def invalidate_recipe(self, recipe_id=None, is_sub_recipe: bool = False) -> None:
+        """
+        Drops every cached value of the recipe (when given) and the list it appears in.
+        """
+        self.invalidate_many([] if recipe_id is None else [recipe_id], [LIST_NAMESPACES[bool(is_sub_recipe)]])
+
+    def invalidate_many(self, recipe_ids=(), namespaces=()) -> None:
+        """
+        Drops every cached value of the recipes and of the namespaces at once.
+        """
+        for namespace in namespaces:
+            self.policy(namespace)
+        self._bump([*map(self.namespace_generation_key, namespaces), *map(self.group_generation_key, recipe_ids),
+                    self.changes_generation_key()])
+
+
+cache_manager = CacheManager()
@@ -0,0 +1,79 @@
+"""
+Conditional GET for the recipe pages and the HTMX partials.
+
+Responses carry a weak ETag built from ``CacheManager.version``, the cache generations that the
+model signals move whenever something the page shows changes (see handlers/cache_dependencies.py).
+Computing it reads one or two generation counters, usually from the local tier of the cache, so a
+repeat visit or an HTMX re-fetch sending ``If-None-Match`` gets a 304 without touching the database
+or rendering a template.
+
+The ETag also covers the templates (a deploy changing them), who is looking (edit links, user menu),
+the CSRF secret and the session the page's forms were rendered for (a logout and login rotate them,
+a page kept from before would fail its next POST) and whether the page or its HTMX partial was
+asked for. Detail pages also send ``Last-Modified``,
+the newest ``last_updated`` of the recipe and of the sub recipes they show (child rows move it, see
+``cache_dependencies.touch_recipes``). It is only informative: renaming a category changes the page without
+moving it, so only the ETag decides a 304.
+Responses are ``private, no-cache``: browsers keep them but revalidate every time.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache_manager import cache_manager, templates_fingerprint
+
+
+class ConditionalGetMixin:
+    """
+    Answers GET requests whose ETag is still current with 304 Not Modified.
+    ``validator_namespace`` is the cache namespace the view renders, per recipe when the URL has a pk.
+    """
+    validator_namespace = None
+
+    def get_validator_recipe_id(self):
+        return self.kwargs.get('pk')
+
+    def get_etag(self):
+        """
+        Returns the ETag of the response, None when the cache cannot tell.
+        """
+        try:
+            version = cache_manager.version(self.validator_namespace, recipe_id=self.get_validator_recipe_id())
+        except Exception:
+            return None
+        user = self.request.user
+        session = getattr(self.request, 'session', None)
+        viewer = (f'{user.pk}:{user.get_username()}:{user.is_staff or user.is_superuser}:'
+                  f'{self.request.META.get("CSRF_COOKIE", "")}:{session.session_key if session else ""}')
+        representation = 'htmx' if getattr(self.request, 'htmx', False) else 'page'
+        digest = hashlib.sha1(
+            f'{version}|{templates_fingerprint()}|{viewer}|{representation}'.encode()).hexdigest()[:20]
+        return f'W/"{digest}"'
+
+    def get_last_modified(self):
+        recipe = getattr(self, 'object', None)
+        if getattr(recipe, 'last_updated', None) is None:
+            return None
+        sub_recipes = getattr(recipe, 'sub_recipes', ())
+        return max([recipe.last_updated, *(sub.last_updated for sub in sub_recipes if sub.last_updated)])
+
+    def dispatch(self, request, *args, **kwargs):
+        # Pending messages are shown, and consumed, by the next rendered page
+        if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag) if etag else None
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            last_modified = self.get_last_modified()
+            if last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie', 'HX-Request'))
+        return response
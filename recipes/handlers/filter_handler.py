@@ -0,0 +1,121 @@
+"""
+Category/tag filtering and facet counts for the recipe list.
+
+Filters are applied as semi-joins (``id IN (SELECT recipe_id FROM <m2m table> ...)``), so they never
+duplicate rows and need no DISTINCT. Facet counts are computed with one grouped query per facet and
+follow the usual disjunctive faceting rule: the counts of a facet reflect the search and the
+selections of the *other* facets, so they tell how many recipes each extra option would add.
+In "match all selected" mode the counts also include the selections of their own facet.
+"""
+import hashlib
+import json
+
+from django.db.models import Count, QuerySet
+
+from ..models.recipe_models import Recipe
+from . import search_cache
+
+FACETS = {
+    # facet name -> (m2m through model, column holding the option id)
+    'category': (Recipe.categories.through, 'category_id'),
+    'tag': (Recipe.tags.through, 'tag_id'),
+}
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+def get_selected_filters(form) -> dict:
+    """
+    Returns {'category': [ids], 'tag': [ids]} from a bound RecipeFilterForm, plus 'match': 'all'
+    when every selected option of a facet is required. Reuses the querysets the form already
+    evaluated during validation.
+    """
+    if not form.is_bound or not form.is_valid():
+        return {}
+    selected = {}
+    for facet in FACETS:
+        options = form.cleaned_data.get(facet)
+        if options:
+            selected[facet] = sorted(option.pk for option in options)
+    if selected and form.cleaned_data.get('match') == MATCH_ALL:
+        selected['match'] = MATCH_ALL
+    return selected
+
+
+def filters_key(filters: dict) -> str:
+    """
+    Short stable key of the selected filters, for the caches of filtered lists.
+    """
+    if not filters:
+        return 'all'
+    return hashlib.sha1(json.dumps(filters, sort_keys=True, separators=(',', ':')).encode()).hexdigest()[:16]
+
+
+def apply_filters(queryset: QuerySet, filters: dict, exclude_facet: str = None) -> QuerySet:
+    """
+    Keeps the recipes having any (or, with 'match': 'all', every one) of the selected options
+    of every facet.
+    """
+    match_all = filters.get('match') == MATCH_ALL
+    for facet, (through, column) in FACETS.items():
+        option_ids = filters.get(facet)
+        if facet == exclude_facet or not option_ids:
+            continue
+        groups = [[option_id] for option_id in option_ids] if match_all else [option_ids]
+        for group in groups:
+            queryset = queryset.filter(pk__in=through.objects.filter(**{f'{column}__in': group}).values('recipe_id'))
+    return queryset
+
+
+def filter_recipe_ids(recipe_ids: list, filters: dict) -> list:
+    """
+    Applies the filters to an ordered id list (search results) keeping the order.
+    """
+    if not filters or not recipe_ids:
+        return recipe_ids
+    kept = set(apply_filters(Recipe.objects.filter(pk__in=recipe_ids), filters).values_list('pk', flat=True))
+    return [recipe_id for recipe_id in recipe_ids if recipe_id in kept]
+
+
+def filter_matches(matches: list, filters: dict) -> list:
+    """
+    Same as ``filter_recipe_ids`` for the matches of ingredient and pantry searches,
+    tuples starting with the recipe id.
+    """
+    if not filters or not matches:
+        return matches
+    kept = set(filter_recipe_ids([match[0] for match in matches], filters))
+    return [match for match in matches if match[0] in kept]
+
+
+def facet_counts(base_queryset: QuerySet, filters: dict) -> dict:
+    """
+    Returns {facet: {option_id: recipe count}} with one grouped query per facet.
+    """
+    counts = {}
+    for facet, (through, column) in FACETS.items():
+        # In "match all" mode an option narrows its own facet too, so its count keeps every selection
+        exclude_facet = None if filters.get('match') == MATCH_ALL else facet
+        matching = apply_filters(base_queryset, filters, exclude_facet=exclude_facet)
+        rows = (through.objects
+                .filter(recipe_id__in=matching.values('pk'))
+                .values(column)
+                .annotate(recipes=Count('recipe_id'))
+                .values_list(column, 'recipes'))
+        counts[facet] = dict(rows)
+    return counts
+
+
+def get_facet_counts(filters: dict, search_type: str = None, search_text: str = None, search_ids: list = None) -> dict:
+    """
+    Cached facet counts for the main recipe list, for the given filters and (optional) search.
+    ``search_ids`` are the ranked ids of the search, the counts are then limited to those recipes.
+    """
+    def compute():
+        base_queryset = Recipe.objects.filter(is_sub_recipe=False)
+        if search_ids is not None:
+            base_queryset = base_queryset.filter(pk__in=search_ids)
+        return facet_counts(base_queryset, filters)
+
+    return search_cache.cached_search(search_type or '', search_text or '', False, compute,
+                                      filters=filters, namespace='facets')
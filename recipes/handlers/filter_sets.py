@@ -0,0 +1,208 @@
+"""
+Category/tag filtering served from Redis.
+
+Every category and tag owns a sorted set of the recipe ids it is assigned to, and two more sets
+hold the main and sub recipe ids. All members are scored by their own id, so a filter is a
+ZUNIONSTORE ("match any selected") or ZINTERSTORE ("match all selected") and a page of the result
+is a ZRANGEBYSCORE after the last id seen, newest or oldest first. The database then only
+hydrates the cards of the page. Sorted sets are used instead of plain sets only because they can
+be paged in id order without sorting the whole result.
+
+The sets are filled lazily on first use (or by ``rebuild_search_index``) and kept in sync from the
+model signals in ``recipes/signals.py``. Whenever Redis is unavailable, or the default cache is not
+a Redis backend, ``page_ids`` returns None and the views filter in the database instead.
+"""
+import hashlib
+import json
+
+from django.core.cache import caches
+
+from utils.helpers.resilient_cache import get_redis_client
+
+from ..models.recipe_models import Recipe, Category, Tag
+from .filter_handler import FACETS
+from .pagination import PAGE_SIZE
+
+KEY_PREFIX = 'filter_sets'
+READY_KEY = 'ready'
+GENERATION_KEY = 'generation'
+# Filter results are kept for the following pages of the infinite scroll
+RESULT_TIMEOUT = 60
+BUILD_LOCK_TIMEOUT = 60
+OPTION_MODELS = {'category': Category, 'tag': Tag}
+# Sort options the sets can serve (id order follows creation order) -> descending
+ID_SORTS = {'newest': True, 'oldest': False}
+
+
+def _key(*parts) -> str:
+    return caches['default'].make_key(':'.join([KEY_PREFIX, *(str(part) for part in parts)]))
+
+
+def scope_key(is_sub_recipe: bool) -> str:
+    return _key('scope', 'sub' if is_sub_recipe else 'main')
+
+
+def option_key(facet: str, option_id: int) -> str:
+    return _key(facet, option_id)
+
+
+def get_client():
+    """
+    Returns the redis-py client behind the default cache, or None when it is not the Redis backend,
+    cannot be set up or is unavailable (see ``ResilientCache``).
+    """
+    return get_redis_client(caches['default'])
+
+
+def _add_members(pipe, key, recipe_ids):
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), 5000):
+        pipe.zadd(key, {recipe_id: recipe_id for recipe_id in recipe_ids[start:start + 5000]})
+
+
+def rebuild() -> int:
+    """
+    Reloads every set from the database. Returns the number of recipes loaded.
+    """
+    client = get_client()
+    if client is None:
+        return 0
+    stale_keys = [key for key in client.scan_iter(match=_key('*')) if key != _key('building').encode()]
+    scopes = {False: [], True: []}
+    for recipe_id, is_sub_recipe in Recipe.objects.values_list('id', 'is_sub_recipe').iterator():
+        scopes[is_sub_recipe].append(recipe_id)
+    pipe = client.pipeline()
+    if stale_keys:
+        pipe.delete(*stale_keys)
+    for is_sub_recipe, recipe_ids in scopes.items():
+        _add_members(pipe, scope_key(is_sub_recipe), recipe_ids)
+    for facet, (through, column) in FACETS.items():
+        members = {}
+        for recipe_id, option_id in through.objects.values_list('recipe_id', column).iterator():
+            members.setdefault(option_id, []).append(recipe_id)
+        for option_id, recipe_ids in members.items():
+            _add_members(pipe, option_key(facet, option_id), recipe_ids)
+    pipe.set(_key(READY_KEY), 1)
+    pipe.execute()
+    return len(scopes[False]) + len(scopes[True])
+
+
+def _ensure_built(client) -> bool:
+    if client.exists(_key(READY_KEY)):
+        return True
+    # A single worker builds the sets, the others keep filtering in the database meanwhile
+    if not client.set(_key('building'), 1, nx=True, ex=BUILD_LOCK_TIMEOUT):
+        return False
+    try:
+        rebuild()
+    finally:
+        client.delete(_key('building'))
+    return True
+
+
+def _mark_stale():
+    # Called when an update could not be applied: fall back to the database until the next rebuild
+    try:
+        get_client().delete(_key(READY_KEY))
+    except Exception:
+        pass
+
+
+def recipes_changed(recipe_ids) -> None:
+    """
+    Re-syncs the scope and option memberships of the given recipes (saved, deleted or re-assigned).
+    """
+    client = get_client()
+    recipe_ids = [recipe_id for recipe_id in recipe_ids if recipe_id is not None]
+    if client is None or not recipe_ids:
+        return
+    try:
+        if not client.exists(_key(READY_KEY)):
+            return
+        scopes = dict(Recipe.objects.filter(pk__in=recipe_ids).values_list('id', 'is_sub_recipe'))
+        pipe = client.pipeline()
+        for is_sub_recipe in (False, True):
+            pipe.zrem(scope_key(is_sub_recipe), *recipe_ids)
+        for recipe_id, is_sub_recipe in scopes.items():
+            pipe.zadd(scope_key(is_sub_recipe), {recipe_id: recipe_id})
+        for facet, (through, column) in FACETS.items():
+            for option_id in OPTION_MODELS[facet].objects.values_list('pk', flat=True):
+                pipe.zrem(option_key(facet, option_id), *recipe_ids)
+            for recipe_id, option_id in through.objects.filter(recipe_id__in=recipe_ids).values_list('recipe_id', column):
+                pipe.zadd(option_key(facet, option_id), {recipe_id: recipe_id})
+        pipe.incr(_key(GENERATION_KEY))
+        pipe.execute()
+    except Exception:
+        _mark_stale()
+
+
+def option_changed(facet: str, option_id: int) -> None:
+    """
+    Reloads the set of one category or tag (assigned from the option side, or deleted).
+    """
+    client = get_client()
+    if client is None:
+        return
+    try:
+        if not client.exists(_key(READY_KEY)):
+            return
+        through, column = FACETS[facet]
+        pipe = client.pipeline()
+        pipe.delete(option_key(facet, option_id))
+        _add_members(pipe, option_key(facet, option_id),
+                     through.objects.filter(**{column: option_id}).values_list('recipe_id', flat=True))
+        pipe.incr(_key(GENERATION_KEY))
+        pipe.execute()
+    except Exception:
+        _mark_stale()
+
+
+def _store_result(client, filters: dict, is_sub_recipe: bool) -> str:
+    generation = client.get(_key(GENERATION_KEY)) or b'0'
+    digest = hashlib.sha1(json.dumps([filters, is_sub_recipe], sort_keys=True).encode()).hexdigest()
+    result_key = _key('result', generation.decode(), digest)
+    if client.exists(result_key):
+        return result_key
+    match_all = filters.get('match') == 'all'
+    pipe = client.pipeline()
+    keys = [scope_key(is_sub_recipe)]
+    for facet in FACETS:
+        option_keys = [option_key(facet, option_id) for option_id in filters.get(facet) or ()]
+        if not option_keys:
+            continue
+        if match_all:
+            keys.extend(option_keys)
+        else:
+            union_key = f'{result_key}:{facet}'
+            pipe.zunionstore(union_key, option_keys, aggregate='MIN')
+            pipe.expire(union_key, RESULT_TIMEOUT)
+            keys.append(union_key)
+    # Every member is scored by its own id, MIN keeps the scores equal to the ids
+    pipe.zinterstore(result_key, keys, aggregate='MIN')
+    pipe.expire(result_key, RESULT_TIMEOUT)
+    pipe.execute()
+    return result_key
+
+
+def page_ids(filters: dict, is_sub_recipe: bool = False, descending: bool = True,
+             after_id: int = None, limit: int = PAGE_SIZE + 1):
+    """
+    Returns up to ``limit`` recipe ids matching the filters, by id after ``after_id``,
+    or None when the Redis sets cannot serve the request.
+    """
+    client = get_client()
+    if client is None:
+        return None
+    try:
+        if not _ensure_built(client):
+            return None
+        result_key = _store_result(client, filters, is_sub_recipe)
+        if descending:
+            high = f'({after_id}' if after_id is not None else '+inf'
+            recipe_ids = client.zrevrangebyscore(result_key, high, '-inf', start=0, num=limit)
+        else:
+            low = f'({after_id}' if after_id is not None else '-inf'
+            recipe_ids = client.zrangebyscore(result_key, low, '+inf', start=0, num=limit)
+    except Exception:
+        return None
+    return [int(recipe_id) for recipe_id in recipe_ids]
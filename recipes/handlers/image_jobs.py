@@ -0,0 +1,159 @@
+"""
+Database-backed queue of the image processing jobs.
+
+Decoding a photo (HEIC from phones), re-encoding it as JPEG and creating its thumbnail takes
+seconds, too long for a request. Uploads only store the original and queue jobs in the same
+transaction, and the ``manage.py process_images`` workers run them. Deployments without a worker
+(``RECIPE_IMAGE_WORKER`` unset) run the due jobs in the web process once the upload is committed,
+which makes the upload request slower but never leaves an image waiting for a worker:
+
+- ``convert`` re-encodes an original that is not a JPEG;
+- ``thumbnail`` handles a JPEG upload, ``variants`` an image processed before the responsive variants.
+
+All of them create the thumbnail and the responsive variants (see handlers/image_variants.py) from
+the same decoded frame (see ``utils.models.ImagePipeline``) and mark the image ready.
+
+Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of them can run side
+by side without taking the same job. A failed job is retried with exponential backoff, and after
+``MAX_ATTEMPTS`` the job and the image are marked failed. If a worker dies, its jobs are claimed
+again once their lock is ``LOCK_TIMEOUT`` seconds old. Pages show a placeholder until the image is
+ready (see ``RecipeImage.get_thumbnail_url``). Image saves go through the model signals, so the
+cached cards and detail pages pick up the processed image.
+"""
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from utils.models import ImagePipeline
+from ..models.recipe_models import RecipeImage, RecipeImageJob
+from . import image_variants
+
+MAX_ATTEMPTS = 5
+# Seconds before the first retry, doubled on every attempt
+RETRY_DELAY = 30
+LOCK_TIMEOUT = 60 * 10
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+def enqueue(image: RecipeImage) -> RecipeImageJob:
+    """
+    Queues the processing of a newly stored original.
+    """
+    is_jpeg = image.picture.name.lower().endswith(JPEG_EXTENSIONS)
+    kind = RecipeImageJob.THUMBNAIL if is_jpeg else RecipeImageJob.CONVERT
+    job = RecipeImageJob.objects.create(image=image, kind=kind)
+    if not settings.RECIPE_IMAGE_WORKER:
+        # Also runs the retries due meanwhile; a failure leaves the jobs queued, the upload succeeds
+        transaction.on_commit(process, robust=True)
+    return job
+
+
+def enqueue_missing_variants() -> int:
+    """
+    Queues the variants of the ready images processed before they existed, returns their number.
+    """
+    images = (RecipeImage.objects.filter(status=RecipeImage.READY, variants={}, jobs__isnull=True)
+              .exclude(picture='').exclude(picture__isnull=True))
+    jobs = RecipeImageJob.objects.bulk_create(
+        RecipeImageJob(image_id=image_id, kind=RecipeImageJob.VARIANTS) for image_id in images.values_list('pk', flat=True))
+    return len(jobs)
+
+
+def claim(limit: int = 10) -> list:
+    """
+    Locks and returns up to ``limit`` due jobs, skipping the jobs other workers hold.
+    """
+    now = timezone.now()
+    due = Q(status=RecipeImageJob.QUEUED, run_after__lte=now)
+    abandoned = Q(status=RecipeImageJob.RUNNING, locked_at__lt=now - timedelta(seconds=LOCK_TIMEOUT))
+    with transaction.atomic():
+        jobs = list(RecipeImageJob.objects.select_for_update(skip_locked=True, of=('self',))
+                    .select_related('image', 'image__recipe').filter(due | abandoned).order_by('run_after', 'pk')[:limit])
+        RecipeImageJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=RecipeImageJob.RUNNING, locked_at=now, attempts=F('attempts') + 1)
+    for job in jobs:
+        job.status, job.locked_at, job.attempts = RecipeImageJob.RUNNING, now, job.attempts + 1
+    return jobs
+
+
+def convert(image: RecipeImage) -> None:
+    """
+    Replaces the original by its JPEG version, then creates the other outputs, decoding it once.
+    """
+    original_name = image.picture.name
+    with image.picture.open('rb'):
+        pipeline = ImagePipeline(image.picture)
+    jpeg_name = os.path.splitext(os.path.basename(original_name))[0] + '.jpg'
+    image.picture.save(jpeg_name, pipeline.encode(jpeg_name, quality=95), save=False)
+    finish(image, pipeline, 'picture')
+    if image.picture.name != original_name:
+        image.picture.storage.delete(original_name)
+
+
+def create_thumbnail(image: RecipeImage) -> None:
+    """
+    Creates the outputs of a JPEG original, decoding it at the smallest scale they need.
+    """
+    with image.picture.open('rb'):
+        pipeline = ImagePipeline(image.picture, max_size=image_variants.decode_size())
+    finish(image, pipeline)
+
+
+def finish(image: RecipeImage, pipeline: ImagePipeline, *update_fields) -> None:
+    image.save_thumbnail(pipeline, image.thumbnail_folder, image.picture.name)
+    image.variants = image_variants.create_variants(image, pipeline)
+    image.status = RecipeImage.READY
+    image.save(update_fields=[*update_fields, 'variants', 'status'])
+
+
+HANDLERS = {
+    RecipeImageJob.CONVERT: convert,
+    RecipeImageJob.THUMBNAIL: create_thumbnail,
+    RecipeImageJob.VARIANTS: create_thumbnail,
+}
+
+
+def run(job: RecipeImageJob) -> bool:
+    """
+    Runs a claimed job: deletes it once done, schedules its retry or marks it failed otherwise.
+    Returns whether it succeeded.
+    """
+    try:
+        HANDLERS[job.kind](job.image)
+    except Exception as error:
+        fail(job, error)
+        return False
+    RecipeImageJob.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def fail(job: RecipeImageJob, error: Exception) -> None:
+    # Updates rather than saves: the image, and the job with it, may have been deleted meanwhile
+    changes = {'locked_at': None, 'last_error': f'{type(error).__name__}: {error}'}
+    if job.attempts >= MAX_ATTEMPTS:
+        RecipeImageJob.objects.filter(pk=job.pk).update(status=RecipeImageJob.FAILED, **changes)
+        image = RecipeImage.objects.filter(pk=job.image_id).first()
+        if image is not None:
+            # Saved for the signals, the pages stop waiting for the image
+            image.status = RecipeImage.FAILED
+            image.save(update_fields=['status'])
+    else:
+        retry_at = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+        RecipeImageJob.objects.filter(pk=job.pk).update(status=RecipeImageJob.QUEUED, run_after=retry_at, **changes)
+
+
+def process(limit: int = 10) -> tuple:
+    """
+    Claims and runs a batch of jobs, returns the number of jobs that succeeded and failed.
+    """
+    succeeded = failed = 0
+    for job in claim(limit):
+        if run(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
@@ -0,0 +1,113 @@
+"""
+Responsive variants of the recipe images.
+
+Cards used to load the one 600x600 JPEG thumbnail, and detail pages the full original, whatever
+the screen. Processed images are now also encoded at the widths of the ladders of
+``settings.RECIPE_IMAGE_LADDERS`` (card, detail, hero), in every format of ``RECIPE_IMAGE_FORMATS``
+(WebP and JPEG, optionally AVIF), from the frame the image jobs already decoded. The files are
+recorded on ``RecipeImage.variants``::
+
+    {'width': 1600, 'height': 1200, 'files': {'webp': [[320, name, bytes], ...], 'jpeg': [...]}}
+
+with the size of the picture itself, not of the frame it was decoded at (see ``decode_size``).
+The files are deleted with the image (see signals.py).
+
+``sources`` turns them into the plain tuple of storage names cached in the card and detail rows,
+and the ``responsive_image`` template tag (templatetags/recipe_images.py) renders it, building the
+URLs, as a ``<picture>`` with a ``srcset`` per format, so browsers download the smallest file
+covering the displayed width. Images without variants keep their single URL.
+"""
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import features
+
+from utils.models import ImagePipeline
+
+FOLDER = 'recipes_pictures_variants'
+# By preference, the fallback <img> uses the last one
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+ENCODE_OPTIONS = {
+    'avif': {'quality': 55},
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+FALLBACK_FORMAT = 'jpeg'
+
+
+def formats() -> list:
+    """
+    The configured formats this Pillow build can encode, always including the JPEG fallback.
+    """
+    available = [format for format in settings.RECIPE_IMAGE_FORMATS
+                 if format == FALLBACK_FORMAT or features.check(format)]
+    return available if FALLBACK_FORMAT in available else [*available, FALLBACK_FORMAT]
+
+
+def decode_size() -> tuple:
+    """
+    Smallest frame every variant can be encoded from (see ``ImagePipeline``): as wide as the
+    largest ladder width, whatever its height.
+    """
+    return (max(width for ladder in settings.RECIPE_IMAGE_LADDERS.values() for width in ladder['widths']), 1)
+
+
+def variant_widths(frame_width: int) -> list:
+    """
+    Widths to encode: the ladder widths, capped at the width of the picture.
+    """
+    return sorted({min(width, frame_width)
+                   for ladder in settings.RECIPE_IMAGE_LADDERS.values() for width in ladder['widths']})
+
+
+def create_variants(image, pipeline: ImagePipeline) -> dict:
+    """
+    Encodes the variants of the image from its decoded frame, replacing its previous ones.
+    Returns the metadata to store in ``image.variants``.
+    """
+    delete_variants(image.variants)
+    base = os.path.splitext(os.path.basename(image.picture.name))[0]
+    height = pipeline.frame.height
+    files = {}
+    for format in formats():
+        for variant_width in variant_widths(pipeline.frame.width):
+            name = f'{FOLDER}/{base}-{variant_width}w.{EXTENSIONS[format]}'
+            output = pipeline.encode(name, (variant_width, height), format=format.upper(), **ENCODE_OPTIONS[format])
+            files.setdefault(format, []).append([variant_width, default_storage.save(name, output), output.size])
+    width, height = pipeline.size
+    return {'width': width, 'height': height, 'files': files}
+
+
+def delete_variants(variants: dict) -> None:
+    for format_files in (variants or {}).get('files', {}).values():
+        for _, name, _ in format_files:
+            default_storage.delete(name)
+
+
+def sources(image, ladder: str):
+    """
+    Returns the files of the ladder as cached in the card and detail rows::
+
+        (fallback name, width, height, ((mime type, ((width, name), ...)), ...))
+
+    with the formats by preference and JPEG last, or None when the image has no variants or
+    is not ready (its variants may be those of the picture it replaces).
+    """
+    variants = image.variants
+    if image.status != image.READY or not variants or FALLBACK_FORMAT not in variants.get('files', {}):
+        return None
+    largest = max(width for width, _, _ in variants['files'][FALLBACK_FORMAT])
+    wanted = {min(width, largest) for width in settings.RECIPE_IMAGE_LADDERS[ladder]['widths']}
+    candidates, fallback = [], None
+    for format, mime_type in MIME_TYPES.items():
+        files = tuple((width, name) for width, name, _ in variants['files'].get(format, ()) if width in wanted)
+        if files:
+            candidates.append((mime_type, files))
+            if format == FALLBACK_FORMAT:
+                fallback = files[-1][1]
+    if fallback is None:
+        # Encoded for other ladder widths, until the image is processed again
+        return None
+    return (fallback, variants['width'], variants['height'], tuple(candidates))
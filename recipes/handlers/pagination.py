@@ -0,0 +1,253 @@
+"""
+Cursor (keyset) pagination for the recipe lists.
+
+Pages are selected with ``WHERE (sort_key, id) > (last_sort_key, last_id)`` on the composite
+indexes declared on ``Recipe``, so every page costs the same as the first one and no COUNT(*)
+is needed. Ranked search results, which have no sortable key, are paginated by position in the
+ranked id list instead.
+
+The first ``LIST_CACHE_DEPTH`` keys of a list (sort value and id) are cached per sort order, so the
+first pages are served without touching the database and hand over to keyset queries with the
+same cursors further down.
+
+Filtered lists served by the Redis filter sets page by id, with ``{"after": id}`` cursors. Either
+path reads the cursors of the other (see ``cursor_after_id`` and ``KeysetPaginator.translate_cursor``),
+so a scroll falling back to the database mid-way, or back to Redis, carries on where it was.
+"""
+import base64
+import binascii
+import json
+from types import SimpleNamespace
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+from .cache_manager import cache_manager
+
+PAGE_SIZE = 12
+# Number of leading (sort value, id) keys cached per list and sort order
+LIST_CACHE_DEPTH = PAGE_SIZE * 10
+
+SORT_OPTIONS = {
+    'newest': ('-created_at', '-id'),
+    'oldest': ('created_at', 'id'),
+    'updated': ('-last_updated', '-id'),
+    'title': ('title', 'id'),
+}
+SORT_CHOICES = [
+    ('newest', 'Newest'),
+    ('oldest', 'Oldest'),
+    ('updated', 'Recently updated'),
+    ('title', 'Title'),
+]
+DEFAULT_SORT = 'newest'
+
+
+class KeysetPage(NamedTuple):
+    object_list: list
+    next_cursor: str
+
+
+def encode_cursor(values) -> str:
+    payload = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """
+    Returns the decoded cursor values, or None for a missing or malformed cursor
+    (which simply starts from the first page).
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+
+
+def cursor_after_id(values):
+    """
+    The id a decoded cursor points after: ``{"after": id}`` of the filter sets, or the id of a
+    ``[sort value, id]`` keyset cursor. None for any other cursor.
+    """
+    if isinstance(values, dict):
+        after_id = values.get('after')
+    elif isinstance(values, list) and len(values) == 2:
+        after_id = values[1]
+    else:
+        return None
+    return after_id if isinstance(after_id, int) else None
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset ordered by one of ``SORT_OPTIONS``: (sort field, id).
+    """
+
+    def __init__(self, queryset: QuerySet, sort: str = DEFAULT_SORT, page_size: int = PAGE_SIZE):
+        self.sort_field, _ = SORT_OPTIONS[sort]
+        self.field_name = self.sort_field.lstrip('-')
+        self.descending = self.sort_field.startswith('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.queryset = queryset.order_by(*SORT_OPTIONS[sort])
+        self.page_size = page_size
+
+    def _after(self, queryset: QuerySet, values) -> QuerySet:
+        value, pk = self.field.to_python(values[0]), int(values[1])
+        after, bound = ('lt', 'lte') if self.descending else ('gt', 'gte')
+        # The redundant bound lets the database use the index range before applying the tie breaker
+        return queryset.filter(Q(**{f'{self.field_name}__{after}': value}) |
+                               Q(**{self.field_name: value, f'pk__{after}': pk}),
+                               **{f'{self.field_name}__{bound}': value})
+
+    def _fetch(self, queryset: QuerySet, cursor: str) -> list:
+        values = decode_cursor(cursor)
+        if values:
+            try:
+                queryset = self._after(queryset, values)
+            except (ValidationError, ValueError, TypeError, IndexError, KeyError):
+                pass
+        return list(queryset[:self.page_size + 1])
+
+    def translate_cursor(self, cursor: str):
+        """
+        Turns an ``{"after": id}`` cursor into the keyset cursor of that row, other cursors are
+        returned as they are. None when the row is gone, which starts over.
+        """
+        values = decode_cursor(cursor)
+        if not isinstance(values, dict):
+            return cursor
+        after_id = cursor_after_id(values)
+        rows = self.queryset.model._base_manager.filter(pk=after_id).values_list(self.field_name, 'pk')
+        row = rows.first() if after_id is not None else None
+        return encode_cursor(list(self.cursor_key(*row))) if row else None
+
+    def cursor_key(self, value, pk) -> tuple:
+        """
+        The (sort value, id) pair a cursor pointing after this row encodes.
+        """
+        return self.field.value_to_string(SimpleNamespace(**{self.field.attname: value})), pk
+
+    def get_page(self, cursor: str = None) -> KeysetPage:
+        items = self._fetch(self.queryset, cursor)
+        if len(items) <= self.page_size:
+            return KeysetPage(items, None)
+        items = items[:self.page_size]
+        last = items[-1]
+        return KeysetPage(items, encode_cursor([self.field.value_to_string(last), last.pk]))
+
+    def get_id_page(self, cursor: str = None) -> KeysetPage:
+        """
+        Same as ``get_page`` but only reads the ids.
+        """
+        rows = self._fetch(self.queryset.values_list(self.field_name, 'pk'), cursor)
+        next_cursor = encode_cursor(list(self.cursor_key(*rows[self.page_size - 1]))) \
+            if len(rows) > self.page_size else None
+        return KeysetPage([pk for _, pk in rows[:self.page_size]], next_cursor)
+
+    def get_keys(self, limit: int = LIST_CACHE_DEPTH) -> list:
+        """
+        Returns the (sort value, id) keys of the first ``limit`` rows.
+        """
+        return [self.cursor_key(value, pk) for value, pk in self.queryset.values_list(self.field_name, 'pk')[:limit]]
+
+
+def paginate_ranked(items: list, cursor: str = None, page_size: int = PAGE_SIZE) -> KeysetPage:
+    """
+    Paginates an already ranked list (search results) by position.
+    """
+    values = decode_cursor(cursor)
+    offset = values.get('offset', 0) if isinstance(values, dict) else 0
+    if not isinstance(offset, int) or offset < 0:
+        offset = 0
+    page = items[offset:offset + page_size]
+    next_offset = offset + page_size
+    next_cursor = encode_cursor({'offset': next_offset}) if next_offset < len(items) else None
+    return KeysetPage(page, next_cursor)
+
+
+def paginate_keys(keys: list, cursor: str = None, page_size: int = PAGE_SIZE, complete: bool = False):
+    """
+    Paginates the cached leading keys of a keyset ordering with the cursors of ``KeysetPaginator``.
+    ``complete`` tells the keys hold the whole list. Returns None when the page reaches past the
+    cached keys (or the cursor is not one of them), the database then serves it.
+    """
+    values = decode_cursor(cursor)
+    start = 0
+    if values:
+        try:
+            start = keys.index(tuple(values)) + 1
+        except (ValueError, TypeError):
+            return None
+    page_keys = keys[start:start + page_size]
+    end = start + page_size
+    if end < len(keys) or (not complete and len(page_keys) == page_size):
+        return KeysetPage([pk for _, pk in page_keys], encode_cursor(list(page_keys[-1])))
+    if complete:
+        return KeysetPage([pk for _, pk in page_keys], None)
+    return None
+
+
+def paginate_ids(fetch, cursor: str = None, page_size: int = PAGE_SIZE):
+    """
+    Paginates ids served in id order by ``fetch(after_id, limit)`` (see handlers/filter_sets.py).
+    Returns None when ``fetch`` cannot serve the page.
+    """
+    after_id = cursor_after_id(decode_cursor(cursor))
+    recipe_ids = fetch(after_id, page_size + 1)
+    if recipe_ids is None:
+        return None
+    if len(recipe_ids) <= page_size:
+        return KeysetPage(recipe_ids, None)
+    recipe_ids = recipe_ids[:page_size]
+    return KeysetPage(recipe_ids, encode_cursor({'after': recipe_ids[-1]}))
+
+
+class KeysetPaginationMixin:
+    """
+    View mixin exposing the requested sort order, keyset/ranked pages and the URL of the next page,
+    which the infinite scroll partial fetches when it scrolls into view.
+    """
+    page_size = PAGE_SIZE
+    default_sort = DEFAULT_SORT
+
+    def get_sort(self) -> str:
+        sort = self.request.GET.get('sort')
+        return sort if sort in SORT_OPTIONS else self.default_sort
+
+    def get_keyset_page(self, queryset: QuerySet) -> KeysetPage:
+        paginator = KeysetPaginator(queryset, self.get_sort(), self.page_size)
+        return paginator.get_page(paginator.translate_cursor(self.request.GET.get('cursor')))
+
+    def get_id_page(self, fetch):
+        return paginate_ids(fetch, self.request.GET.get('cursor'), self.page_size)
+
+    def get_cached_keyset_page(self, queryset: QuerySet, namespace: str, *key_parts) -> KeysetPage:
+        """
+        Keyset page of ids, served from the cached leading keys of the list when the page lies within
+        them (see ``CacheManager``); ``key_parts`` tell apart the lists stored in the namespace.
+        """
+        sort = self.get_sort()
+        paginator = KeysetPaginator(queryset, sort, self.page_size)
+        cursor = paginator.translate_cursor(self.request.GET.get('cursor'))
+        keys = cache_manager.get_or_set(namespace, paginator.get_keys, sort, *key_parts)
+        page = paginate_keys(keys, cursor, self.page_size, complete=len(keys) < LIST_CACHE_DEPTH)
+        if page is None:
+            page = paginator.get_id_page(cursor)
+        return page
+
+    def get_ranked_page(self, items: list) -> KeysetPage:
+        return paginate_ranked(items, self.request.GET.get('cursor'), self.page_size)
+
+    def get_next_page_url(self, page: KeysetPage):
+        if not page.next_cursor:
+            return None
+        query = self.request.GET.copy()
+        query['cursor'] = page.next_cursor
+        return f'{self.request.path}?{query.urlencode()}'
+
+    def is_next_page_request(self) -> bool:
+        return 'cursor' in self.request.GET
@@ -0,0 +1,81 @@
+"""
+Slim card projections for the recipe list pages.
+
+List pages only show a title, the start of the description and a cover thumbnail, so they are
+rendered from ``RecipeCard`` objects instead of full model instances. Cards are cached per recipe
+as plain tuples (see ``CacheManager``, namespace 'recipe_card'); a page reads the cards of its ids
+with one cache round trip and loads the missing ones with two small queries.
+"""
+from django.utils.functional import cached_property
+
+from ..models.recipe_models import Recipe, RecipeImage
+from . import image_variants
+from .cache_manager import cache_manager
+
+DESCRIPTION_SNIPPET_LENGTH = 200
+
+
+class RecipeCard:
+    """
+    What a recipe card renders. Searches attach their scores to it like to a model instance.
+    """
+
+    def __init__(self, pk: int, title: str, description: str, picture: str, picture_status: str,
+                 is_sub_recipe: bool, last_updated=None, image=None):
+        self.pk = self.id = pk
+        self.title = title
+        self.description = description
+        # Storage name and status of the cover: URLs are built when rendering, never cached
+        self.picture = picture
+        self.picture_status = picture_status
+        self.is_sub_recipe = is_sub_recipe
+        # Version of the card's fragment cache key (see templatetags/recipe_fragments.py)
+        self.last_updated = last_updated
+        # Responsive sources of the thumbnail, see image_variants.sources
+        self.image = image
+
+    @cached_property
+    def thumbnail_url(self) -> str:
+        if not self.picture:
+            return ''
+        return RecipeImage(picture=self.picture, status=self.picture_status).get_thumbnail_url()
+
+    def __repr__(self):
+        return f'<RecipeCard {self.pk}: {self.title}>'
+
+
+def load_card_rows(recipe_ids: list) -> dict:
+    """
+    Returns {recipe id: (title, description snippet, cover name, cover status, is sub recipe,
+    last updated, thumbnail sources)} from the database.
+    """
+    covers = {}
+    images = (RecipeImage.objects.filter(recipe_id__in=recipe_ids, picture__isnull=False)
+              .exclude(picture='').order_by('recipe_id', 'pk'))
+    for recipe_id, picture, status, variants in images.values_list('recipe_id', 'picture', 'status', 'variants'):
+        if recipe_id not in covers:
+            image = RecipeImage(picture=picture, status=status, variants=variants)
+            covers[recipe_id] = (picture, status, image_variants.sources(image, 'card'))
+    rows = {}
+    for pk, title, description, is_sub_recipe, last_updated in (
+            Recipe.objects.filter(pk__in=recipe_ids)
+            .values_list('pk', 'title', 'description', 'is_sub_recipe', 'last_updated')):
+        picture, status, image = covers.get(pk, ('', '', None))
+        rows[pk] = (title, (description or '')[:DESCRIPTION_SNIPPET_LENGTH], picture, status, is_sub_recipe,
+                    last_updated, image)
+    return rows
+
+
+def get_cards(recipe_ids: list) -> list:
+    """
+    Returns the cards of the given recipes in the given order, skipping recipes that no longer exist.
+    """
+    if not recipe_ids:
+        return []
+    rows = cache_manager.get_many('recipe_card', recipe_ids)
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in rows]
+    if missing:
+        loaded = load_card_rows(missing)
+        cache_manager.set_many('recipe_card', loaded)
+        rows.update(loaded)
+    return [RecipeCard(recipe_id, *rows[recipe_id]) for recipe_id in recipe_ids if recipe_id in rows]
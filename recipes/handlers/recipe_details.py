@@ -0,0 +1,170 @@
+"""
+Compact cached form of the recipe detail pages.
+
+The detail pages used to cache the ``Recipe`` instance with its prefetched steps, ingredients,
+categories, tags and parents: large pickles of model internals, slow to load and unreadable as
+soon as a model changes. They now cache a row of plain tuples, strings and integers::
+
+    (DETAIL_FORMAT, pk, title, description, author id, is sub recipe, last updated, cover name,
+     cover status, cover sources, ingredients, steps, categories, tags, parent recipes, sub recipes)
+
+with ingredients as (name, quantity, measurement) tuples, steps as descriptions, parents as
+(pk, title) and sub recipes as (pk, title, last updated, ingredients, steps). Dates are stored as
+microseconds since the epoch, the cover sources are those of ``image_variants.sources``. The cover
+is cached as its storage name, its URL is built when rendering. Templates render a read-only
+``RecipeDetail`` built from the row.
+
+The parents and sub recipes shown are kept fresh by the dependency invalidation in
+``handlers/cache_dependencies.py``.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from ..models.recipe_models import Recipe, RecipeImage, RecipeIngredient, RecipeStep, RecipeSubRecipe
+from . import image_variants
+from .cache_manager import cache_manager
+
+# Bump when the layout of the row changes
+DETAIL_FORMAT = 4
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def dump_datetime(value):
+    return None if value is None else (value - EPOCH) // timedelta(microseconds=1)
+
+
+def load_datetime(value):
+    return None if value is None else EPOCH + timedelta(microseconds=value)
+
+
+class IngredientLine(NamedTuple):
+    name: str
+    quantity: str
+    measurement: str
+
+
+class StepLine(NamedTuple):
+    description: str
+
+
+class RecipeLink(NamedTuple):
+    pk: int
+    title: str
+
+    @property
+    def id(self):
+        return self.pk
+
+
+class SubRecipeDetail(NamedTuple):
+    pk: int
+    title: str
+    last_updated: datetime
+    ingredients: tuple
+    steps: tuple
+
+    @property
+    def id(self):
+        return self.pk
+
+
+class RecipeDetail(NamedTuple):
+    """
+    What the recipe and sub recipe detail templates render.
+    """
+    pk: int
+    title: str
+    description: str
+    author_id: int
+    is_sub_recipe: bool
+    last_updated: datetime
+    cover_picture: str
+    cover_status: str
+    cover_image: tuple
+    ingredients: tuple
+    steps: tuple
+    categories: tuple
+    tags: tuple
+    parent_recipes: tuple
+    sub_recipes: tuple
+
+    @property
+    def id(self):
+        return self.pk
+
+    @property
+    def cover_url(self) -> str:
+        if not self.cover_picture:
+            return ''
+        return RecipeImage(picture=self.cover_picture, status=self.cover_status).get_picture_url()
+
+    @classmethod
+    def from_row(cls, row: tuple):
+        (_, pk, title, description, author_id, is_sub_recipe, last_updated, cover_picture, cover_status,
+         cover_image, ingredients, steps, categories, tags, parents, sub_recipes) = row
+        return cls(
+            pk, title, description, author_id, is_sub_recipe, load_datetime(last_updated),
+            cover_picture, cover_status, cover_image,
+            tuple(IngredientLine(*ingredient) for ingredient in ingredients),
+            tuple(StepLine(step) for step in steps),
+            categories, tags,
+            tuple(RecipeLink(*parent) for parent in parents),
+            tuple(SubRecipeDetail(sub_pk, sub_title, load_datetime(sub_updated),
+                                  tuple(IngredientLine(*ingredient) for ingredient in sub_ingredients),
+                                  tuple(StepLine(step) for step in sub_steps))
+                  for sub_pk, sub_title, sub_updated, sub_ingredients, sub_steps in sub_recipes),
+        )
+
+
+def _ingredients_and_steps(recipe_ids: list) -> tuple:
+    ingredients, steps = {}, {}
+    rows = RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).order_by('pk')
+    for recipe_id, name, quantity, measurement in rows.values_list('recipe_id', 'name', 'quantity', 'measurement'):
+        ingredients.setdefault(recipe_id, []).append((name, quantity, measurement))
+    rows = RecipeStep.objects.filter(recipe_id__in=recipe_ids).order_by('order', 'pk')
+    for recipe_id, description in rows.values_list('recipe_id', 'description'):
+        steps.setdefault(recipe_id, []).append(description)
+    return ingredients, steps
+
+
+def load_detail_row(recipe_id):
+    """
+    Returns the row of the recipe from the database, None when it does not exist.
+    """
+    recipe = (Recipe.objects.filter(pk=recipe_id)
+              .values_list('pk', 'title', 'description', 'author_id', 'is_sub_recipe', 'last_updated').first())
+    if recipe is None:
+        return None
+    pk, title, description, author_id, is_sub_recipe, last_updated = recipe
+    cover = (RecipeImage.objects.filter(recipe_id=pk, picture__isnull=False).exclude(picture='')
+             .order_by('pk').values_list('picture', 'status', 'variants').first())
+    cover = RecipeImage(picture=cover[0], status=cover[1], variants=cover[2]) if cover else None
+    links = RecipeSubRecipe.objects.order_by('pk')
+    parents = tuple(links.filter(sub_recipe_id=pk).values_list('parent_recipe_id', 'parent_recipe__title'))
+    sub_recipes = list(links.filter(parent_recipe_id=pk)
+                       .values_list('sub_recipe_id', 'sub_recipe__title', 'sub_recipe__last_updated'))
+    ingredients, steps = _ingredients_and_steps([pk, *(sub_pk for sub_pk, _, _ in sub_recipes)])
+    return (
+        DETAIL_FORMAT, pk, title, description or '', author_id, is_sub_recipe, dump_datetime(last_updated),
+        cover.picture.name if cover else '', cover.status if cover else '',
+        image_variants.sources(cover, 'detail') if cover else None,
+        tuple(ingredients.get(pk, ())), tuple(steps.get(pk, ())),
+        tuple(Recipe.categories.through.objects.filter(recipe_id=pk).order_by('category__name')
+              .values_list('category__name', flat=True)),
+        tuple(Recipe.tags.through.objects.filter(recipe_id=pk).order_by('tag__name').values_list('tag__name', flat=True)),
+        parents,
+        tuple((sub_pk, sub_title, dump_datetime(sub_updated), tuple(ingredients.get(sub_pk, ())),
+               tuple(steps.get(sub_pk, ())))
+              for sub_pk, sub_title, sub_updated in sub_recipes),
+    )
+
+
+def get_detail(namespace: str, recipe_id):
+    """
+    Returns the ``RecipeDetail`` of the recipe, cached in the namespace, or None when it does not exist.
+    """
+    row = cache_manager.get_or_set(namespace, lambda: load_detail_row(recipe_id), recipe_id=recipe_id)
+    if row is not None and row[0] != DETAIL_FORMAT:
+        row = load_detail_row(recipe_id)
+        cache_manager.set(namespace, row, recipe_id=recipe_id)
+    return None if row is None else RecipeDetail.from_row(row)
@@ -0,0 +1,64 @@
+"""
+Rendered ingredient and step modals.
+
+The modals used to be cached as template contexts: live formsets bound to the recipe and its
+querysets, heavy to pickle and unpickle, and forms that could go stale. They are now cached as their
+final HTML. The blank modals of a new recipe are rendered once, and the modals of a recipe are
+cached under its group generation, which moves with every change of its ingredients or steps (see
+handlers/cache_dependencies.py). Keys carry ``templates_fingerprint()``, so a deploy changing a modal
+reads new keys.
+
+The empty rows the client clones to add an ingredient or a step are the same in every modal, so
+they are not part of it: the pages hosting the modals carry them once as ``<template>`` elements
+(``{% modal_empty_rows %}``, see templatetags/recipe_fragments.py), rendered once and cached.
+"""
+from django.template.loader import render_to_string
+
+from ..models.recipe_models import Recipe
+from . import recipes_handler
+from .cache_manager import cache_manager, templates_fingerprint
+
+MODALS = {
+    'ingredients': ('ingredients_form', 'recipes/html_modals/ingredients_modal.html'),
+    'steps': ('steps_form', 'recipes/html_modals/steps_modal.html'),
+}
+EMPTY_ROWS_TEMPLATE = 'recipes/html_modals/empty_rows.html'
+
+
+def load_modal_html(partial_type: str, recipe_id=None):
+    """
+    Renders the modal of the recipe, or the blank one with a first empty row when no recipe is given.
+    Returns None when the recipe does not exist.
+    """
+    _, template_name = MODALS[partial_type]
+    if recipe_id is None:
+        context = recipes_handler.fetch_partial_recipe_context_data_for_get(None, partial_type, extra_forms=1)
+    else:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is None:
+            return None
+        context = recipes_handler.fetch_partial_recipe_context_data_for_get(recipe, partial_type)
+    return render_to_string(template_name, context)
+
+
+def get_modal_html(partial_type: str, recipe_id=None):
+    """
+    Returns the cached HTML of the modal, None when the recipe does not exist.
+    """
+    namespace, _ = MODALS[partial_type]
+    return cache_manager.get_or_set(namespace, lambda: load_modal_html(partial_type, recipe_id),
+                                    templates_fingerprint(), recipe_id=recipe_id)
+
+
+def load_empty_rows_html() -> str:
+    context = {}
+    for partial_type in MODALS:
+        context.update(recipes_handler.fetch_partial_recipe_context_data_for_get(None, partial_type))
+    return render_to_string(EMPTY_ROWS_TEMPLATE, context)
+
+
+def get_empty_rows_html() -> str:
+    """
+    Returns the cached ``<template>`` elements of the empty ingredient and step rows.
+    """
+    return cache_manager.get_or_set('fragment', load_empty_rows_html, 'modal_empty_rows', templates_fingerprint())
@@ -4,8 +4,6 @@ from utils.models import ImageHandler as image_handler
 
 from django.core.handlers.wsgi import WSGIRequest
 
-from django.core.cache import cache
-
 import os
 def fetch_partial_recipe_context_data_for_get(recipe: Recipe, partial_type: str, extra_forms:int =0) -> dict:
     """
@@ -47,41 +45,3 @@ def fetch_partial_form_for_post_request(request: WSGIRequest, partial_type: str,
             'steps_formset': steps_formset(request.POST, instance=recipe, prefix='steps'),
             'recipe': recipe,
         }
-
-
-
-# TODO: Implement caching Manager or something to centrilize caching logic
-def get_cached_object(key: str) -> object:
-    """
-    Retrieves an object from the cache using the provided key.
-    If the object is not found in the cache, it returns None.
-    """
-    return cache.get(key)
-
-def set_cached_object(key: str, value, timeout=None) -> tuple:
-    """
-    Sets an object in the cache with the provided key and value.
-    If a timeout is specified, it will be used; otherwise, the default timeout will be used.
-    """
-    try:
-        cache.set(key, value, timeout)
-    except Exception as e:
-        return (False, str(e))
-    return (True, '')
-
-
-
-def invalidate_recipe_cache(recipe_id:str=None, is_subrecipe:bool=False) -> dict:
-    """
-    Invalidates the recipe cache.
-    """
-    try:
-        if recipe_id:
-            cache.delete(recipe_id)
-        if is_subrecipe:
-            cache.delete('sub_recipe_list_queryset')
-        else:
-            cache.delete('recipe_list_queryset')
-    except Exception as e:
-        return {'status': 'Cache invalidation failed', 'error': str(e)}
-    return {'status': 'Cache invalidated'}
\ No newline at end of file
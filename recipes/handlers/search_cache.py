@@ -0,0 +1,59 @@
+"""
+Cache of search results.
+
+Results are stored as compact id lists (never model instances) under a key built from the
+normalized search: search type, sorted lowercase terms, recipe kind and filters. They live in the
+generational ``search`` and ``facets`` namespaces of the cache manager, bumped whenever a recipe,
+its ingredients or its categories/tags change, so stale results are never served and no key
+enumeration is needed to invalidate them. Concurrent misses on the same key are coalesced so only
+one request runs the query.
+"""
+import hashlib
+import json
+
+from .cache_manager import cache_manager, SEARCH_NAMESPACES
+from .search_handler import tokenize_search_text, normalize_ingredient_terms
+
+
+def normalize_search(search_type: str, search_text: str, is_sub_recipe: bool, filters: dict = None) -> list:
+    """
+    Returns the canonical form of a search, identical for searches that must return the same results
+    ("Rice, chicken" and "chicken,rice " for instance).
+    """
+    search_type = (search_type or '').lower()
+    if search_type == 'title':
+        terms = sorted(set(tokenize_search_text(search_text)))
+    else:
+        terms = sorted(normalize_ingredient_terms(search_text))
+    normalized_filters = sorted((name, sorted(map(str, values)) if isinstance(values, (list, tuple, set)) else str(values))
+                                for name, values in (filters or {}).items())
+    return [search_type, terms, bool(is_sub_recipe), normalized_filters]
+
+
+def bump_generation() -> None:
+    """
+    Invalidates every cached search result and facet count at once.
+    """
+    cache_manager.invalidate_many(namespaces=SEARCH_NAMESPACES)
+
+
+def search_digest(search_type: str, search_text: str, is_sub_recipe: bool, filters: dict = None) -> str:
+    normalized = json.dumps(normalize_search(search_type, search_text, is_sub_recipe, filters), separators=(',', ':'))
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def search_cache_key(search_type: str, search_text: str, is_sub_recipe: bool, filters: dict = None,
+                     namespace: str = 'search') -> str:
+    return cache_manager.key(namespace, search_digest(search_type, search_text, is_sub_recipe, filters))
+
+
+def cached_search(search_type: str, search_text: str, is_sub_recipe: bool, compute, filters: dict = None,
+                  namespace: str = 'search'):
+    """
+    Returns the cached result of ``compute()`` for the normalized search, computing it at most once
+    across concurrent requests. ``compute`` must return plain data (id lists, tuples of ids and scores).
+    Other results derived from a search (facet counts for instance) use their own namespace.
+    If the cache is unavailable the search simply runs uncached; errors of ``compute()`` propagate.
+    """
+    digest = search_digest(search_type, search_text, is_sub_recipe, filters)
+    return cache_manager.get_or_set(namespace, compute, digest)
@@ -0,0 +1,302 @@
+"""
+Full-text search over recipe titles, descriptions and ingredient names.
+
+On PostgreSQL every recipe row carries a weighted ``search_vector`` tsvector column backed by a
+GIN index. On SQLite (local development) the same documents live in an FTS5 virtual table.
+Both are created by migration 0047 and kept current through ``refresh_search_documents``,
+which the signal handlers in ``recipes/signals.py`` call after every commit.
+
+Ingredient searches use ``match_ingredients``: a single grouped query over ``RecipeIngredient``
+(served by the pg_trgm index from migration 0048) that scores each recipe by how many of the
+searched ingredients it contains.
+"""
+import re
+from functools import reduce
+from operator import or_, add
+
+from django.db import connection as default_connection
+from django.db.models import Case, When, IntegerField, QuerySet, Max, Q, F
+
+from ..models.recipe_models import RecipeIngredient
+
+# Searches return at most this many recipes, the views tell when a search reached it
+SEARCH_RESULTS_LIMIT = 200
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def tokenize_search_text(text: str) -> list:
+    """
+    Splits raw user input into lowercase word tokens.
+    Only word characters survive, so the tokens are safe to embed in tsquery/FTS5 query syntax.
+    """
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_ingredient_name(name: str) -> str:
+    """
+    Lowercase, single spaced ingredient name.
+    """
+    return _WHITESPACE_RE.sub(' ', name or '').strip().lower()
+
+
+def normalize_ingredient_terms(search_text: str) -> list:
+    """
+    Splits a comma separated ingredient search into normalized terms:
+    lowercase, single spaced, without blanks or duplicates, in the order they were typed.
+    """
+    if not search_text:
+        return []
+    terms = (normalize_ingredient_name(term) for term in search_text.split(','))
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+class PostgresSearchBackend:
+    """
+    Ranked search on a tsvector column: title weighs most (A), then description (B),
+    then ingredient names (C).
+    """
+    document_sql = (
+        "setweight(to_tsvector('english', coalesce(r.title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(r.description, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(("
+        "SELECT string_agg(i.name, ' ') FROM recipes_recipeingredient i WHERE i.recipe_id = r.id"
+        "), '')), 'C')"
+    )
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector")
+            cursor.execute("CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin "
+                           "ON recipes_recipe USING gin (search_vector)")
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("DROP INDEX IF EXISTS recipes_recipe_search_vector_gin")
+            cursor.execute("ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector")
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"UPDATE recipes_recipe AS r SET search_vector = {self.document_sql}")
+            return cursor.rowcount
+
+    def refresh(self, recipe_ids: list):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"UPDATE recipes_recipe AS r SET search_vector = {self.document_sql} "
+                           "WHERE r.id = ANY(%s)", [list(recipe_ids)])
+
+    def search(self, tokens: list, is_sub_recipe: bool, limit: int) -> list:
+        # Prefix matching on every token so results keep up with the HTMX as-you-type requests
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT r.id FROM recipes_recipe r, to_tsquery('english', %s) query "
+                "WHERE r.search_vector @@ query AND r.is_sub_recipe = %s "
+                "ORDER BY ts_rank_cd(r.search_vector, query) DESC, r.id DESC LIMIT %s",
+                [query, is_sub_recipe, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SqliteSearchBackend:
+    """
+    FTS5 fallback so search keeps working against the development SQLite database.
+    The virtual table rowid is the recipe id.
+    """
+    table = 'recipes_recipe_fts'
+    # bm25 column weights, mirrors the A/B/C weights of the PostgreSQL backend
+    column_weights = (10.0, 4.0, 1.0)
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                           "USING fts5(title, description, ingredients, tokenize='porter unicode61')")
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def _insert_sql(self, where: str = '') -> str:
+        return (f"INSERT INTO {self.table}(rowid, title, description, ingredients) "
+                "SELECT r.id, r.title, coalesce(r.description, ''), coalesce(("
+                "SELECT group_concat(i.name, ' ') FROM recipes_recipeingredient i WHERE i.recipe_id = r.id"
+                f"), '') FROM recipes_recipe r {where}")
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(self._insert_sql())
+            return cursor.rowcount
+
+    def refresh(self, recipe_ids: list):
+        recipe_ids = list(recipe_ids)
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", recipe_ids)
+            cursor.execute(self._insert_sql(f"WHERE r.id IN ({placeholders})"), recipe_ids)
+
+    def search(self, tokens: list, is_sub_recipe: bool, limit: int) -> list:
+        query = ' '.join(f'"{token}"*' for token in tokens)
+        weights = ', '.join(str(weight) for weight in self.column_weights)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {self.table}.rowid FROM {self.table} "
+                f"JOIN recipes_recipe r ON r.id = {self.table}.rowid "
+                f"WHERE {self.table} MATCH %s AND r.is_sub_recipe = %s "
+                f"ORDER BY bm25({self.table}, {weights}), {self.table}.rowid DESC LIMIT %s",
+                [query, is_sub_recipe, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+SEARCH_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+}
+
+
+def get_search_backend(connection=None):
+    """
+    Returns the full-text backend for the given connection (the default one if omitted),
+    or None when the database vendor has no full-text support here.
+    """
+    connection = connection or default_connection
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    return backend_class(connection) if backend_class else None
+
+
+def _get_memory_index():
+    # Imported lazily, the in-process index module depends on this one
+    from ..indexes.recipe_index import get_recipe_index
+    return get_recipe_index()
+
+
+def is_truncated(results) -> bool:
+    """
+    Whether a search stopped at ``SEARCH_RESULTS_LIMIT``, so more recipes may match than it returned.
+    """
+    return len(results) >= SEARCH_RESULTS_LIMIT
+
+
+def search_recipe_ids(search_text: str, is_sub_recipe: bool = False, limit: int = SEARCH_RESULTS_LIMIT) -> list:
+    """
+    Returns recipe ids matching the search text, best match first.
+    With the in-process backend enabled, titles are looked up there instead of the database.
+    """
+    recipe_index = _get_memory_index()
+    if recipe_index is not None:
+        return recipe_index.search_titles(search_text, is_sub_recipe, limit)
+    tokens = tokenize_search_text(search_text)
+    backend = get_search_backend()
+    if not tokens or backend is None:
+        return []
+    return backend.search(tokens, is_sub_recipe, limit)
+
+
+def match_ingredients(terms: list, is_sub_recipe: bool = False, match_all: bool = True,
+                      limit: int = SEARCH_RESULTS_LIMIT) -> list:
+    """
+    Returns (recipe_id, matched_terms) pairs, most matched terms first.
+    All terms are evaluated in one pass: ingredient rows matching any term are grouped per recipe
+    and every term contributes at most one point, so the HAVING clause replaces one join per term.
+    With match_all=False recipes matching only some of the terms are kept, ranked by their score.
+    """
+    if not terms:
+        return []
+    term_hits = {
+        f'term_{position}': Max(Case(When(name__icontains=term, then=1), default=0, output_field=IntegerField()))
+        for position, term in enumerate(terms)
+    }
+    rows = (RecipeIngredient.objects
+            .filter(reduce(or_, (Q(name__icontains=term) for term in terms)),
+                    recipe__is_sub_recipe=is_sub_recipe)
+            .values('recipe_id')
+            .annotate(**term_hits)
+            .annotate(matched=reduce(add, (F(alias) for alias in term_hits)))
+            .filter(matched__gte=len(terms) if match_all else 1)
+            .order_by('-matched', '-recipe_id')
+            .values_list('recipe_id', 'matched'))
+    return list(rows[:limit])
+
+
+def find_ingredient_matches(search_text: str, is_sub_recipe: bool = False, match_all: bool = True) -> tuple:
+    """
+    Runs an ingredient search and returns (matches, searched terms count) where matches are
+    (recipe_id, matched_terms) pairs as returned by ``match_ingredients``.
+    Exact (match all) searches are answered by the in-process index when it is enabled, which also
+    understands '|' alternatives and '-' exclusions; the grouped database query is the fallback.
+    """
+    recipe_index = _get_memory_index()
+    if match_all and recipe_index is not None:
+        from ..indexes.recipe_index import parse_ingredient_query
+        required, _ = parse_ingredient_query(search_text)
+        recipe_ids = recipe_index.search_ingredients(search_text, is_sub_recipe)
+        return [(recipe_id, len(required)) for recipe_id in recipe_ids], len(required)
+    terms = normalize_ingredient_terms(search_text)
+    return match_ingredients(terms, is_sub_recipe, match_all), len(terms)
+
+
+def _in_match_order(recipes, recipe_ids: list) -> list:
+    # Querysets are evaluated in the order of the matches, loaders (handlers/recipe_cards.py) are called with it
+    if isinstance(recipes, QuerySet):
+        return list(order_by_ids(recipes, recipe_ids))
+    return list(recipes(recipe_ids))
+
+
+def with_match_scores(recipes, matches: list, terms_count: int) -> list:
+    """
+    Loads the recipes of the matches in their order, from a queryset or a loader such as
+    ``recipe_cards.get_cards``, and attaches ``matched_ingredients`` and ``match_score``
+    (fraction of searched ingredients found) to every recipe.
+    """
+    matched_by_id = dict(matches)
+    recipes = _in_match_order(recipes, [recipe_id for recipe_id, _ in matches])
+    for recipe in recipes:
+        recipe.matched_ingredients = matched_by_id[recipe.pk]
+        recipe.match_score = recipe.matched_ingredients / terms_count
+    return recipes
+
+
+def with_pantry_coverage(recipes, matches: list) -> list:
+    """
+    Loads the recipes of the pantry matches (see indexes/pantry_index.py) in their order, like
+    ``with_match_scores``, and attaches ``owned_ingredients``, ``total_ingredients``, ``coverage``
+    and ``missing_ingredients``.
+    """
+    matches_by_id = {match.recipe_id: match for match in matches}
+    recipes = _in_match_order(recipes, list(matches_by_id))
+    for recipe in recipes:
+        match = matches_by_id[recipe.pk]
+        recipe.owned_ingredients = match.owned
+        recipe.total_ingredients = match.total
+        recipe.coverage = match.coverage
+        recipe.missing_ingredients = match.missing
+    return recipes
+
+
+def refresh_search_documents(recipe_ids) -> None:
+    """
+    Re-indexes the given recipes. Ids of deleted recipes are simply dropped from the index.
+    """
+    recipe_ids = [recipe_id for recipe_id in recipe_ids if recipe_id is not None]
+    backend = get_search_backend()
+    if recipe_ids and backend is not None:
+        backend.refresh(recipe_ids)
+
+
+def order_by_ids(queryset: QuerySet, recipe_ids: list) -> QuerySet:
+    """
+    Restricts the queryset to the given ids and keeps them in the given (ranked) order.
+    """
+    if not recipe_ids:
+        return queryset.none()
+    ranking = Case(*[When(pk=pk, then=position) for position, pk in enumerate(recipe_ids)],
+                   output_field=IntegerField())
+    return queryset.filter(pk__in=recipe_ids).order_by(ranking)
@@ -0,0 +1,129 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class LocalIndex:
+    """
+    Base class for indexes that live in the memory of each worker process.
+
+    The index is built lazily from the database on first use. Changes made in this worker are
+    applied incrementally through ``recipes_changed`` (called from model signals after commit)
+    and published to the other workers through the shared cache:
+    a generation counter plus, per generation, the list of recipe ids that changed.
+    Workers that fall behind replay those change lists, and rebuild from scratch only if
+    the change log has already expired.
+    """
+    name = None
+    # Seconds between two checks of the shared generation counter
+    check_interval = 5
+    # How long the per-generation change lists stay available to lagging workers
+    change_log_timeout = 60 * 60
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._generation = None
+        self._checked_at = 0.0
+
+    def build(self) -> None:
+        """
+        Loads the whole index from the database.
+        """
+        raise NotImplementedError
+
+    def apply(self, recipe_ids: set) -> None:
+        """
+        Reloads the given recipes from the database, dropping those that no longer exist.
+        """
+        raise NotImplementedError
+
+    @property
+    def generation_key(self) -> str:
+        return f'local_index:{self.name}:generation'
+
+    def _change_key(self, generation: int) -> str:
+        return f'local_index:{self.name}:changes:{generation}'
+
+    def _shared_generation(self):
+        try:
+            return cache.get(self.generation_key, 0)
+        except Exception:
+            # Without the shared cache every worker can only rely on its own changes
+            return self._generation
+
+    def ensure_ready(self) -> None:
+        """
+        Builds the index on first use and catches up with changes published by other workers.
+        """
+        now = time.monotonic()
+        if self._built and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            shared_generation = self._shared_generation()
+            if not self._built:
+                self.build()
+                self._built = True
+            elif shared_generation != self._generation:
+                self._catch_up(shared_generation)
+            self._generation = shared_generation
+            self._checked_at = now
+
+    def _catch_up(self, shared_generation) -> None:
+        if not isinstance(self._generation, int) or not isinstance(shared_generation, int) \
+                or shared_generation < self._generation:
+            self.build()
+            return
+        keys = [self._change_key(generation) for generation in range(self._generation + 1, shared_generation + 1)]
+        try:
+            change_lists = cache.get_many(keys)
+        except Exception:
+            change_lists = {}
+        if len(change_lists) != len(keys):
+            self.build()
+            return
+        changed = set()
+        for recipe_ids in change_lists.values():
+            changed.update(recipe_ids)
+        self.apply(changed)
+
+    def recipes_changed(self, recipe_ids) -> None:
+        """
+        Applies committed changes locally and publishes them to the other workers.
+        """
+        recipe_ids = {recipe_id for recipe_id in recipe_ids if recipe_id is not None}
+        if not recipe_ids:
+            return
+        with self._lock:
+            if self._built:
+                self.apply(recipe_ids)
+            try:
+                cache.add(self.generation_key, 0, timeout=None)
+                generation = cache.incr(self.generation_key)
+                cache.set(self._change_key(generation), list(recipe_ids), timeout=self.change_log_timeout)
+            except Exception:
+                return
+            # Only skip ahead when no other worker published in between, otherwise replay on next check
+            if self._generation == generation - 1:
+                self._generation = generation
+
+    def request_rebuild(self) -> None:
+        """
+        Makes every worker rebuild the index from the database on its next check:
+        a generation published without a change list cannot be replayed.
+        """
+        self.reset()
+        try:
+            cache.add(self.generation_key, 0, timeout=None)
+            cache.incr(self.generation_key)
+        except Exception:
+            pass
+
+    def reset(self) -> None:
+        """
+        Drops the in-memory data, the next access rebuilds it.
+        """
+        with self._lock:
+            self._built = False
+            self._generation = None
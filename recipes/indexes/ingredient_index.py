@@ -0,0 +1,118 @@
+"""
+In-process prefix index of ingredient names for autocomplete.
+
+Distinct normalized names are kept with the number of ingredient rows using them. Every word of a
+name is an entry point, so "bre" suggests "bread" as well as "chicken breast". Entries live in a
+sorted list searched with bisect, and the best suggestions per prefix are memoized until one of
+their names changes, so a lookup is a dictionary hit in the common case.
+"""
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+
+from ..handlers.search_handler import normalize_ingredient_name
+from ..models.recipe_models import RecipeIngredient
+from .base import LocalIndex
+
+SUGGESTIONS_LIMIT = 10
+
+
+class IngredientNameIndex(LocalIndex):
+    """
+    Sorted (word suffix of the name, name) entries plus the usage count of every name.
+    """
+    name = 'ingredient_names'
+    # Memoized prefixes per worker
+    max_memoized_prefixes = 5000
+
+    def __init__(self):
+        super().__init__()
+        self._reset_data()
+
+    def _reset_data(self):
+        self.entries = []
+        self.usage = Counter()
+        self.recipe_names = {}
+        self._memo = {}
+
+    @staticmethod
+    def _entry_points(name: str):
+        words = name.split(' ')
+        return {' '.join(words[position:]) for position in range(len(words))}
+
+    def _add_name(self, name: str):
+        if not self.usage[name]:
+            for entry_point in self._entry_points(name):
+                insort(self.entries, (entry_point, name))
+        self.usage[name] += 1
+
+    def _remove_name(self, name: str):
+        self.usage[name] -= 1
+        if self.usage[name] > 0:
+            return
+        del self.usage[name]
+        for entry_point in self._entry_points(name):
+            position = bisect_left(self.entries, (entry_point, name))
+            if position < len(self.entries) and self.entries[position] == (entry_point, name):
+                del self.entries[position]
+
+    def _load(self, rows):
+        for recipe_id, raw_name in rows:
+            name = normalize_ingredient_name(raw_name)
+            if name:
+                self.recipe_names.setdefault(recipe_id, []).append(name)
+                self._add_name(name)
+
+    def build(self):
+        self._reset_data()
+        self._load(RecipeIngredient.objects.values_list('recipe_id', 'name').iterator())
+
+    def apply(self, recipe_ids):
+        changed = set()
+        for recipe_id in recipe_ids:
+            for name in self.recipe_names.pop(recipe_id, ()):
+                changed.add(name)
+                self._remove_name(name)
+        self._load(RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list('recipe_id', 'name'))
+        for recipe_id in recipe_ids:
+            changed.update(self.recipe_names.get(recipe_id, ()))
+        self._forget_prefixes_of(changed)
+
+    def _forget_prefixes_of(self, names):
+        # Only the memoized prefixes matching one of the changed names are stale
+        entry_points = set()
+        for name in names:
+            entry_points.update(self._entry_points(name))
+        self._memo = {
+            key: suggestions for key, suggestions in self._memo.items()
+            if not any(entry_point.startswith(key[0]) for entry_point in entry_points)
+        }
+
+    def suggest(self, prefix: str, limit: int = SUGGESTIONS_LIMIT) -> list:
+        """
+        Returns up to ``limit`` names having a word starting with the prefix, most used first.
+        """
+        prefix = normalize_ingredient_name(prefix)
+        if not prefix:
+            return []
+        self.ensure_ready()
+        with self._lock:
+            key = (prefix, limit)
+            suggestions = self._memo.get(key)
+            if suggestions is None:
+                suggestions = self._suggest(prefix, limit)
+                if len(self._memo) >= self.max_memoized_prefixes:
+                    self._memo.clear()
+                self._memo[key] = suggestions
+        return suggestions
+
+    def _suggest(self, prefix, limit):
+        names = set()
+        position = bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and self.entries[position][0].startswith(prefix):
+            names.add(self.entries[position][1])
+            position += 1
+        return heapq.nsmallest(limit, names, key=lambda name: (-self.usage[name], name))
+
+
+ingredient_index = IngredientNameIndex()
@@ -0,0 +1,161 @@
+"""
+In-process recipe x ingredient matrix for the "what can I cook" pantry search.
+
+Every distinct normalized ingredient name is a column and every recipe a row. The matrix is kept
+as two aligned NumPy arrays of (row, column) coordinates, so scoring every recipe against a
+pantry is one gather plus one ``bincount``: the number of owned ingredients per row, divided by
+the number of ingredients of the row. Changed recipes are refreshed incrementally by masking out
+their coordinates and appending the new ones.
+
+A pantry item owns every ingredient name containing all of its words, so "chicken" owns
+"chicken breast" and "chicken stock".
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from ..handlers.search_handler import normalize_ingredient_name, normalize_ingredient_terms, \
+    tokenize_search_text, SEARCH_RESULTS_LIMIT
+from ..models.recipe_models import Recipe, RecipeIngredient
+from .base import LocalIndex
+
+
+class PantryMatch(NamedTuple):
+    recipe_id: int
+    coverage: float
+    owned: int
+    total: int
+    missing: list
+
+
+class PantryIndex(LocalIndex):
+    """
+    Sparse recipe x ingredient-name matrix with a token -> names lookup for pantry items.
+    """
+    name = 'pantry'
+
+    def __init__(self):
+        super().__init__()
+        self._reset_data()
+
+    def _reset_data(self):
+        self.names = []
+        self.name_ids = {}
+        self.token_names = {}
+        self.row_ids = {}
+        self.row_recipe_ids = np.zeros(0, dtype=np.int64)
+        self.row_is_sub = np.zeros(0, dtype=bool)
+        self.row_totals = np.zeros(0, dtype=np.int32)
+        self.rows = np.zeros(0, dtype=np.int32)
+        self.columns = np.zeros(0, dtype=np.int32)
+
+    def _name_id(self, name: str) -> int:
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+            for token in set(tokenize_search_text(name)):
+                self.token_names.setdefault(token, set()).add(name_id)
+        return name_id
+
+    def _load(self, recipe_ids=None):
+        """
+        Returns (row ids, column ids) coordinates of the given recipes (all when None)
+        and updates the row attributes.
+        """
+        recipes = Recipe.objects.all() if recipe_ids is None else Recipe.objects.filter(pk__in=recipe_ids)
+        ingredients = RecipeIngredient.objects.all() if recipe_ids is None \
+            else RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        names_by_recipe = {}
+        for recipe_id, raw_name in ingredients.values_list('recipe_id', 'name').iterator():
+            name = normalize_ingredient_name(raw_name)
+            if name:
+                names_by_recipe.setdefault(recipe_id, set()).add(self._name_id(name))
+
+        new_rows = []
+        rows, columns = [], []
+        for recipe_id, is_sub_recipe in recipes.values_list('id', 'is_sub_recipe').iterator():
+            row = self.row_ids.get(recipe_id)
+            if row is None:
+                row = self.row_ids[recipe_id] = len(self.row_ids)
+                new_rows.append((recipe_id, is_sub_recipe))
+            else:
+                self.row_is_sub[row] = is_sub_recipe
+            name_ids = names_by_recipe.get(recipe_id, ())
+            rows.extend([row] * len(name_ids))
+            columns.extend(name_ids)
+        if new_rows:
+            self.row_recipe_ids = np.concatenate([self.row_recipe_ids, [recipe_id for recipe_id, _ in new_rows]])
+            self.row_is_sub = np.concatenate([self.row_is_sub, [is_sub for _, is_sub in new_rows]])
+            self.row_totals = np.concatenate([self.row_totals, np.zeros(len(new_rows), dtype=np.int32)])
+        return np.asarray(rows, dtype=np.int32), np.asarray(columns, dtype=np.int32)
+
+    def _count_totals(self):
+        self.row_totals = np.bincount(self.rows, minlength=len(self.row_ids)).astype(np.int32)
+
+    def build(self):
+        self._reset_data()
+        self.rows, self.columns = self._load()
+        self._count_totals()
+
+    def apply(self, recipe_ids):
+        stale_rows = [self.row_ids[recipe_id] for recipe_id in recipe_ids if recipe_id in self.row_ids]
+        if stale_rows:
+            keep = ~np.isin(self.rows, stale_rows)
+            self.rows, self.columns = self.rows[keep], self.columns[keep]
+        rows, columns = self._load(recipe_ids)
+        self.rows = np.concatenate([self.rows, rows])
+        self.columns = np.concatenate([self.columns, columns])
+        # Deleted recipes keep their row, with no ingredients it never matches
+        self._count_totals()
+
+    def owned_names(self, pantry: list) -> np.ndarray:
+        """
+        Boolean vector over the name columns: True for the names owned by one of the pantry items.
+        """
+        owned = np.zeros(len(self.names), dtype=bool)
+        for item in pantry:
+            tokens = tokenize_search_text(item)
+            if not tokens:
+                continue
+            name_ids = set(self.token_names.get(tokens[0], ()))
+            for token in tokens[1:]:
+                name_ids &= self.token_names.get(token, set())
+            owned[list(name_ids)] = True
+        return owned
+
+    def search(self, pantry_text: str, is_sub_recipe: bool = False, limit: int = SEARCH_RESULTS_LIMIT) -> list:
+        """
+        Ranks recipes by the fraction of their ingredients found in the pantry (a comma separated
+        list), then by the number of owned ingredients. Returns ``PantryMatch`` tuples listing the
+        missing ingredients of every returned recipe.
+        """
+        pantry = normalize_ingredient_terms(pantry_text)
+        if not pantry:
+            return []
+        self.ensure_ready()
+        with self._lock:
+            owned_names = self.owned_names(pantry)
+            owned_cells = owned_names[self.columns]
+            owned = np.bincount(self.rows[owned_cells], minlength=len(self.row_ids))
+            candidates = np.flatnonzero((owned > 0) & (self.row_is_sub == is_sub_recipe))
+            if not len(candidates):
+                return []
+            coverage = owned[candidates] / self.row_totals[candidates]
+            # lexsort sorts by the last key first: coverage, then owned count, then newest
+            order = np.lexsort((-self.row_recipe_ids[candidates], -owned[candidates], -coverage))[:limit]
+            best_rows = candidates[order]
+            missing_by_row = {}
+            best_row_mask = np.zeros(len(self.row_ids), dtype=bool)
+            best_row_mask[best_rows] = True
+            missing_cells = best_row_mask[self.rows] & ~owned_cells
+            for row, column in zip(self.rows[missing_cells].tolist(), self.columns[missing_cells].tolist()):
+                missing_by_row.setdefault(row, []).append(self.names[column])
+            return [
+                PantryMatch(int(self.row_recipe_ids[row]), float(owned[row] / self.row_totals[row]),
+                            int(owned[row]), int(self.row_totals[row]), sorted(missing_by_row.get(row, [])))
+                for row in best_rows.tolist()
+            ]
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,225 @@
+"""
+In-process inverted index for ingredient and title searches.
+
+Posting lists are sorted NumPy ``uint32`` arrays of recipe ids: four bytes per posting whatever the
+highest id, and AND/OR/NOT queries become ``intersect1d``, ``union1d`` and ``setdiff1d`` running in
+C. Recipes are merged in batches (one ``union1d`` per token for a whole build), so building the
+index stays close to linear. Enabled with ``RECIPE_SEARCH_BACKEND = 'memory'``; the database
+queries in ``search_handler`` remain the default and the fallback.
+"""
+from bisect import bisect_left
+
+import numpy as np
+from django.conf import settings
+
+from ..handlers.search_handler import tokenize_search_text, SEARCH_RESULTS_LIMIT
+from ..models.recipe_models import Recipe, RecipeIngredient
+from .base import LocalIndex
+
+EMPTY = np.empty(0, dtype=np.uint32)
+
+
+def sorted_ids(recipe_ids) -> np.ndarray:
+    return np.unique(np.asarray(recipe_ids, dtype=np.uint32))
+
+
+def union_all(arrays) -> np.ndarray:
+    arrays = [array for array in arrays if len(array)]
+    if not arrays:
+        return EMPTY
+    return arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+
+
+class TokenPostingsIndex:
+    """
+    token -> sorted array of recipe ids, with a sorted vocabulary for prefix lookups
+    and the reverse mapping needed to remove a recipe.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.recipe_tokens = {}
+
+    def add_many(self, tokens_by_recipe: dict) -> None:
+        """
+        Adds recipes given as {recipe id: tokens}, merging each token's new ids at once.
+        """
+        new_ids = {}
+        for recipe_id, tokens in tokens_by_recipe.items():
+            tokens = frozenset(tokens)
+            if not tokens:
+                continue
+            self.recipe_tokens[recipe_id] = tokens
+            for token in tokens:
+                new_ids.setdefault(token, []).append(recipe_id)
+        new_tokens = []
+        for token, recipe_ids in new_ids.items():
+            ids = self.postings.get(token)
+            if ids is None:
+                new_tokens.append(token)
+                self.postings[token] = sorted_ids(recipe_ids)
+            else:
+                self.postings[token] = np.union1d(ids, sorted_ids(recipe_ids))
+        if new_tokens:
+            self.vocabulary.extend(new_tokens)
+            self.vocabulary.sort()
+
+    def remove(self, recipe_id: int) -> None:
+        for token in self.recipe_tokens.pop(recipe_id, ()):
+            ids = self.postings[token]
+            ids = ids[ids != recipe_id]
+            if len(ids):
+                self.postings[token] = ids
+            else:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def prefix_ids(self, prefix: str) -> np.ndarray:
+        """
+        Union of the postings of every token starting with the prefix.
+        """
+        arrays = []
+        position = bisect_left(self.vocabulary, prefix)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(prefix):
+            arrays.append(self.postings[self.vocabulary[position]])
+            position += 1
+        return union_all(arrays)
+
+    def term_ids(self, term: str) -> np.ndarray:
+        """
+        Recipes containing every word of the term (each word matched as a prefix).
+        """
+        tokens = tokenize_search_text(term)
+        if not tokens:
+            return EMPTY
+        ids = self.prefix_ids(tokens[0])
+        for token in tokens[1:]:
+            if not len(ids):
+                break
+            ids = np.intersect1d(ids, self.prefix_ids(token), assume_unique=True)
+        return ids
+
+
+def parse_ingredient_query(search_text: str) -> tuple:
+    """
+    Parses "chicken | beef, rice, -peanut" into ([['chicken', 'beef'], ['rice']], ['peanut']):
+    comma separated clauses are ANDed, '|' separates alternatives inside a clause
+    and a leading '-' excludes recipes containing the ingredient.
+    """
+    required, excluded = [], []
+    for clause in (search_text or '').split(','):
+        clause = clause.strip()
+        if clause.startswith('-'):
+            term = clause[1:].strip()
+            if term:
+                excluded.append(term)
+        elif clause:
+            alternatives = [alternative.strip() for alternative in clause.split('|') if alternative.strip()]
+            if alternatives:
+                required.append(alternatives)
+    return required, excluded
+
+
+def highest_ids(ids: np.ndarray, limit: int) -> list:
+    """
+    Returns up to ``limit`` ids from the sorted array, highest (newest) first.
+    """
+    return ids[::-1][:limit].tolist()
+
+
+class InvertedRecipeIndex(LocalIndex):
+    """
+    Ingredient and title token indexes for all recipes of this worker.
+    """
+    name = 'recipe_tokens'
+
+    def __init__(self):
+        super().__init__()
+        self._reset_data()
+
+    def _reset_data(self):
+        self.ingredients = TokenPostingsIndex()
+        self.titles = TokenPostingsIndex()
+        # Recipe ids of each kind, keyed by is_sub_recipe
+        self.scopes = {False: EMPTY, True: EMPTY}
+
+    def _remove_recipe(self, recipe_id):
+        for is_sub_recipe, ids in self.scopes.items():
+            self.scopes[is_sub_recipe] = ids[ids != recipe_id]
+        self.titles.remove(recipe_id)
+        self.ingredients.remove(recipe_id)
+
+    def _load(self, recipes, ingredients):
+        ingredient_tokens = {}
+        for recipe_id, name in ingredients.values_list('recipe_id', 'name'):
+            ingredient_tokens.setdefault(recipe_id, set()).update(tokenize_search_text(name))
+        title_tokens, kinds = {}, {False: [], True: []}
+        for recipe_id, title, is_sub_recipe in recipes.values_list('id', 'title', 'is_sub_recipe'):
+            title_tokens[recipe_id] = tokenize_search_text(title)
+            kinds[is_sub_recipe].append(recipe_id)
+        for is_sub_recipe, recipe_ids in kinds.items():
+            if recipe_ids:
+                self.scopes[is_sub_recipe] = np.union1d(self.scopes[is_sub_recipe], sorted_ids(recipe_ids))
+        self.titles.add_many(title_tokens)
+        # Ingredients of recipes missing from ``recipes`` (deleted meanwhile) are not indexed
+        self.ingredients.add_many({recipe_id: tokens for recipe_id, tokens in ingredient_tokens.items()
+                                   if recipe_id in title_tokens})
+        return set(title_tokens)
+
+    def build(self):
+        self._reset_data()
+        self._load(Recipe.objects.all(), RecipeIngredient.objects.all())
+
+    def apply(self, recipe_ids):
+        for recipe_id in recipe_ids:
+            self._remove_recipe(recipe_id)
+        self._load(Recipe.objects.filter(pk__in=recipe_ids),
+                   RecipeIngredient.objects.filter(recipe_id__in=recipe_ids))
+
+    def _scope(self, is_sub_recipe: bool) -> np.ndarray:
+        return self.scopes[bool(is_sub_recipe)]
+
+    def search_ingredients(self, search_text: str, is_sub_recipe: bool = False,
+                           limit: int = SEARCH_RESULTS_LIMIT) -> list:
+        """
+        Evaluates an ingredient query (see ``parse_ingredient_query``), newest recipes first.
+        """
+        required, excluded = parse_ingredient_query(search_text)
+        if not required:
+            return []
+        self.ensure_ready()
+        with self._lock:
+            ids = self._scope(is_sub_recipe)
+            for alternatives in required:
+                clause_ids = union_all([self.ingredients.term_ids(term) for term in alternatives])
+                ids = np.intersect1d(ids, clause_ids, assume_unique=True)
+                if not len(ids):
+                    return []
+            for term in excluded:
+                ids = np.setdiff1d(ids, self.ingredients.term_ids(term), assume_unique=True)
+        return highest_ids(ids, limit)
+
+    def search_titles(self, search_text: str, is_sub_recipe: bool = False,
+                      limit: int = SEARCH_RESULTS_LIMIT) -> list:
+        """
+        Recipes whose title contains every word of the search text as a prefix, newest first.
+        """
+        if not tokenize_search_text(search_text):
+            return []
+        self.ensure_ready()
+        with self._lock:
+            ids = np.intersect1d(self._scope(is_sub_recipe), self.titles.term_ids(search_text), assume_unique=True)
+        return highest_ids(ids, limit)
+
+
+recipe_index = InvertedRecipeIndex()
+
+
+def get_recipe_index():
+    """
+    Returns the in-process index when it is the configured search backend, None otherwise.
+    """
+    if getattr(settings, 'RECIPE_SEARCH_BACKEND', 'database') == 'memory':
+        return recipe_index
+    return None
@@ -0,0 +1,152 @@
+"""
+"Did you mean" corrections for searches that return nothing.
+
+The vocabulary is made of the words of recipe titles and ingredient names, each counted once per
+recipe that uses it. It is indexed with the symmetric delete algorithm (SymSpell): every word is
+stored under all the strings obtained by deleting up to ``max_distance`` characters from its
+prefix. A misspelled word generates its own deletes and looks them up, so the candidates come from
+a few dictionary hits instead of an edit distance pass over the whole vocabulary; only those few
+candidates are checked with the real (Damerau-Levenshtein) distance.
+"""
+from collections import Counter
+
+from ..handlers.search_handler import tokenize_search_text
+from ..models.recipe_models import Recipe, RecipeIngredient
+from .base import LocalIndex
+
+MIN_WORD_LENGTH = 3
+
+
+def edit_distance(first: str, second: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (adjacent transpositions count as one edit),
+    or ``max_distance + 1`` as soon as it is known to exceed ``max_distance``.
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    previous_previous, previous = None, list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i] + [0] * len(second)
+        for j, second_char in enumerate(second, 1):
+            cost = first_char != second_char
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first_char == second[j - 2] and first[i - 2] == second_char:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+class SpellingIndex(LocalIndex):
+    """
+    Word frequencies of titles and ingredient names with their symmetric delete variants.
+    """
+    name = 'spelling'
+    max_distance = 2
+    # Only the start of long words is used for the deletes, which bounds the index size
+    prefix_length = 7
+
+    def __init__(self):
+        super().__init__()
+        self._reset_data()
+
+    def _reset_data(self):
+        self.frequencies = Counter()
+        self.deletes = {}
+        self.recipe_words = {}
+
+    def _variants(self, word: str) -> set:
+        variants = {word[:self.prefix_length]}
+        edge = set(variants)
+        for _ in range(self.max_distance):
+            edge = {variant[:position] + variant[position + 1:]
+                    for variant in edge if len(variant) > 1 for position in range(len(variant))}
+            variants |= edge
+        return variants
+
+    def _add_word(self, word: str):
+        if not self.frequencies[word]:
+            for variant in self._variants(word):
+                self.deletes.setdefault(variant, set()).add(word)
+        self.frequencies[word] += 1
+
+    def _remove_word(self, word: str):
+        self.frequencies[word] -= 1
+        if self.frequencies[word] > 0:
+            return
+        del self.frequencies[word]
+        for variant in self._variants(word):
+            words = self.deletes.get(variant)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self.deletes[variant]
+
+    def _load(self, recipes, ingredients):
+        words_by_recipe = {}
+        for recipe_id, title in recipes.values_list('id', 'title').iterator():
+            words_by_recipe.setdefault(recipe_id, set()).update(tokenize_search_text(title))
+        for recipe_id, name in ingredients.values_list('recipe_id', 'name').iterator():
+            if recipe_id in words_by_recipe:
+                words_by_recipe[recipe_id].update(tokenize_search_text(name))
+        for recipe_id, words in words_by_recipe.items():
+            words = frozenset(word for word in words if len(word) >= MIN_WORD_LENGTH and word.isalpha())
+            self.recipe_words[recipe_id] = words
+            for word in words:
+                self._add_word(word)
+
+    def build(self):
+        self._reset_data()
+        self._load(Recipe.objects.all(), RecipeIngredient.objects.all())
+
+    def apply(self, recipe_ids):
+        for recipe_id in recipe_ids:
+            for word in self.recipe_words.pop(recipe_id, ()):
+                self._remove_word(word)
+        self._load(Recipe.objects.filter(pk__in=recipe_ids), RecipeIngredient.objects.filter(recipe_id__in=recipe_ids))
+
+    def correct_word(self, word: str) -> str:
+        """
+        Returns the closest known word (fewest edits, then most used), the word itself when it is
+        known, too short to correct or has no candidate.
+        """
+        self.ensure_ready()
+        with self._lock:
+            if len(word) < MIN_WORD_LENGTH or not word.isalpha() or word in self.frequencies:
+                return word
+            candidates = set()
+            for variant in self._variants(word):
+                candidates.update(self.deletes.get(variant, ()))
+            best, best_key = word, None
+            for candidate in candidates:
+                distance = edit_distance(word, candidate, self.max_distance)
+                if distance > self.max_distance:
+                    continue
+                key = (distance, -self.frequencies[candidate], candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+            return best
+
+    def suggest(self, search_text: str, search_type: str = 'title'):
+        """
+        Returns the corrected search text, or None when every word is already known.
+        Ingredient searches keep their comma separated terms.
+        """
+        if search_type == 'title':
+            terms = [search_text]
+        else:
+            terms = search_text.split(',')
+        corrected_terms = []
+        changed = False
+        for term in terms:
+            words = tokenize_search_text(term)
+            corrected = [self.correct_word(word) for word in words]
+            changed = changed or corrected != words
+            corrected_terms.append(' '.join(corrected))
+        if not changed:
+            return None
+        return ', '.join(term for term in corrected_terms if term)
+
+
+spelling_index = SpellingIndex()
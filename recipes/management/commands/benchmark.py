@@ -0,0 +1,183 @@
+import pickle
+import random
+import statistics
+import time
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import ExifTags, Image
+
+from recipes.handlers import filter_handler, recipe_details, search_cache
+from recipes.models.recipe_models import Category, Recipe, RecipeIngredient, RecipeStep, RecipeSubRecipe, Tag
+from utils.models import ImagePipeline
+
+"""
+Management command to benchmark the recipe list against generated data.
+
+Usage:
+    python manage.py benchmark facets --recipes 100000 --repeat 20
+    python manage.py benchmark images --repeat 5
+
+The data is created inside a transaction that is rolled back at the end, so the command
+can be pointed at a development database without leaving anything behind.
+Timings are reported as median / p95 in milliseconds.
+
+Targets:
+- facets: category/tag facet counts, computed directly and served from the cache.
+- detail_payload: size and load time of a cached detail page, as the pickled Recipe instance with
+  its prefetched relations (the former format) and as the compact row of handlers/recipe_details.py.
+- images: processing of a phone-sized JPEG, PNG and HEIC upload (original and thumbnail), decoding
+  it once with utils.models.ImagePipeline and with the former convert then re-decode steps.
+  Runs on generated pictures, no recipes are generated for it.
+"""
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark recipe list operations against generated data (rolled back afterwards)'
+    targets = ('facets', 'detail_payload', 'images')
+    # Targets running without generated recipes
+    standalone_targets = ('images',)
+    batch_size = 5000
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=self.targets)
+        parser.add_argument('--recipes', type=int, default=100_000, help='Number of recipes to generate')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per measurement')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, target, recipes, repeat, seed, **kwargs):
+        self.random = random.Random(seed)
+        if target in self.standalone_targets:
+            getattr(self, f'benchmark_{target}')(repeat)
+            return
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                self.seed_recipes(recipes)
+                self.stdout.write(f'Generated {recipes} recipes in {time.perf_counter() - started:.1f}s')
+                getattr(self, f'benchmark_{target}')(repeat)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Generated data rolled back')
+
+    def seed_recipes(self, count):
+        author = User.objects.create(username=f'benchmark-{self.random.getrandbits(32)}')
+        self.categories = [Category.objects.get_or_create(name=f'bench-cat-{n}')[0].pk for n in range(20)]
+        self.tags = [Tag.objects.get_or_create(name=f'bench-tag-{n}')[0].pk for n in range(40)]
+        category_links, tag_links = [], []
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            created = Recipe.objects.bulk_create(
+                Recipe(title=f'Recipe {offset + n}', author=author) for n in range(size))
+            for recipe in created:
+                for category_id in self.random.sample(self.categories, self.random.randint(1, 3)):
+                    category_links.append(Recipe.categories.through(recipe_id=recipe.pk, category_id=category_id))
+                for tag_id in self.random.sample(self.tags, self.random.randint(0, 4)):
+                    tag_links.append(Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id))
+        Recipe.categories.through.objects.bulk_create(category_links, batch_size=self.batch_size)
+        Recipe.tags.through.objects.bulk_create(tag_links, batch_size=self.batch_size)
+
+    def measure(self, label, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f'  {label:<40} median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms')
+
+    def benchmark_facets(self, repeat):
+        scenarios = {
+            'no filters': {},
+            'one category': {'category': self.categories[:1]},
+            'two categories + tag': {'category': self.categories[:2], 'tag': self.tags[:1]},
+        }
+        base_queryset = Recipe.objects.filter(is_sub_recipe=False)
+        search_cache.bump_generation()
+        for name, filters in scenarios.items():
+            self.stdout.write(name)
+            self.measure('computed (grouped queries)', lambda: filter_handler.facet_counts(base_queryset, filters), repeat)
+            filter_handler.get_facet_counts(filters)
+            self.measure('cached', lambda: filter_handler.get_facet_counts(filters), repeat)
+
+    def benchmark_detail_payload(self, repeat):
+        recipes = list(Recipe.objects.filter(title__startswith='Recipe ').order_by('-pk')[:50])
+        ingredients, steps, links = [], [], []
+        for index, recipe in enumerate(recipes):
+            ingredients += [RecipeIngredient(recipe=recipe, name=f'ingredient {n}', quantity=str(n), measurement='gram')
+                            for n in range(self.random.randint(5, 15))]
+            steps += [RecipeStep(recipe=recipe, order=n, description=f'Step {n} of {recipe.title}. ' * 4)
+                      for n in range(self.random.randint(3, 10))]
+            if index % 5 == 0 and index + 1 < len(recipes):
+                links.append(RecipeSubRecipe(parent_recipe=recipe, sub_recipe=recipes[index + 1]))
+        RecipeIngredient.objects.bulk_create(ingredients)
+        RecipeStep.objects.bulk_create(steps)
+        RecipeSubRecipe.objects.bulk_create(links)
+        prefetch = ('steps', 'ingredients', 'parent_recipe', 'categories', 'tags')
+        pickled = [pickle.dumps(recipe, pickle.HIGHEST_PROTOCOL)
+                   for recipe in Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes]).prefetch_related(*prefetch)]
+        compact = [pickle.dumps(recipe_details.load_detail_row(recipe.pk), pickle.HIGHEST_PROTOCOL) for recipe in recipes]
+        for label, payloads in (('model instance', pickled), ('compact row', compact)):
+            self.stdout.write(f'{label}: {statistics.mean(map(len, payloads)):.0f} bytes on average')
+        self.measure('load model instances', lambda: [pickle.loads(payload) for payload in pickled], repeat)
+        self.measure('load compact rows into RecipeDetail',
+                     lambda: [recipe_details.RecipeDetail.from_row(pickle.loads(payload)) for payload in compact], repeat)
+
+    def sample_image(self, size, format):
+        # Noise compresses like a photo, a flat picture would make every codec look fast
+        bands = [Image.effect_noise(size, 40 + 10 * band) for band in range(3)]
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6
+        buffer = BytesIO()
+        Image.merge('RGB', bands).save(buffer, format=format, exif=exif.tobytes())
+        return buffer.getvalue()
+
+    @staticmethod
+    def legacy_processing(data, is_jpeg, thumbnail_size=(600, 600)):
+        """
+        The former steps: the JPEG conversion of the upload form, then create_thumbnail re-decoding its output.
+        """
+        source = BytesIO(data)
+        if not is_jpeg:
+            buffer = BytesIO()
+            Image.open(source).convert('RGB').save(buffer, format='JPEG', quality=95)
+            buffer.seek(0)
+            source = BytesIO(buffer.read())
+        img = Image.open(source)
+        for orientation in ExifTags.TAGS.keys():
+            if ExifTags.TAGS[orientation] == 'Orientation':
+                break
+        exif = img.getexif()
+        if exif.get(orientation) == 6:
+            img = img.rotate(270, expand=True)
+        img.thumbnail(thumbnail_size)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        buffer = BytesIO()
+        img.save(buffer, format='JPEG', quality=90)
+        buffer.seek(0)
+        return buffer.read()
+
+    @staticmethod
+    def pipeline_processing(data, is_jpeg, thumbnail_size=(600, 600)):
+        if is_jpeg:
+            # JPEG uploads are stored as is, only the thumbnail is encoded
+            return ImagePipeline(BytesIO(data), max_size=thumbnail_size).encode('thumb.jpg', thumbnail_size, quality=90)
+        pipeline = ImagePipeline(BytesIO(data))
+        pipeline.encode('photo.jpg', quality=95)
+        return pipeline.encode('thumb.jpg', thumbnail_size, quality=90)
+
+    def benchmark_images(self, repeat):
+        for format in ('JPEG', 'PNG', 'HEIF'):
+            data = self.sample_image((4032, 3024), format)
+            self.stdout.write(f'{format}: 4032x3024, {len(data) / 1024:.0f} KB')
+            is_jpeg = format == 'JPEG'
+            self.measure('convert then re-decode (former)', lambda: self.legacy_processing(data, is_jpeg), repeat)
+            self.measure('single decode pipeline', lambda: self.pipeline_processing(data, is_jpeg), repeat)
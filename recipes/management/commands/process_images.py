@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipes.handlers import image_jobs
+
+"""
+Management command running the image processing jobs queued by the uploads.
+
+Usage:
+    python manage.py process_images            # worker, polls the queue until stopped
+    python manage.py process_images --once     # runs the due jobs, then exits
+    python manage.py process_images --backfill-variants --once
+                                               # also queues the responsive variants of older images
+
+Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED (see recipes/handlers/image_jobs.py),
+so several workers can run at once.
+"""
+
+
+class Command(BaseCommand):
+    help = 'Convert and thumbnail the uploaded recipe images in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due')
+        parser.add_argument('--batch', type=int, default=10, help='Jobs claimed at once')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds between polls of an empty queue')
+        parser.add_argument('--backfill-variants', action='store_true',
+                            help='Queue the responsive variants of the images processed without them')
+
+    def handle(self, *args, once, batch, sleep, backfill_variants, **kwargs):
+        if backfill_variants:
+            self.stdout.write(f'Queued the variants of {image_jobs.enqueue_missing_variants()} image(s)')
+        total_succeeded = total_failed = 0
+        try:
+            while True:
+                # A long running worker must not keep a connection the database has dropped
+                close_old_connections()
+                succeeded, failed = image_jobs.process(batch)
+                total_succeeded += succeeded
+                total_failed += failed
+                if succeeded or failed:
+                    self.stdout.write(f'{succeeded} job(s) done, {failed} failed')
+                elif once:
+                    break
+                else:
+                    time.sleep(sleep)
+        except KeyboardInterrupt:
+            pass
+        summary = f'Processed {total_succeeded} image job(s), {total_failed} failed'
+        self.stdout.write(self.style.WARNING(summary) if total_failed else self.style.SUCCESS(summary))
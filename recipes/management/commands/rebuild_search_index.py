@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.handlers.search_handler import get_search_backend
+from recipes.handlers import filter_sets
+from recipes.indexes.recipe_index import recipe_index
+from recipes.indexes.ingredient_index import ingredient_index
+from recipes.indexes.pantry_index import pantry_index
+from recipes.indexes.spelling_index import spelling_index
+
+"""
+Management command to rebuild the recipe full-text search index.
+
+Usage:
+    python manage.py rebuild_search_index
+
+The index is kept up to date on every save, so this is only needed after bulk imports
+(bulk_create/update bypass signals) or if the index is suspected to be out of sync.
+On PostgreSQL it recomputes the ``search_vector`` column, on SQLite it refills the FTS5 table.
+When the cache is Redis, the category/tag filter sets (handlers/filter_sets.py) are reloaded too.
+The in-process indexes (recipes/indexes/) live in the memory of every worker, so they are not built
+here: every worker is told to rebuild them from the database on its next check.
+"""
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the recipe full-text search index'
+
+    def handle(self, *args, **kwargs):
+        backend = get_search_backend()
+        if backend is None:
+            raise CommandError('Full-text search is not supported on this database.')
+        backend.install()
+        indexed = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt ({indexed} recipes indexed)'))
+        if filter_sets.get_client() is not None:
+            loaded = filter_sets.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Filter sets rebuilt ({loaded} recipes loaded)'))
+        for index in (recipe_index, ingredient_index, pantry_index, spelling_index):
+            index.request_rebuild()
+        self.stdout.write(self.style.SUCCESS('In-process indexes will be rebuilt by every worker'))
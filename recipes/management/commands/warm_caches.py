@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from django_htmx.middleware import HtmxDetails
+
+from recipes.handlers import recipe_modals
+from recipes.handlers.pagination import SORT_OPTIONS
+from recipes.models.recipe_models import Recipe
+from recipes.views.recipe_views import RecipeListView, RecipeDetailView
+from recipes.views.sub_recipe_views import SubRecipeListView, SubRecipeDetailView
+
+"""
+Management command to fill the caches before the first visitors do.
+
+Usage:
+    python manage.py warm_caches --recipes 50 --workers 4
+
+Run after every deploy (render.yaml runs it once the static files are collected) or Redis flush.
+It renders, as an anonymous visitor, the first page of the recipe and sub recipe lists in every
+sort order (list ids, cards, fragments and the filter facet counts), the empty ingredient and step
+modals, and the detail pages of the most recently updated recipes. Pages are rendered through their
+views, so exactly the keys visitors read are filled.
+
+Tasks run on a bounded thread pool, each timed. A failed task is reported and the others go on:
+a cold cache only costs time, it must not fail a deploy.
+"""
+
+
+class Command(BaseCommand):
+    help = 'Fill the recipe caches (lists, facets, modals, recent details) ahead of the first visitors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=50,
+                            help='Number of most recently updated recipes whose detail page is warmed')
+        parser.add_argument('--workers', type=int, default=4, help='Tasks run at the same time')
+
+    def handle(self, *args, recipes, workers, **kwargs):
+        started = time.perf_counter()
+        tasks = self.get_tasks(recipes)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self.run_pooled, tasks))
+        else:
+            results = [self.run(task) for task in tasks]
+        failed = [label for label, _, error in results if error]
+        for label, elapsed, error in results:
+            line = f'  {label:<45} {elapsed * 1000:8.1f} ms'
+            self.stdout.write(self.style.ERROR(f'{line}   {error}') if error else line)
+        summary = f'Warmed {len(results) - len(failed)}/{len(results)} caches in {time.perf_counter() - started:.1f}s'
+        self.stdout.write(self.style.WARNING(summary) if failed else self.style.SUCCESS(summary))
+
+    def get_tasks(self, recipes: int) -> list:
+        tasks = []
+        for sort in SORT_OPTIONS:
+            tasks.append((f'recipe list ({sort})', lambda sort=sort: self.render(RecipeListView, '/', sort=sort)))
+            tasks.append((f'sub recipe list ({sort})',
+                          lambda sort=sort: self.render(SubRecipeListView, '/sub-recipes', sort=sort)))
+        tasks.append(('ingredients modal', lambda: recipe_modals.get_modal_html('ingredients')))
+        tasks.append(('steps modal', lambda: recipe_modals.get_modal_html('steps')))
+        tasks.append(('modal empty rows', recipe_modals.get_empty_rows_html))
+        try:
+            recent = list(Recipe.objects.order_by('-last_updated', '-pk').values_list('pk', 'is_sub_recipe')[:recipes])
+        except Exception as error:
+            self.stderr.write(f'Recent recipes not loaded: {error}')
+            recent = []
+        for pk, is_sub_recipe in recent:
+            view = SubRecipeDetailView if is_sub_recipe else RecipeDetailView
+            tasks.append((f'detail {pk}', lambda view=view, pk=pk: self.render(view, f'/recipe/{pk}', pk=pk)))
+        return tasks
+
+    @staticmethod
+    def render(view_class, path: str, pk=None, **params):
+        request = RequestFactory().get(path, params)
+        request.user = AnonymousUser()
+        request.htmx = HtmxDetails(request)
+        kwargs = {} if pk is None else {'pk': pk}
+        response = view_class.as_view()(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+
+    @staticmethod
+    def run(task) -> tuple:
+        label, warm = task
+        started = time.perf_counter()
+        try:
+            warm()
+        except Exception as error:
+            return label, time.perf_counter() - started, f'{type(error).__name__}: {error}'
+        return label, time.perf_counter() - started, None
+
+    def run_pooled(self, task) -> tuple:
+        try:
+            return self.run(task)
+        finally:
+            # Every thread of the pool opens its own database connections
+            connections.close_all()
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# Frozen copies of the SQL of recipes/handlers/search_handler.py as of this migration, so later
+# changes to the search backends do not change what this migration does
+POSTGRES_DOCUMENT_SQL = (
+    "setweight(to_tsvector('english', coalesce(r.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(r.description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(("
+    "SELECT string_agg(i.name, ' ') FROM recipes_recipeingredient i WHERE i.recipe_id = r.id"
+    "), '')), 'C')"
+)
+INSTALL_SQL = {
+    'postgresql': [
+        "ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector",
+        "CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin ON recipes_recipe USING gin (search_vector)",
+        f"UPDATE recipes_recipe AS r SET search_vector = {POSTGRES_DOCUMENT_SQL}",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts "
+        "USING fts5(title, description, ingredients, tokenize='porter unicode61')",
+        "DELETE FROM recipes_recipe_fts",
+        "INSERT INTO recipes_recipe_fts(rowid, title, description, ingredients) "
+        "SELECT r.id, r.title, coalesce(r.description, ''), coalesce(("
+        "SELECT group_concat(i.name, ' ') FROM recipes_recipeingredient i WHERE i.recipe_id = r.id"
+        "), '') FROM recipes_recipe r",
+    ],
+}
+UNINSTALL_SQL = {
+    'postgresql': [
+        "DROP INDEX IF EXISTS recipes_recipe_search_vector_gin",
+        "ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector",
+    ],
+    'sqlite': [
+        "DROP TABLE IF EXISTS recipes_recipe_fts",
+    ],
+}
+
+
+def install_search_index(apps, schema_editor):
+    for sql in INSTALL_SQL.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def uninstall_search_index(apps, schema_editor):
+    for sql in UNINSTALL_SQL.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    """
+    PostgreSQL: adds the ``search_vector`` tsvector column and its GIN index.
+    SQLite: creates the FTS5 table used as the development fallback.
+    The column is intentionally not declared on the model, so regular recipe queries never load it.
+    """
+
+    dependencies = [
+        ('recipes', '0046_remove_subrecipe_author_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
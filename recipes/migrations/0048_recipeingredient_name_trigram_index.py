@@ -0,0 +1,36 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Matches the SQL Django emits for ``name__icontains`` on PostgreSQL: UPPER("name"::text) LIKE UPPER(%s)
+CREATE_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS recipes_recipeingredient_name_trgm "
+    "ON recipes_recipeingredient USING gin ((UPPER(name::text)) gin_trgm_ops)"
+)
+DROP_INDEX_SQL = "DROP INDEX IF EXISTS recipes_recipeingredient_name_trgm"
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+    """
+    Trigram index over normalized (upper-cased) ingredient names, so substring ingredient
+    searches are served by one bitmap index scan instead of a sequential scan.
+    Both operations are no-ops on SQLite.
+    """
+
+    dependencies = [
+        ('recipes', '0047_recipe_search_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
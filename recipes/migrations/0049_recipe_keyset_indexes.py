@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0048_recipeingredient_name_trigram_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['is_sub_recipe', 'created_at', 'id'], name='recipe_created_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['is_sub_recipe', 'last_updated', 'id'], name='recipe_updated_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['is_sub_recipe', 'title', 'id'], name='recipe_title_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0050_recipe_image_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='recipeimagejob',
+            name='kind',
+            field=models.CharField(choices=[('convert', 'Convert to JPEG'), ('thumbnail', 'Create thumbnail'), ('variants', 'Create variants')], max_length=10),
+        ),
+    ]
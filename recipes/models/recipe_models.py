@@ -2,6 +2,8 @@ from django.db import models
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 from django.forms import ValidationError
+from django.templatetags.static import static
+from django.utils import timezone
 from utils.models import AbstractImageModel, ImageHandler
 from django.urls import reverse
 
@@ -54,6 +56,14 @@ class Recipe(BaseRecipe):
     categories = models.ManyToManyField(Category, related_name='recipes', blank=True)
     tags = models.ManyToManyField(Tag, related_name='recipes', blank=True)
 
+    class Meta:
+        # Composite indexes backing the keyset pagination sort options (see handlers/pagination.py)
+        indexes = [
+            models.Index(fields=['is_sub_recipe', 'created_at', 'id'], name='recipe_created_keyset_idx'),
+            models.Index(fields=['is_sub_recipe', 'last_updated', 'id'], name='recipe_updated_keyset_idx'),
+            models.Index(fields=['is_sub_recipe', 'title', 'id'], name='recipe_title_keyset_idx'),
+        ]
+
     def get_absolute_url(self):
         if self.is_sub_recipe:
             return reverse('recipes:sub_recipes_detail', kwargs={'pk': self.pk})
@@ -63,15 +73,24 @@ class Recipe(BaseRecipe):
 class RecipeImage(AbstractImageModel):
     """
     Model to represent images associated with a recipe.
+    Uploads are converted and thumbnailed in the background (see handlers/image_jobs.py),
+    pages show a placeholder until the image is ready.
     """
+    PENDING, READY, FAILED = 'pending', 'ready', 'failed'
+    STATUS_CHOICES = [(PENDING, 'Processing'), (READY, 'Ready'), (FAILED, 'Failed')]
+    PLACEHOLDER = 'recipes/images/image_processing.svg'
+
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='images')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=READY)
+    # Responsive versions of the picture, see handlers/image_variants.py
+    variants = models.JSONField(default=dict, blank=True)
 
     thumbnail_folder = 'recipes_pictures_thumbs_medium'
 
 
     def save(self, *args, **kwargs):
-        # Only rename if both recipe and picture are set
-        if self.picture and self.recipe:
+        # Only rename a new upload, a stored file keeps the name it was stored under
+        if self.picture and not self.picture._committed and self.recipe:
             image_handler = ImageHandler(self.picture)
             orig = self.picture
             ext = os.path.splitext(orig.name)[1]
@@ -83,10 +102,47 @@ class RecipeImage(AbstractImageModel):
     def get_thumbnail_url(self,):
 
         """
-        Returns the URL of the thumbnail image.
+        Returns the URL of the thumbnail image, or of the placeholder until it is created.
         If a folder is provided, it will use that folder; otherwise, it will use the default thumbnail folder.
         """
+        if self.picture and self.status != self.READY:
+            return static(self.PLACEHOLDER)
         return super().get_thumbnail_url(self.thumbnail_folder)
+
+    def get_picture_url(self):
+        """
+        Returns the URL of the picture, or of the placeholder until it is converted.
+        """
+        if not self.picture:
+            return ''
+        return self.picture.url if self.status == self.READY else static(self.PLACEHOLDER)
+
+
+class RecipeImageJob(models.Model):
+    """
+    Background processing job of an uploaded recipe image, queued in the database and run by
+    ``manage.py process_images`` (see handlers/image_jobs.py). Finished jobs are deleted.
+    """
+    CONVERT, THUMBNAIL, VARIANTS = 'convert', 'thumbnail', 'variants'
+    KIND_CHOICES = [(CONVERT, 'Convert to JPEG'), (THUMBNAIL, 'Create thumbnail'), (VARIANTS, 'Create variants')]
+    QUEUED, RUNNING, FAILED = 'queued', 'running', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    image = models.ForeignKey(RecipeImage, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Backs the queries of the workers claiming jobs
+        indexes = [models.Index(fields=['status', 'run_after'], name='recipe_image_job_queue_idx')]
+
+    def __str__(self) -> str:
+        return f'{self.kind} image {self.image_id} ({self.status})'
     
 
 class RecipeSubRecipe(models.Model):
@@ -0,0 +1,146 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models.recipe_models import (Recipe, RecipeIngredient, RecipeStep, RecipeImage, RecipeSubRecipe, Category,
+                                   Tag)
+from .handlers import search_handler, filter_sets, image_variants
+from .handlers.cache_dependencies import dependency_tracker
+from .indexes.recipe_index import get_recipe_index
+from .indexes.ingredient_index import ingredient_index
+from .indexes.pantry_index import pantry_index
+from .indexes.spelling_index import spelling_index
+
+
+# Recipes of the current thread waiting for their search documents and indexes to be refreshed,
+# collected like the changes of handlers/cache_dependencies.py: every change schedules a flush on
+# commit, the first one refreshes all of them and the others find nothing left to do
+_pending_search_refresh = threading.local()
+
+
+def _refresh_search_indexes():
+    recipe_ids = getattr(_pending_search_refresh, 'recipe_ids', set())
+    _pending_search_refresh.recipe_ids = set()
+    if not recipe_ids:
+        return
+    search_handler.refresh_search_documents(recipe_ids)
+    recipe_index = get_recipe_index()
+    if recipe_index is not None:
+        recipe_index.recipes_changed(recipe_ids)
+    ingredient_index.recipes_changed(recipe_ids)
+    pantry_index.recipes_changed(recipe_ids)
+    spelling_index.recipes_changed(recipe_ids)
+
+
+def _refresh_search_indexes_on_commit(recipe_id):
+    if recipe_id is None:
+        return
+    if not hasattr(_pending_search_refresh, 'recipe_ids'):
+        _pending_search_refresh.recipe_ids = set()
+    _pending_search_refresh.recipe_ids.add(recipe_id)
+    transaction.on_commit(_refresh_search_indexes)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_recipe_search_document(sender, instance, **kwargs):
+    _refresh_search_indexes_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeStep)
+@receiver(post_delete, sender=RecipeStep)
+@receiver(post_save, sender=RecipeImage)
+@receiver(post_delete, sender=RecipeImage)
+def refresh_content_recipe_search_document(sender, instance, **kwargs):
+    # Steps and images touch last_updated, which sorts the cached results
+    _refresh_search_indexes_on_commit(instance.recipe_id)
+
+
+# Cached pages, forms, cards and lists: the dependencies between them are in
+# handlers/cache_dependencies.py, whoever changes the rows (views, admin, commands)
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_caches(sender, instance, **kwargs):
+    dependency_tracker.recipe_changed(instance.pk, instance.is_sub_recipe)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeStep)
+@receiver(post_delete, sender=RecipeStep)
+@receiver(post_save, sender=RecipeImage)
+@receiver(post_delete, sender=RecipeImage)
+def invalidate_recipe_content_caches(sender, instance, **kwargs):
+    # Also touches last_updated, which versions the cached fragments (see templatetags/recipe_fragments.py)
+    dependency_tracker.recipe_content_changed(instance.recipe_id)
+
+
+@receiver(post_save, sender=RecipeSubRecipe)
+@receiver(post_delete, sender=RecipeSubRecipe)
+def invalidate_sub_recipe_link_caches(sender, instance, **kwargs):
+    dependency_tracker.sub_recipe_link_changed(instance.parent_recipe_id, instance.sub_recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.categories.through)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_filter_caches(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        dependency_tracker.filters_changed([instance.pk])
+    elif action in ('post_add', 'post_remove') and reverse:
+        dependency_tracker.filters_changed(pk_set)
+    elif action == 'pre_clear' and reverse:
+        # Changed from the category/tag side, which has no pk_set once cleared
+        dependency_tracker.filters_changed(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_option_caches(sender, instance, **kwargs):
+    # Before the delete, the assignments are still there to tell which recipes show the option
+    dependency_tracker.filters_changed(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=RecipeImage)
+def delete_image_variants(sender, instance, **kwargs):
+    # Once the row is gone for good, a rolled back delete keeps its files
+    variants = instance.variants
+    transaction.on_commit(lambda: image_variants.delete_variants(variants))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def sync_recipe_filter_sets(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: filter_sets.recipes_changed([recipe_id]))
+
+
+@receiver(m2m_changed, sender=Recipe.categories.through)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_filtered_searches(sender, instance, action, reverse, **kwargs):
+    # The filter sets depend on category/tag assignments (cached searches are dropped by invalidate_filter_caches)
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Changed from the category/tag side, e.g. category.recipes.add(...)
+        facet = 'category' if sender is Recipe.categories.through else 'tag'
+        option_id = instance.pk
+        transaction.on_commit(lambda: filter_sets.option_changed(facet, option_id))
+    else:
+        recipe_id = instance.pk
+        transaction.on_commit(lambda: filter_sets.recipes_changed([recipe_id]))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def drop_option_filter_set(sender, instance, **kwargs):
+    # The m2m rows are deleted by cascade, which sends no m2m_changed
+    facet = 'category' if sender is Category else 'tag'
+    option_id = instance.pk
+    transaction.on_commit(lambda: filter_sets.option_changed(facet, option_id))
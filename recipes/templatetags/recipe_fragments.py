@@ -0,0 +1,75 @@
+"""
+Key-based ("Russian doll") fragment caching.
+
+``{% fragment 'name' var1 var2 ... %}...{% endfragment %}`` caches the rendered block under a key made
+of the name, the values of the variables (a recipe id and ``last_updated`` for instance), the schema
+version of ``CacheManager`` and a hash of the block's own source, so editing the template or the
+recipe simply reads another key and nothing has to be invalidated. Fragments can be nested: an outer
+fragment varying on the versions of its recipes (``recipes|fragment_versions``) is re-rendered from
+the cached inner fragments when one of them changes, re-rendering only the changed one.
+
+Fragments hold the rendered image URLs for the lifetime of the 'fragment' policy, which is why media
+URLs are not presigned (``AWS_QUERYSTRING_AUTH = False`` in settings.py).
+"""
+import hashlib
+
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..handlers import recipe_modals
+from ..handlers.cache_manager import cache_manager
+
+register = template.Library()
+
+# Per-search attributes rendered on the cards (see search_handler.with_match_scores/with_pantry_coverage)
+SEARCH_ATTRIBUTES = ('matched_ingredients', 'owned_ingredients', 'total_ingredients', 'missing_ingredients')
+
+
+class FragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, vary_on, source_hash):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+        self.source_hash = source_hash
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary_on = repr([variable.resolve(context) for variable in self.vary_on])
+        digest = hashlib.sha1(vary_on.encode()).hexdigest()
+        return cache_manager.get_or_set('fragment', lambda: self.nodelist.render(context),
+                                        name, self.source_hash, digest)
+
+
+@register.tag('fragment')
+def do_fragment(parser, token):
+    """
+    {% fragment 'recipe_card' recipe.pk recipe.last_updated %} ... {% endfragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least a fragment name")
+    # The parser pops tokens from the end of its list, what it consumes is the block's source
+    pending = parser.tokens[:]
+    nodelist = parser.parse(('endfragment',))
+    source = ''.join(f'{token.token_type.value}{token.contents}' for token in pending[len(parser.tokens):])
+    parser.delete_first_token()
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]],
+                        hashlib.sha1(source.encode()).hexdigest()[:8])
+
+
+@register.filter
+def fragment_versions(recipes) -> list:
+    """
+    What the card fragments of the recipes vary on, for an outer fragment composed of them.
+    """
+    return [(recipe.pk, recipe.last_updated, *(getattr(recipe, attribute, None) for attribute in SEARCH_ATTRIBUTES))
+            for recipe in recipes]
+
+
+@register.simple_tag
+def modal_empty_rows():
+    """
+    The rows the ingredient and step modals clone, included once by the pages hosting the modals.
+    """
+    return mark_safe(recipe_modals.get_empty_rows_html())
@@ -0,0 +1,42 @@
+"""
+Responsive recipe images.
+
+``{% responsive_image sources 'card' fallback_url alt=... css_class=... %}`` renders the sources of
+``handlers/image_variants.py`` as a ``<picture>``: one ``<source>`` per preferred format and an
+``<img>`` with the JPEG ``srcset``, all with the ``sizes`` of the ladder, so browsers download the
+smallest file covering the displayed width in the best format they support. Sources are cached as
+storage names, their URLs are built here, on every render. Images without variants (still
+processing, or processed before them) render ``fallback_url`` as a plain ``<img>``.
+"""
+from django import template
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(sources, ladder, fallback_url='', alt='', css_class='', loading='lazy'):
+    """
+    {% responsive_image recipe.image 'card' recipe.thumbnail_url alt=recipe.title css_class='image' %}
+    """
+    if not sources:
+        if not fallback_url:
+            return ''
+        return format_html('<img src="{}" class="{}" alt="{}" loading="{}">', fallback_url, css_class, alt, loading)
+    fallback, width, height, candidates = sources
+    sizes = settings.RECIPE_IMAGE_LADDERS[ladder]['sizes']
+    srcsets = [(mime_type, build_srcset(files)) for mime_type, files in candidates]
+    *preferred, (_, jpeg_srcset) = srcsets
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" '
+        'loading="{}" decoding="async"></picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}">',
+                         ((mime_type, srcset, sizes) for mime_type, srcset in preferred)),
+        default_storage.url(fallback), jpeg_srcset, sizes, width, height, css_class, alt, loading,
+    )
+
+
+def build_srcset(files) -> str:
+    return ', '.join(f'{default_storage.url(name)} {width}w' for width, name in files)
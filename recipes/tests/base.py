@@ -1,6 +1,36 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageFilter
+
+from ..forms.recipe_forms import RecipeImageForm
+from ..models.recipe_models import Recipe, RecipeIngredient, RecipeImage
+
+# Per-process caches, so no test reaches the Redis server of the settings (tests needing Redis
+# override CACHES themselves)
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def png_upload(name='photo.png'):
+    buffer = BytesIO()
+    Image.new('RGBA', (1200, 800), (200, 80, 40, 255)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
 
+def photo_upload(name='photo.jpg', size=(1600, 1200)):
+    # Gradients and mild noise compress like a photo, a flat picture would not
+    bands = (Image.linear_gradient('L').resize(size), Image.radial_gradient('L').resize(size),
+             Image.effect_noise(size, 20))
+    buffer = BytesIO()
+    Image.merge('RGB', bands).filter(ImageFilter.GaussianBlur(1)).save(buffer, format='JPEG', quality=95)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class BaseTestCase(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -11,4 +41,34 @@ class BaseTestCase(TestCase):
         user = User.objects.create_user(username='testuser',
                                         password='testpassword',
                                         email='testuser@example.com')
-        return user
\ No newline at end of file
+        return user
+
+    def create_recipe(self, title='Recipe', ingredients=(), is_sub_recipe=False):
+        recipe = Recipe.objects.create(title=title, author=self.user, is_sub_recipe=is_sub_recipe)
+        for name in ingredients:
+            RecipeIngredient.objects.create(recipe=recipe, name=name)
+        return recipe
+
+    def use_temporary_media(self):
+        """
+        Stores the files of the test in a temporary directory, removed once it ran.
+        """
+        media_root = tempfile.mkdtemp()
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                        'OPTIONS': {'location': media_root}},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }
+        storage_override = override_settings(STORAGES=storages, MEDIA_ROOT=media_root)
+        storage_override.enable()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.addCleanup(storage_override.disable)
+        return media_root
+
+    def upload_image(self, recipe, upload):
+        """
+        Uploads the picture of the recipe through the form, as the image modal does.
+        """
+        form = RecipeImageForm(data={}, files={'picture': upload}, instance=RecipeImage(recipe=recipe))
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .base import BaseTestCase
+from ..handlers.cache_manager import cache_manager
+from ..models.recipe_models import Recipe, RecipeIngredient, RecipeStep, RecipeSubRecipe, Category
+
+
+class CacheDependenciesTestCase(BaseTestCase):
+
+    def setUp(self):
+        # Sauce is a sub recipe of lasagna, itself a sub recipe of the dinner
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dinner = Recipe.objects.create(title='Dinner', author=self.user)
+            self.lasagna = Recipe.objects.create(title='Lasagna', author=self.user, is_sub_recipe=True)
+            self.sauce = Recipe.objects.create(title='Sauce', author=self.user, is_sub_recipe=True)
+            self.other = Recipe.objects.create(title='Other', author=self.user)
+            RecipeSubRecipe.objects.create(parent_recipe=self.dinner, sub_recipe=self.lasagna)
+            RecipeSubRecipe.objects.create(parent_recipe=self.lasagna, sub_recipe=self.sauce)
+        cache.clear()
+        for recipe in (self.dinner, self.lasagna, self.sauce, self.other):
+            cache_manager.set('recipe_detail', recipe.title, recipe_id=recipe.pk)
+        cache_manager.set('recipe_list', 'list')
+        cache_manager.set('sub_recipe_list', 'sub list')
+
+    def cached_details(self):
+        return {recipe.title for recipe in (self.dinner, self.lasagna, self.sauce, self.other)
+                if cache_manager.get('recipe_detail', recipe_id=recipe.pk) is not None}
+
+    def test_sub_recipe_changes_reach_every_ancestor_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            RecipeIngredient.objects.create(recipe=self.sauce, name='tomato')
+            RecipeIngredient.objects.create(recipe=self.sauce, name='basil')
+        self.assertEqual(self.cached_details(), {'Dinner', 'Lasagna', 'Sauce', 'Other'})
+        with mock.patch.object(cache_manager, 'invalidate_many', wraps=cache_manager.invalidate_many) as invalidate:
+            for callback in callbacks:
+                callback()
+        # One batch for the whole transaction
+        self.assertEqual(invalidate.call_count, 1)
+        self.assertEqual(self.cached_details(), {'Other'})
+        self.assertEqual(cache_manager.get('recipe_list'), 'list')
+
+    def test_content_changes_touch_the_recipe_once_per_transaction(self):
+        before = Recipe.objects.get(pk=self.other.pk).last_updated
+        with self.captureOnCommitCallbacks() as callbacks:
+            RecipeIngredient.objects.create(recipe=self.other, name='tomato')
+            RecipeStep.objects.create(recipe=self.other, order=1, description='Chop')
+        self.assertEqual(Recipe.objects.get(pk=self.other.pk).last_updated, before)
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertGreater(Recipe.objects.get(pk=self.other.pk).last_updated, before)
+        # The list is sorted by last_updated
+        self.assertIsNone(cache_manager.get('recipe_list'))
+        self.assertEqual(cache_manager.get('sub_recipe_list'), 'sub list')
+
+    def test_recipe_row_changes_reach_its_sub_recipes_and_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dinner.title = 'Supper'
+            self.dinner.save()
+        # The lasagna detail lists its parent recipes
+        self.assertEqual(self.cached_details(), {'Sauce', 'Other'})
+        self.assertIsNone(cache_manager.get('recipe_list'))
+        self.assertEqual(cache_manager.get('sub_recipe_list'), 'sub list')
+
+    def test_deleting_a_sub_recipe_reaches_its_former_ancestors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sauce.delete()
+        self.assertEqual(self.cached_details(), {'Other'})
+        self.assertIsNone(cache_manager.get('sub_recipe_list'))
+
+    def test_category_changes_reach_the_recipes_and_lists(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='Italian')
+            self.other.categories.add(category)
+        cache_manager.set('recipe_detail', 'Other', recipe_id=self.other.pk)
+        cache_manager.set('recipe_list', 'list')
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = 'Tuscan'
+            category.save()
+        self.assertEqual(self.cached_details(), {'Dinner', 'Lasagna', 'Sauce'})
+        self.assertIsNone(cache_manager.get('recipe_list'))
@@ -0,0 +1,106 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .base import LOCMEM_CACHES
+from ..handlers import cache_manager as cache_manager_module
+from ..handlers.cache_manager import STALE_TIMEOUT, CacheManager, CachePolicy
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheManagerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.manager = CacheManager()
+
+    def test_get_or_set_computes_once(self):
+        calls = []
+        compute = lambda: calls.append(1) or 'page'
+        self.assertEqual(self.manager.get_or_set('recipe_detail', compute, recipe_id=1), 'page')
+        self.assertEqual(self.manager.get_or_set('recipe_detail', compute, recipe_id=1), 'page')
+        self.assertEqual(len(calls), 1)
+
+    def test_invalidate_recipe_drops_its_whole_group(self):
+        self.manager.set('recipe_detail', 'detail 1', recipe_id=1)
+        self.manager.set('ingredients_form', 'form 1', recipe_id=1)
+        self.manager.set('recipe_detail', 'detail 2', recipe_id=2)
+        self.manager.set('recipe_list', 'list')
+        self.manager.set('sub_recipe_list', 'sub list')
+
+        self.manager.invalidate_recipe(1)
+
+        self.assertIsNone(self.manager.get('recipe_detail', recipe_id=1))
+        self.assertIsNone(self.manager.get('ingredients_form', recipe_id=1))
+        self.assertIsNone(self.manager.get('recipe_list'))
+        self.assertEqual(self.manager.get('recipe_detail', recipe_id=2), 'detail 2')
+        self.assertEqual(self.manager.get('sub_recipe_list'), 'sub list')
+
+    def test_schema_change_changes_keys(self):
+        key = self.manager.key('recipe_detail', recipe_id=1)
+        with mock.patch.object(cache_manager_module, 'SCHEMA_VERSION', cache_manager_module.SCHEMA_VERSION + 1):
+            self.assertNotEqual(CacheManager().key('recipe_detail', recipe_id=1), key)
+        self.assertEqual(CacheManager().key('recipe_detail', recipe_id=1), key)
+
+    def test_namespace_timeout_is_used(self):
+        manager = CacheManager(namespaces={'short': CachePolicy(5)})
+        with mock.patch.object(cache, 'set') as cache_set:
+            manager.set('short', 'value')
+        value, expires_at, _ = cache_set.call_args.args[1]
+        self.assertAlmostEqual(expires_at, time.time() + 5, delta=1)
+        self.assertEqual(cache_set.call_args.args[2], 5 + STALE_TIMEOUT)
+
+    def test_unknown_namespace_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.manager.key('unknown')
+
+    def test_cache_errors_fall_back_to_compute(self):
+        with mock.patch.object(cache, 'get_many', side_effect=ConnectionError):
+            self.assertEqual(self.manager.get_or_set('recipe_list', lambda: 'fresh'), 'fresh')
+            self.manager.invalidate_recipe(1)
+
+    def test_expired_value_is_served_while_another_request_refreshes_it(self):
+        self.manager.set('recipe_list', 'old', timeout=-1)
+        self.assertIsNone(self.manager.get('recipe_list'))
+        key = self.manager.key('recipe_list')
+        cache.add(f'{key}:refresh', 1)
+        self.assertEqual(self.manager.get_or_set('recipe_list', lambda: 'new'), 'old')
+
+        cache.delete(f'{key}:refresh')
+        self.assertEqual(self.manager.get_or_set('recipe_list', lambda: 'new'), 'new')
+        self.assertEqual(self.manager.get('recipe_list'), 'new')
+
+    def test_slow_values_are_refreshed_before_they_expire(self):
+        key = self.manager.key('recipe_list')
+        # Took 10s to compute and expires in 5s: XFetch refreshes it with near certainty
+        cache.set(key, ('old', time.time() + 5, 10.0))
+        with mock.patch('random.random', return_value=0.5):
+            self.assertEqual(self.manager.get_or_set('recipe_list', lambda: 'new'), 'new')
+        # A fast value far from its expiry is kept
+        cache.set(key, ('old', time.time() + 60, 0.01))
+        self.assertEqual(self.manager.get_or_set('recipe_list', lambda: 'new'), 'old')
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return 'page'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.manager.get_or_set('recipe_list', compute)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait(1)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['page'] * 5)
+        self.assertEqual(len(calls), 1)
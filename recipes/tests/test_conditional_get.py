@@ -0,0 +1,66 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory
+from django_htmx.middleware import HtmxDetails
+
+from .base import BaseTestCase
+from ..models.recipe_models import Category, Recipe, RecipeIngredient
+from ..views.recipe_views import RecipeDetailView, RecipeListView
+
+
+class ConditionalGetTestCase(BaseTestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(title='Lasagna', author=self.user)
+
+    def get(self, view_class, etag=None, user=None, csrf_secret=None, **kwargs):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = RequestFactory().get('/', **headers)
+        request.user = user or self.user
+        if csrf_secret:
+            request.META['CSRF_COOKIE'] = csrf_secret
+        request.htmx = HtmxDetails(request)
+        response = view_class.as_view()(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_unchanged_detail_is_not_modified_without_queries(self):
+        response = self.get(RecipeDetailView, pk=self.recipe.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            not_modified = self.get(RecipeDetailView, response['ETag'], pk=self.recipe.pk)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_child_row_changes_the_detail_etag(self):
+        etag = self.get(RecipeDetailView, pk=self.recipe.pk)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(recipe=self.recipe, name='pasta')
+        response = self.get(RecipeDetailView, etag, pk=self.recipe.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('pasta', response.content.decode())
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_the_viewer(self):
+        etag = self.get(RecipeDetailView, pk=self.recipe.pk)['ETag']
+        response = self.get(RecipeDetailView, etag, user=AnonymousUser(), pk=self.recipe.pk)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_the_csrf_secret(self):
+        # A logout and login as the same user rotate the secret the page's forms were rendered with
+        etag = self.get(RecipeDetailView, csrf_secret='a' * 32, pk=self.recipe.pk)['ETag']
+        self.assertEqual(self.get(RecipeDetailView, etag, csrf_secret='a' * 32, pk=self.recipe.pk).status_code, 304)
+        self.assertEqual(self.get(RecipeDetailView, etag, csrf_secret='b' * 32, pk=self.recipe.pk).status_code, 200)
+
+    def test_list_etag_follows_any_change(self):
+        etag = self.get(RecipeListView)['ETag']
+        self.assertEqual(self.get(RecipeListView, etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Italian')
+        self.assertEqual(self.get(RecipeListView, etag).status_code, 200)
@@ -0,0 +1,130 @@
+import os
+from unittest import skipUnless
+
+import redis
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from .base import BaseTestCase
+from ..forms.recipe_filter_forms import RecipeFilterForm
+from ..handlers import filter_handler, filter_sets
+from ..models.recipe_models import Recipe, RecipeIngredient, Category, Tag
+
+
+class FilterTestCase(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.breakfast = Category.objects.create(name='Breakfast')
+        cls.dinner = Category.objects.create(name='Dinner')
+        cls.vegan = Tag.objects.create(name='Vegan')
+        cls.pancakes = Recipe.objects.create(title='Pancakes', author=cls.user)
+        cls.pancakes.categories.add(cls.breakfast)
+        cls.pancakes.tags.add(cls.vegan)
+        cls.porridge = Recipe.objects.create(title='Porridge', author=cls.user)
+        cls.porridge.categories.add(cls.breakfast, cls.dinner)
+        cls.curry = Recipe.objects.create(title='Curry', author=cls.user)
+        cls.curry.categories.add(cls.dinner)
+        cls.curry.tags.add(cls.vegan)
+
+
+class FacetCountsTestCase(FilterTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_filters_are_semi_joins_without_duplicates(self):
+        filters = {'category': [self.breakfast.pk, self.dinner.pk]}
+        recipes = filter_handler.apply_filters(Recipe.objects.all(), filters)
+        self.assertCountEqual(recipes, [self.pancakes, self.porridge, self.curry])
+        filters['tag'] = [self.vegan.pk]
+        self.assertEqual(filter_handler.filter_recipe_ids([self.curry.pk, self.porridge.pk, self.pancakes.pk], filters),
+                         [self.curry.pk, self.pancakes.pk])
+
+    def test_counts_ignore_the_selection_of_their_own_facet(self):
+        counts = filter_handler.facet_counts(Recipe.objects.all(), {'category': [self.breakfast.pk]})
+        self.assertEqual(counts['category'], {self.breakfast.pk: 2, self.dinner.pk: 2})
+        self.assertEqual(counts['tag'], {self.vegan.pk: 1})
+
+    def test_counts_are_limited_to_search_results(self):
+        counts = filter_handler.get_facet_counts({}, 'title', 'curry', [self.curry.pk])
+        self.assertEqual(counts['category'], {self.dinner.pk: 1})
+
+    def test_form_labels_show_counts(self):
+        form = RecipeFilterForm({'category': [self.dinner.pk]})
+        filters = filter_handler.get_selected_filters(form)
+        self.assertEqual(filters, {'category': [self.dinner.pk]})
+        form.set_facet_counts(filter_handler.get_facet_counts(filters))
+        labels = [str(choice[1]) for choice in form.fields['tag'].choices]
+        self.assertEqual(labels, ['Vegan (1)'])
+
+    def test_match_all_requires_every_selected_option(self):
+        filters = {'category': [self.breakfast.pk, self.dinner.pk], 'match': 'all'}
+        recipes = filter_handler.apply_filters(Recipe.objects.all(), filters)
+        self.assertEqual(list(recipes), [self.porridge])
+        counts = filter_handler.facet_counts(Recipe.objects.all(), filters)
+        self.assertEqual(counts['category'], {self.breakfast.pk: 1, self.dinner.pk: 1})
+
+    def test_pantry_search_keeps_the_filtered_recipes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for recipe in (self.pancakes, self.porridge, self.curry):
+                RecipeIngredient.objects.create(recipe=recipe, name='Eggs')
+        search = {'search_text': 'eggs', 'searchType': 'pantry', 'category': [self.breakfast.pk]}
+        response = self.client.get(reverse('recipes:recipe_search'), search, HTTP_HX_REQUEST='true')
+        self.assertEqual(response.status_code, 200)
+        html = response.content.decode()
+        self.assertIn('Pancakes', html)
+        self.assertNotIn('Curry', html)
+        response = self.client.get(reverse('recipes:sub_recipe_search'), search, HTTP_HX_REQUEST='true')
+        self.assertEqual(response.status_code, 200)
+
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+
+def redis_available():
+    if not REDIS_URL:
+        return False
+    try:
+        return redis.Redis.from_url(REDIS_URL).ping()
+    except redis.RedisError:
+        return False
+
+
+@skipUnless(redis_available(), 'needs a Redis server (REDIS_URL)')
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                       'LOCATION': REDIS_URL, 'KEY_PREFIX': 'test'}})
+class FilterSetsTestCase(FilterTestCase):
+
+    def setUp(self):
+        client = filter_sets.get_client()
+        for key in client.scan_iter(match='test:*'):
+            client.delete(key)
+
+    def test_pages_follow_the_database_filters(self):
+        for filters in ({'category': [self.breakfast.pk]},
+                        {'category': [self.breakfast.pk, self.dinner.pk]},
+                        {'category': [self.breakfast.pk, self.dinner.pk], 'match': 'all'},
+                        {'category': [self.dinner.pk], 'tag': [self.vegan.pk]}):
+            expected = list(filter_handler.apply_filters(Recipe.objects.all(), filters)
+                            .order_by('-pk').values_list('pk', flat=True))
+            self.assertEqual(filter_sets.page_ids(filters), expected)
+
+    def test_pages_after_an_id(self):
+        filters = {'category': [self.breakfast.pk, self.dinner.pk]}
+        self.assertEqual(filter_sets.page_ids(filters, after_id=self.curry.pk, limit=1), [self.porridge.pk])
+        self.assertEqual(filter_sets.page_ids(filters, descending=False, after_id=self.pancakes.pk),
+                         [self.porridge.pk, self.curry.pk])
+
+    def test_signals_keep_the_sets_in_sync(self):
+        filters = {'tag': [self.vegan.pk]}
+        filter_sets.page_ids(filters)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.porridge.tags.add(self.vegan)
+            self.curry.delete()
+        self.assertEqual(filter_sets.page_ids(filters), [self.porridge.pk, self.pancakes.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vegan.recipes.remove(self.pancakes)
+        self.assertEqual(filter_sets.page_ids(filters), [self.porridge.pk])
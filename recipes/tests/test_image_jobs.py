@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+
+from .base import BaseTestCase, png_upload
+from ..handlers import image_jobs
+from ..handlers.recipe_cards import get_cards
+from ..models.recipe_models import RecipeImage, RecipeImageJob
+
+
+@override_settings(RECIPE_IMAGE_WORKER=True)
+class ImageJobsTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.use_temporary_media()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = self.create_recipe('Pumpkin Soup')
+            self.image = self.upload_image(self.recipe, png_upload())
+
+    def test_upload_is_queued_and_shows_a_placeholder(self):
+        self.assertEqual(self.image.status, RecipeImage.PENDING)
+        self.assertEqual(self.image.picture.name, 'recipes_pictures_originals/Pumpkin_Soup.png')
+        job = RecipeImageJob.objects.get(image=self.image)
+        self.assertEqual((job.kind, job.status), (RecipeImageJob.CONVERT, RecipeImageJob.QUEUED))
+        [card] = get_cards([self.recipe.pk])
+        self.assertTrue(card.thumbnail_url.endswith(RecipeImage.PLACEHOLDER))
+
+    def test_process_converts_and_thumbnails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(image_jobs.process(), (1, 0))
+        self.assertFalse(RecipeImageJob.objects.exists())
+
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.status, RecipeImage.READY)
+        self.assertEqual(self.image.picture.name, 'recipes_pictures_originals/Pumpkin_Soup.jpg')
+        self.assertFalse(default_storage.exists('recipes_pictures_originals/Pumpkin_Soup.png'))
+        self.assertTrue(default_storage.exists('recipes_pictures_thumbs_medium/Pumpkin_Soup.jpg'))
+        [card] = get_cards([self.recipe.pk])
+        self.assertTrue(card.thumbnail_url.endswith('recipes_pictures_thumbs_medium/Pumpkin_Soup.jpg'))
+
+    def test_failing_job_is_retried_then_marked_failed(self):
+        # An original that is not an image can never be converted
+        default_storage.delete(self.image.picture.name)
+        default_storage.save(self.image.picture.name, SimpleUploadedFile('x', b'not an image'))
+        self.assertEqual(image_jobs.process(), (0, 1))
+        job = RecipeImageJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (RecipeImageJob.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=image_jobs.RETRY_DELAY - 5))
+        self.assertIn('UnidentifiedImageError', job.last_error)
+        # Not due yet
+        self.assertEqual(image_jobs.process(), (0, 0))
+
+        RecipeImageJob.objects.update(attempts=image_jobs.MAX_ATTEMPTS - 1, run_after=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(image_jobs.process(), (0, 1))
+        self.assertEqual(RecipeImageJob.objects.get().status, RecipeImageJob.FAILED)
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.status, RecipeImage.FAILED)
+        self.assertEqual(image_jobs.process(), (0, 0))
+
+    @override_settings(RECIPE_IMAGE_WORKER=False)
+    def test_upload_is_processed_after_commit_without_a_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.upload_image(self.create_recipe('Carrot Soup'), png_upload('carrot.png'))
+        image.refresh_from_db()
+        self.assertEqual(image.status, RecipeImage.READY)
+        # The job queued meanwhile was due as well
+        self.assertFalse(RecipeImageJob.objects.exists())
+
+    def test_abandoned_job_is_claimed_again(self):
+        stale = timezone.now() - timedelta(seconds=image_jobs.LOCK_TIMEOUT + 1)
+        RecipeImageJob.objects.update(status=RecipeImageJob.RUNNING, locked_at=stale, attempts=1)
+        [job] = image_jobs.claim()
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(image_jobs.claim(), [])
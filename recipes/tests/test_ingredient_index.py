@@ -0,0 +1,36 @@
+from django.test import RequestFactory
+
+from .base import BaseTestCase
+from ..indexes.ingredient_index import IngredientNameIndex, ingredient_index
+from ..models.recipe_models import RecipeIngredient
+from ..views.recipe_views import IngredientAutocompleteView
+
+
+class IngredientNameIndexTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.index = IngredientNameIndex()
+        self.curry = self.create_recipe(ingredients=['Chicken  Breast', 'Basmati rice', 'Butter'])
+        self.toast = self.create_recipe(ingredients=['Bread', 'Butter'])
+        self.salad = self.create_recipe(ingredients=['chicken breast', 'Lettuce'])
+
+    def test_suggestions_are_normalized_and_ranked_by_usage(self):
+        self.assertEqual(self.index.suggest('B'), ['butter', 'chicken breast', 'basmati rice', 'bread'])
+        self.assertEqual(self.index.suggest('bre', limit=1), ['chicken breast'])
+        self.assertEqual(self.index.suggest('chicken b'), ['chicken breast'])
+        self.assertEqual(self.index.suggest('  '), [])
+
+    def test_incremental_updates(self):
+        self.assertEqual(self.index.suggest('bread'), ['bread'])
+        RecipeIngredient.objects.filter(recipe=self.toast).delete()
+        RecipeIngredient.objects.create(recipe=self.salad, name='Bresaola')
+        self.index.recipes_changed([self.toast.pk, self.salad.pk])
+        self.assertEqual(self.index.suggest('bre'), ['chicken breast', 'bresaola'])
+        self.assertEqual(self.index.usage['butter'], 1)
+
+    def test_autocomplete_endpoint(self):
+        ingredient_index.reset()
+        request = RequestFactory().get('/recipes/recipe/ingredients/autocomplete', {'q': 'butt', 'limit': 'x'})
+        response = IngredientAutocompleteView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, {'suggestions': ['butter']})
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .base import BaseTestCase
+from ..handlers.pagination import (KeysetPaginator, paginate_ranked, paginate_keys, paginate_ids, encode_cursor,
+                                  decode_cursor)
+from ..models.recipe_models import Recipe
+
+
+class KeysetPaginatorTestCase(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        created_at = timezone.now()
+        for number in range(7):
+            Recipe.objects.create(title=f'Recipe {number % 3}', author=cls.user)
+        # Give some recipes the same timestamp so the id tie breaker is exercised
+        Recipe.objects.update(created_at=created_at)
+        Recipe.objects.filter(title='Recipe 0').update(created_at=created_at - timedelta(days=1))
+
+    def collect_pages(self, sort, page_size=3):
+        paginator = KeysetPaginator(Recipe.objects.all(), sort, page_size)
+        pages, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            pages.append([recipe.pk for recipe in page.object_list])
+            cursor = page.next_cursor
+            if not cursor:
+                return pages
+
+    def test_pages_cover_the_full_ordering(self):
+        for sort, ordering in (('newest', ('-created_at', '-id')), ('title', ('title', 'id'))):
+            pages = self.collect_pages(sort)
+            expected = list(Recipe.objects.order_by(*ordering).values_list('pk', flat=True))
+            self.assertEqual([pk for page in pages for pk in page], expected)
+            self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+    def test_invalid_cursor_starts_over(self):
+        paginator = KeysetPaginator(Recipe.objects.all(), 'newest', 3)
+        first_page = paginator.get_page().object_list
+        self.assertEqual(paginator.get_page('not-a-cursor').object_list, first_page)
+        self.assertEqual(paginator.get_page(encode_cursor(['not a date', 1])).object_list, first_page)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(['2025-01-01T00:00:00+00:00', 12])),
+                         ['2025-01-01T00:00:00+00:00', 12])
+
+    def test_paginate_ranked(self):
+        first = paginate_ranked(list(range(5)), page_size=2)
+        second = paginate_ranked(list(range(5)), first.next_cursor, page_size=2)
+        last = paginate_ranked(list(range(5)), second.next_cursor, page_size=2)
+        self.assertEqual((first.object_list, second.object_list, last.object_list), ([0, 1], [2, 3], [4]))
+        self.assertIsNone(last.next_cursor)
+
+    def test_cached_keys_hand_over_to_the_database(self):
+        paginator = KeysetPaginator(Recipe.objects.all(), 'newest', 3)
+        expected = [pk for page in self.collect_pages('newest') for pk in page]
+        for depth in (4, 7, 10):
+            keys = paginator.get_keys(depth)
+            pages, cursor = [], None
+            while True:
+                page = paginate_keys(keys, cursor, 3, complete=len(keys) < depth) or paginator.get_id_page(cursor)
+                pages.append(page.object_list)
+                cursor = page.next_cursor
+                if not cursor:
+                    break
+            self.assertEqual([pk for page in pages for pk in page], expected)
+
+    def test_filter_set_and_keyset_cursors_resume_each_other(self):
+        paginator = KeysetPaginator(Recipe.objects.all(), 'newest', 3)
+        expected = [pk for page in self.collect_pages('newest') for pk in page]
+        # The filter sets served the first page, the database serves the next one
+        cursor = paginator.translate_cursor(encode_cursor({'after': expected[2]}))
+        self.assertEqual([recipe.pk for recipe in paginator.get_page(cursor).object_list], expected[3:6])
+        # And the other way round
+        after_ids = []
+        paginate_ids(lambda after_id, limit: after_ids.append(after_id) or [], paginator.get_page().next_cursor, 3)
+        self.assertEqual(after_ids, [expected[2]])
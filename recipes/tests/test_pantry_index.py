@@ -0,0 +1,41 @@
+from .base import BaseTestCase
+from ..indexes.pantry_index import PantryIndex
+from ..models.recipe_models import RecipeIngredient
+
+
+class PantryIndexTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.index = PantryIndex()
+        self.omelette = self.create_recipe('Omelette', ['Eggs', 'Butter', 'Salt'])
+        self.fried_rice = self.create_recipe('Fried rice', ['Rice', 'Eggs', 'Soy sauce', 'Spring onion'])
+        self.risotto = self.create_recipe('Chicken risotto', ['Chicken breast', 'Arborio rice'])
+        self.sauce = self.create_recipe('Sauce', ['Butter'], is_sub_recipe=True)
+
+    def test_ranked_by_coverage_with_missing_ingredients(self):
+        matches = self.index.search('eggs, butter, salt, rice, chicken')
+        self.assertEqual([match.recipe_id for match in matches],
+                         [self.omelette.pk, self.risotto.pk, self.fried_rice.pk])
+        self.assertEqual(matches[0].coverage, 1.0)
+        self.assertEqual((matches[2].owned, matches[2].total), (2, 4))
+        self.assertEqual(matches[2].missing, ['soy sauce', 'spring onion'])
+
+    def test_multi_word_items_need_every_word(self):
+        matches = self.index.search('spring onion, chicken thighs')
+        self.assertEqual([match.recipe_id for match in matches], [self.fried_rice.pk])
+
+    def test_sub_recipes_are_searched_separately(self):
+        matches = self.index.search('butter', is_sub_recipe=True)
+        self.assertEqual([match.recipe_id for match in matches], [self.sauce.pk])
+
+    def test_incremental_updates(self):
+        self.index.ensure_ready()
+        RecipeIngredient.objects.filter(recipe=self.fried_rice, name='Soy sauce').delete()
+        RecipeIngredient.objects.create(recipe=self.risotto, name='Parmesan')
+        omelette_id = self.omelette.pk
+        self.omelette.delete()
+        new_recipe = self.create_recipe('Boiled eggs', ['Eggs'])
+        self.index.recipes_changed([self.fried_rice.pk, self.risotto.pk, omelette_id, new_recipe.pk])
+        matches = self.index.search('eggs, rice, chicken')
+        self.assertEqual([(match.recipe_id, match.owned, match.total) for match in matches],
+                         [(new_recipe.pk, 1, 1), (self.risotto.pk, 2, 3), (self.fried_rice.pk, 2, 3)])
@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+from .base import BaseTestCase
+from ..handlers import recipe_cards
+from ..models.recipe_models import Recipe, RecipeImage
+
+
+class RecipeCardsTestCase(BaseTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.bread = Recipe.objects.create(title='Bread', description='x' * 500, author=self.user)
+        self.soup = Recipe.objects.create(title='Soup', author=self.user)
+
+    def test_cards_keep_the_order_and_skip_missing_recipes(self):
+        cards = recipe_cards.get_cards([self.soup.pk, 0, self.bread.pk])
+        self.assertEqual([card.pk for card in cards], [self.soup.pk, self.bread.pk])
+        self.assertEqual(len(cards[1].description), recipe_cards.DESCRIPTION_SNIPPET_LENGTH)
+        self.assertEqual(cards[0].thumbnail_url, '')
+
+    def test_cards_are_served_from_the_cache_until_the_recipe_changes(self):
+        recipe_cards.get_cards([self.bread.pk, self.soup.pk])
+        with self.assertNumQueries(0):
+            recipe_cards.get_cards([self.bread.pk, self.soup.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bread.title = 'Sourdough'
+            self.bread.save()
+        self.assertEqual(recipe_cards.get_cards([self.bread.pk])[0].title, 'Sourdough')
+
+    def test_cards_cache_storage_names_not_urls(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeImage.objects.create(recipe=self.bread, picture='recipes_pictures_originals/Bread.jpg')
+        row = recipe_cards.load_card_rows([self.bread.pk])[self.bread.pk]
+        self.assertIn('recipes_pictures_originals/Bread.jpg', row)
+        self.assertFalse(any(isinstance(value, str) and '://' in value for value in row))
+        recipe_cards.get_cards([self.bread.pk])
+        # Served from the cache, the URL follows the storage
+        with override_settings(MEDIA_URL='https://images.example.com/'):
+            [card] = recipe_cards.get_cards([self.bread.pk])
+            self.assertEqual(card.thumbnail_url, 'https://images.example.com/recipes_pictures_thumbs_medium/Bread.jpg')
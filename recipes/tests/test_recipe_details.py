@@ -0,0 +1,63 @@
+import pickle
+
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
+
+from .base import BaseTestCase
+from ..handlers import recipe_details
+from ..models.recipe_models import Category, Recipe, RecipeImage, RecipeIngredient, RecipeStep, RecipeSubRecipe
+from ..views.recipe_views import RecipeDetailView
+
+
+class RecipeDetailsTestCase(BaseTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.lasagna = Recipe.objects.create(title='Lasagna', description='Layers', author=self.user)
+        self.sauce = Recipe.objects.create(title='Sauce', author=self.user, is_sub_recipe=True)
+        RecipeSubRecipe.objects.create(parent_recipe=self.lasagna, sub_recipe=self.sauce)
+        RecipeIngredient.objects.create(recipe=self.lasagna, name='pasta', quantity='500', measurement='gram')
+        RecipeIngredient.objects.create(recipe=self.sauce, name='tomato')
+        RecipeStep.objects.create(recipe=self.lasagna, order=2, description='Bake')
+        RecipeStep.objects.create(recipe=self.lasagna, order=1, description='Stack')
+        self.lasagna.categories.add(Category.objects.create(name='Italian'))
+        self.lasagna.refresh_from_db()
+
+    def test_rows_hold_only_plain_values(self):
+        row = recipe_details.load_detail_row(self.lasagna.pk)
+        self.assertNotIn(b'django', pickle.dumps(row))
+        detail = recipe_details.RecipeDetail.from_row(row)
+        self.assertEqual(detail.last_updated, self.lasagna.last_updated)
+        self.assertEqual([step.description for step in detail.steps], ['Stack', 'Bake'])
+        self.assertEqual(detail.ingredients[0], ('pasta', '500', 'gram'))
+        self.assertEqual(detail.categories, ('Italian',))
+        self.assertEqual(detail.sub_recipes[0].ingredients[0].name, 'tomato')
+        sauce = recipe_details.RecipeDetail.from_row(recipe_details.load_detail_row(self.sauce.pk))
+        self.assertEqual([(parent.id, parent.title) for parent in sauce.parent_recipes], [(self.lasagna.pk, 'Lasagna')])
+
+    def test_cover_is_cached_as_a_storage_name(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeImage.objects.create(recipe=self.lasagna, picture='recipes_pictures_originals/Lasagna.jpg')
+        row = recipe_details.load_detail_row(self.lasagna.pk)
+        self.assertIn('recipes_pictures_originals/Lasagna.jpg', row)
+        recipe_details.get_detail('recipe_detail', self.lasagna.pk)
+        with override_settings(MEDIA_URL='https://images.example.com/'), self.assertNumQueries(0):
+            detail = recipe_details.get_detail('recipe_detail', self.lasagna.pk)
+            self.assertEqual(detail.cover_url, 'https://images.example.com/recipes_pictures_originals/Lasagna.jpg')
+
+    def test_cached_details_are_rendered_without_queries(self):
+        self.assertIsNone(recipe_details.get_detail('recipe_detail', 0))
+        recipe_details.get_detail('recipe_detail', self.lasagna.pk)
+        with self.assertNumQueries(0):
+            detail = recipe_details.get_detail('recipe_detail', self.lasagna.pk)
+        self.assertEqual(detail.title, 'Lasagna')
+
+    def test_detail_page_shows_sub_recipe_ingredients(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        response = RecipeDetailView.as_view()(request, pk=self.lasagna.pk)
+        content = response.render().content.decode()
+        self.assertIn('pasta', content)
+        self.assertIn('tomato', content)
+        self.assertIn('Italian', content)
+        self.assertTrue(response.context_data['can_edit'])
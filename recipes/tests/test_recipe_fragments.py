@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from .base import LOCMEM_CACHES
+
+
+CARDS = Template(
+    "{% load recipe_fragments %}"
+    "{% fragment 'cards' recipes|fragment_versions %}"
+    "{% for recipe in recipes %}{% fragment 'card' recipe.pk recipe.last_updated %}"
+    "[{{ recipe.title }}{{ suffix }}]"
+    "{% endfragment %}{% endfor %}"
+    "{% endfragment %}"
+)
+
+
+class Card:
+
+    def __init__(self, pk, title, last_updated):
+        self.pk, self.title, self.last_updated = pk, title, last_updated
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeFragmentsTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, recipes, suffix=''):
+        return CARDS.render(Context({'recipes': recipes, 'suffix': suffix}))
+
+    def test_fragments_are_keyed_on_their_versions(self):
+        bread, soup = Card(1, 'Bread', 1), Card(2, 'Soup', 1)
+        self.assertEqual(self.render([bread, soup]), '[Bread][Soup]')
+        # Same versions: served from the cache, the suffix is not rendered
+        self.assertEqual(self.render([bread, soup], suffix='!'), '[Bread][Soup]')
+
+    def test_only_changed_inner_fragments_are_rendered(self):
+        bread, soup = Card(1, 'Bread', 1), Card(2, 'Soup', 1)
+        self.render([bread, soup])
+        edited_soup = Card(2, 'Stew', 2)
+        self.assertEqual(self.render([bread, edited_soup], suffix='!'), '[Bread][Stew!]')
+
+    def test_template_changes_change_keys(self):
+        recipes = [Card(1, 'Bread', 1)]
+        self.render(recipes)
+        edited = Template("{% load recipe_fragments %}"
+                          "{% fragment 'cards' recipes|fragment_versions %}<{{ recipes.0.title }}>{% endfragment %}")
+        self.assertEqual(edited.render(Context({'recipes': recipes})), '<Bread>')
@@ -0,0 +1,47 @@
+import numpy as np
+
+from .base import BaseTestCase
+from ..indexes.recipe_index import InvertedRecipeIndex, parse_ingredient_query, highest_ids
+from ..models.recipe_models import Recipe, RecipeIngredient
+
+
+class InvertedRecipeIndexTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.index = InvertedRecipeIndex()
+        self.curry = self.create_recipe('Chicken curry', ['Chicken thighs', 'Basmati rice', 'Peanuts'])
+        self.risotto = self.create_recipe('Chicken risotto', ['Chicken breast', 'Arborio rice'])
+        self.chili = self.create_recipe('Beef chili', ['Ground beef', 'Rice'])
+
+    def test_parse_ingredient_query(self):
+        self.assertEqual(parse_ingredient_query('chicken | beef, rice, -peanut'),
+                         ([['chicken', 'beef'], ['rice']], ['peanut']))
+
+    def test_highest_ids(self):
+        self.assertEqual(highest_ids(np.array([1, 2, 4], dtype=np.uint32), 2), [4, 2])
+
+    def test_and_not_query(self):
+        self.assertEqual(self.index.search_ingredients('chicken, rice, -peanut'), [self.risotto.pk])
+
+    def test_or_query_newest_first(self):
+        self.assertEqual(self.index.search_ingredients('chick | beef, rice'),
+                         [self.chili.pk, self.risotto.pk, self.curry.pk])
+
+    def test_title_search(self):
+        self.assertEqual(self.index.search_titles('chicken ris'), [self.risotto.pk])
+
+    def test_incremental_updates(self):
+        self.index.ensure_ready()
+        RecipeIngredient.objects.filter(recipe=self.curry, name='Peanuts').delete()
+        Recipe.objects.filter(pk=self.chili.pk).delete()
+        self.index.recipes_changed([self.curry.pk, self.chili.pk])
+        self.assertEqual(self.index.search_ingredients('rice, -peanut'), [self.risotto.pk, self.curry.pk])
+        self.assertNotIn('ground', self.index.ingredients.vocabulary)
+
+    def test_other_workers_catch_up_from_change_log(self):
+        other_worker = InvertedRecipeIndex()
+        other_worker.ensure_ready()
+        sub_recipe = self.create_recipe('Peanut sauce', ['Peanuts'], is_sub_recipe=True)
+        self.index.recipes_changed([sub_recipe.pk])
+        other_worker._checked_at = 0
+        self.assertEqual(other_worker.search_ingredients('peanut', is_sub_recipe=True), [sub_recipe.pk])
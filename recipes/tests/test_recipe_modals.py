@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from .base import BaseTestCase
+from ..handlers import recipe_modals
+from ..models.recipe_models import Recipe, RecipeIngredient, RecipeStep
+
+
+class RecipeModalsTestCase(BaseTestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(title='Lasagna', author=self.user)
+            RecipeIngredient.objects.create(recipe=self.recipe, name='pasta')
+
+    def test_blank_modals_are_cached_as_html(self):
+        html = recipe_modals.get_modal_html('ingredients')
+        self.assertIsInstance(html, str)
+        self.assertIn('ingredients-0-name', html)
+        with self.assertNumQueries(0):
+            self.assertEqual(recipe_modals.get_modal_html('ingredients'), html)
+        self.assertIn('steps-0-description', recipe_modals.get_modal_html('steps'))
+
+    def test_empty_rows_are_served_once_by_the_page(self):
+        for partial_type in ('ingredients', 'steps'):
+            self.assertNotIn('__prefix__', recipe_modals.get_modal_html(partial_type))
+            self.assertNotIn('__prefix__', recipe_modals.get_modal_html(partial_type, self.recipe.pk))
+        rows = recipe_modals.get_empty_rows_html()
+        self.assertIn('<template id="empty-ingredient-row">', rows)
+        self.assertIn('ingredients-__prefix__-name', rows)
+        self.assertIn('steps-__prefix__-description', rows)
+        with self.assertNumQueries(0):
+            self.assertEqual(recipe_modals.get_empty_rows_html(), rows)
+        self.client.force_login(self.user)
+        page = self.client.get(reverse('recipes:create')).content.decode()
+        self.assertEqual(page.count('<template id="empty-step-row">'), 1)
+
+    def test_recipe_modals_follow_the_recipe(self):
+        self.assertIn('value="pasta"', recipe_modals.get_modal_html('ingredients', self.recipe.pk))
+        with self.assertNumQueries(0):
+            recipe_modals.get_modal_html('ingredients', self.recipe.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeStep.objects.create(recipe=self.recipe, order=1, description='Boil the pasta')
+        self.assertIn('Boil the pasta', recipe_modals.get_modal_html('steps', self.recipe.pk))
+        self.assertIsNone(recipe_modals.get_modal_html('steps', 0))
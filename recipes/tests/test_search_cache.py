@@ -0,0 +1,71 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .base import LOCMEM_CACHES
+from ..handlers import search_cache
+from ..handlers.cache_manager import cache_manager
+from utils.helpers.single_flight import SingleFlight
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_equivalent_searches_share_a_key(self):
+        self.assertEqual(search_cache.search_cache_key('ingredient', 'Rice,  chicken', False),
+                         search_cache.search_cache_key('Ingredient', 'chicken, rice,', False))
+        self.assertEqual(search_cache.search_cache_key('title', 'Banana Bread', False),
+                         search_cache.search_cache_key('title', 'bread banana', False))
+        self.assertNotEqual(search_cache.search_cache_key('title', 'bread', False),
+                            search_cache.search_cache_key('title', 'bread', True))
+
+    def test_generation_bump_invalidates_results(self):
+        results = iter([[1, 2], [3]])
+        compute = lambda: next(results)
+        self.assertEqual(search_cache.cached_search('title', 'bread', False, compute), [1, 2])
+        self.assertEqual(search_cache.cached_search('title', 'BREAD', False, compute), [1, 2])
+        search_cache.bump_generation()
+        self.assertEqual(search_cache.cached_search('title', 'bread', False, compute), [3])
+
+    def test_evicted_generation_does_not_revive_old_results(self):
+        results = iter([[1, 2], [3]])
+        compute = lambda: next(results)
+        self.assertEqual(search_cache.cached_search('title', 'bread', False, compute), [1, 2])
+        search_cache.bump_generation()
+        cache.delete(cache_manager.namespace_generation_key('search'))
+        self.assertEqual(search_cache.cached_search('title', 'bread', False, compute), [3])
+
+    def test_failing_search_runs_once_and_raises(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            raise ValueError('broken query')
+
+        with self.assertRaises(ValueError):
+            search_cache.cached_search('title', 'bread', False, compute)
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_misses_are_coalesced(self):
+        calls = []
+        single_flight = SingleFlight(cache=cache)
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return [42]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(single_flight.get_or_compute('key', compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[42]] * 8)
@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.urls import reverse
+
+from .base import BaseTestCase
+from ..handlers import search_handler
+from ..models.recipe_models import Recipe, RecipeIngredient
+
+
+class SearchHandlerTestCase(BaseTestCase):
+    """
+    Runs against whichever full-text backend the test database provides (FTS5 on SQLite).
+    """
+
+    def setUp(self):
+        # The index is refreshed on commit, run those callbacks inside the test transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pancakes = Recipe.objects.create(title='Banana pancakes', author=self.user,
+                                                  description='Fluffy breakfast')
+            self.bread = Recipe.objects.create(title='Banana bread', author=self.user)
+            RecipeIngredient.objects.create(recipe=self.bread, name='Walnuts')
+            self.sub_recipe = Recipe.objects.create(title='Banana jam', author=self.user, is_sub_recipe=True)
+
+    def test_tokenize_search_text_drops_query_syntax(self):
+        self.assertEqual(search_handler.tokenize_search_text('"Banana" & bread:*'), ['banana', 'bread'])
+
+    def test_search_matches_title_prefix(self):
+        recipe_ids = search_handler.search_recipe_ids('banan')
+        self.assertCountEqual(recipe_ids, [self.pancakes.pk, self.bread.pk])
+
+    def test_search_matches_ingredient_names(self):
+        recipe_ids = search_handler.search_recipe_ids('walnut')
+        self.assertEqual(recipe_ids, [self.bread.pk])
+
+    def test_search_excludes_other_recipe_kind(self):
+        self.assertEqual(search_handler.search_recipe_ids('banana', is_sub_recipe=True), [self.sub_recipe.pk])
+
+    def test_deleted_recipe_leaves_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bread.delete()
+        self.assertEqual(search_handler.search_recipe_ids('walnut'), [])
+
+
+    def test_index_is_refreshed_once_per_transaction(self):
+        with mock.patch.object(search_handler, 'refresh_search_documents') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for name in ('Pecans', 'Honey'):
+                    RecipeIngredient.objects.create(recipe=self.pancakes, name=name)
+                RecipeIngredient.objects.create(recipe=self.bread, name='Butter')
+        refresh.assert_called_once_with({self.pancakes.pk, self.bread.pk})
+
+
+    def test_search_results_tell_when_they_were_truncated(self):
+        search = lambda text: self.client.get(reverse('recipes:recipe_search'), {'search_text': text},
+                                              HTTP_HX_REQUEST='true').content.decode()
+        with mock.patch.object(search_handler, 'SEARCH_RESULTS_LIMIT', 2):
+            self.assertIn('Only the 2 best matches are shown', search('banana'))
+            self.assertNotIn('best matches are shown', search('walnut'))
+
+
+class IngredientMatchTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.omelette = Recipe.objects.create(title='Omelette', author=self.user)
+        self.fried_rice = Recipe.objects.create(title='Fried rice', author=self.user)
+        for name in ('Eggs', 'Chives', 'Butter'):
+            RecipeIngredient.objects.create(recipe=self.omelette, name=name)
+        for name in ('Eggs', 'Jasmine rice', 'Soy sauce'):
+            RecipeIngredient.objects.create(recipe=self.fried_rice, name=name)
+
+    def test_normalize_ingredient_terms(self):
+        self.assertEqual(search_handler.normalize_ingredient_terms(' Eggs ,jasmine   Rice,, eggs'),
+                         ['eggs', 'jasmine rice'])
+
+    def test_match_all_requires_every_term(self):
+        matches = search_handler.match_ingredients(['egg', 'rice'])
+        self.assertEqual(matches, [(self.fried_rice.pk, 2)])
+
+    def test_partial_matches_are_ranked_by_score(self):
+        matches = search_handler.match_ingredients(['egg', 'rice', 'soy'], match_all=False)
+        self.assertEqual(matches, [(self.fried_rice.pk, 3), (self.omelette.pk, 1)])
+
+    def test_with_match_scores(self):
+        matches = search_handler.match_ingredients(['egg', 'butter'], match_all=False)
+        recipes = search_handler.with_match_scores(Recipe.objects.all(), matches, 2)
+        self.assertEqual([recipe.match_score for recipe in recipes], [1.0, 0.5])
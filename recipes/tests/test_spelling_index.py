@@ -0,0 +1,35 @@
+from .base import BaseTestCase
+from ..indexes.spelling_index import SpellingIndex, edit_distance
+from ..models.recipe_models import RecipeIngredient
+
+
+class SpellingIndexTestCase(BaseTestCase):
+
+    def setUp(self):
+        self.index = SpellingIndex()
+        self.lasagna = self.create_recipe('Tomato lasagna', ['Tomatoes', 'Parmesan', 'Lasagna sheets'])
+        self.salad = self.create_recipe('Tomato salad', ['Tomato', 'Basil'])
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('parmesean', 'parmesan', 2), 1)
+        self.assertEqual(edit_distance('basil', 'bsali', 2), 2)
+        self.assertEqual(edit_distance('tomato', 'potatoes', 2), 3)
+
+    def test_corrections_prefer_fewest_edits_then_most_used(self):
+        self.assertEqual(self.index.correct_word('tomatoe'), 'tomato')
+        self.assertEqual(self.index.correct_word('parmesean'), 'parmesan')
+        self.assertEqual(self.index.correct_word('basil'), 'basil')
+        self.assertEqual(self.index.correct_word('xyzzy'), 'xyzzy')
+
+    def test_suggest_keeps_ingredient_terms(self):
+        self.assertEqual(self.index.suggest('tomatoe, parmesean', 'ingredient'), 'tomato, parmesan')
+        self.assertEqual(self.index.suggest('lasagne', 'title'), 'lasagna')
+        self.assertIsNone(self.index.suggest('tomato, basil', 'ingredient'))
+
+    def test_incremental_updates(self):
+        self.assertEqual(self.index.correct_word('basill'), 'basil')
+        RecipeIngredient.objects.filter(recipe=self.salad, name='Basil').delete()
+        RecipeIngredient.objects.create(recipe=self.salad, name='Basmati rice')
+        self.index.recipes_changed([self.salad.pk])
+        self.assertNotIn('basil', self.index.frequencies)
+        self.assertEqual(self.index.correct_word('basmatti'), 'basmati')
@@ -0,0 +1,25 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+
+from .base import BaseTestCase
+from ..handlers.cache_manager import cache_manager
+from ..models.recipe_models import Recipe
+
+
+class WarmCachesTestCase(BaseTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.old = Recipe.objects.create(title='Old', author=self.user)
+        self.recent = Recipe.objects.create(title='Recent', author=self.user)
+
+    def test_lists_and_recent_details_are_warmed(self):
+        output = StringIO()
+        call_command('warm_caches', recipes=1, workers=1, stdout=output)
+        self.assertIn('Warmed', output.getvalue())
+        self.assertNotIn('Error', output.getvalue())
+        self.assertIsNotNone(cache_manager.get('recipe_list', 'newest', 'all'))
+        self.assertIsNotNone(cache_manager.get('recipe_detail', recipe_id=self.recent.pk))
+        self.assertIsNone(cache_manager.get('recipe_detail', recipe_id=self.old.pk))
@@ -13,6 +13,7 @@ urlpatterns = [
     path('recipe/<int:pk>/delete/', recipe_views.RecipeDeleteView.as_view(), name='delete'),
 
     path('recipe/ingredients', recipe_views.IngredientsPartialView.as_view(), name='fetch_ingredients_form'),
+    path('recipe/ingredients/autocomplete', recipe_views.IngredientAutocompleteView.as_view(), name='ingredient_autocomplete'),
     path('recipe/ingredients/<int:pk>', recipe_views.IngredientsPartialView.as_view(), name='fetch_recipe_ingredients'),
     path('recipe/ingredients/<int:pk>/update', recipe_views.IngredientsPartialView.as_view(), name='update_recipe_ingredients'),
 
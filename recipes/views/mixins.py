@@ -0,0 +1,16 @@
+from ..indexes.spelling_index import spelling_index
+
+
+class SpellingSuggestionMixin:
+    """
+    View mixin adding a "did you mean" link to searches that found nothing.
+    """
+
+    def get_spelling_context(self, search_text: str, search_type: str) -> dict:
+        suggestion = spelling_index.suggest(search_text, search_type)
+        if not suggestion:
+            return {}
+        query = self.request.GET.copy()
+        query.pop('cursor', None)
+        query['search_text'] = suggestion
+        return {'did_you_mean': suggestion, 'did_you_mean_url': f'{self.request.path}?{query.urlencode()}'}
@@ -1,7 +1,7 @@
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.urls import reverse_lazy
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import Http404, HttpResponse, JsonResponse, HttpResponseForbidden
 from django.db import transaction, IntegrityError
 
 from ..models.recipe_models import RecipeSubRecipe, Recipe
@@ -11,17 +11,23 @@ from utils.helpers.mixins import RegisteredUserAuthRequired
 
 
 
-from ..handlers import recipes_handler
+from ..handlers import (recipes_handler, search_handler, search_cache, filter_handler, filter_sets, recipe_cards,
+                        recipe_details, recipe_modals)
+from ..handlers.conditional import ConditionalGetMixin
+from ..handlers.pagination import KeysetPaginationMixin
+from ..indexes.ingredient_index import ingredient_index, SUGGESTIONS_LIMIT
+from ..indexes.pantry_index import pantry_index
+from .mixins import SpellingSuggestionMixin
 
-class RecipeListView(ListView):
+class RecipeListView(ConditionalGetMixin, SpellingSuggestionMixin, KeysetPaginationMixin, ListView):
     """
-    View to display all recipes
+    View to display all recipes, paginated with cursors (see handlers/pagination.py)
     """
     model = Recipe
+    validator_namespace = 'recipe_list'
     form_class = RecipeFilterForm
     template_name = 'recipes/home.html'
     context_object_name = 'recipes'
-    paginate_by = 12
 
     def get(self, request, *args, **kwargs):
         if request.htmx:
@@ -30,78 +36,125 @@ class RecipeListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        page = self.get_list_page(self.object_list)
+        context['recipes'] = page.object_list
+        context['next_page_url'] = self.get_next_page_url(page)
         context['search_url'] = 'recipes:recipe_search'
-        context['filter_form'] = self.form_class(self.request.GET or None)
+        filter_form = self.get_filter_form()
+        filter_form.set_facet_counts(filter_handler.get_facet_counts(self.get_filters()))
+        context['filter_form'] = filter_form
         return context
 
+    def get_filter_form(self):
+        if not hasattr(self, '_filter_form'):
+            self._filter_form = self.form_class(self.request.GET or None)
+        return self._filter_form
+
+    def get_filters(self) -> dict:
+        return filter_handler.get_selected_filters(self.get_filter_form())
+
+    def get_list_page(self, queryset):
+        """
+        Filtered pages come from the Redis filter sets when they can serve the sort order;
+        everything else is paged from the cached leading ids of the list, then the queryset.
+        Either way the page holds ids, rendered as cards (see handlers/recipe_cards.py).
+        """
+        filters = self.get_filters()
+        descending = filter_sets.ID_SORTS.get(self.get_sort())
+        page = None
+        if filters and descending is not None:
+            page = self.get_id_page(
+                lambda after_id, limit: filter_sets.page_ids(filters, False, descending, after_id, limit))
+        if page is None:
+            page = self.get_cached_keyset_page(queryset, 'recipe_list', filter_handler.filters_key(filters))
+        return page._replace(object_list=recipe_cards.get_cards(page.object_list))
+
     def get_queryset(self):
-        # Try to get cached data
-        cache_key = 'recipe_list_queryset'
-        queryset = recipes_handler.get_cached_object(cache_key)
-        if queryset is None:
-            # If not in cache, get fresh data and cache it
-            queryset = super().get_queryset().filter(is_sub_recipe=False)
-            success, error_maessage = recipes_handler.set_cached_object(cache_key, queryset, timeout=60 * 60)  # Cache for 1 hour
-            if not success:
-                raise Exception(f"Failed to set cache: {error_maessage}")
-        form = self.form_class(self.request.GET or None)
-        if form.is_valid():
-            category = form.cleaned_data.get('category')
-            tag = form.cleaned_data.get('tag')
-            if category and category.exists():
-                queryset = queryset.filter(categories__in=category).distinct()
-            if tag and tag.exists():
-                queryset = queryset.filter(tags__in=tag).distinct()
-        return queryset
-        
+        queryset = super().get_queryset().filter(is_sub_recipe=False)
+        return filter_handler.apply_filters(queryset, self.get_filters())
+
 
     def search(self, request):
+        """
+        Handles HTMX requests: search results and the next pages fetched by the infinite scroll.
+        Search results are ranked, so they are paginated by position; the plain list uses keyset pages.
+        """
         search_elements = request.GET.get('search_text')
-        search_type = request.GET.get('searchType')
+        search_type = (request.GET.get('searchType') or 'title').lower()
+        filters = self.get_filters()
+        context = {}
 
         if search_elements:
-            if search_type.lower() == 'title':
-                recipes = self.model.objects.filter(title__icontains=search_elements)
-            elif search_type.lower() == 'ingredient':
-                ingredients_to_search = [ingredient.strip() for ingredient in search_elements.split(',') if ingredient.strip()]
-
-                query_set = self.model.objects.all()
-                for ingredient in ingredients_to_search:
-                    query_set = query_set.filter(ingredients__name__icontains=ingredient)
-                recipes = query_set.distinct()
+            # Search results are cached unfiltered, so the facet counts can be computed from them
+            if search_type == 'title':
+                recipe_ids = search_cache.cached_search(
+                    search_type, search_elements, False,
+                    lambda: search_handler.search_recipe_ids(search_elements, is_sub_recipe=False))
+                search_ids = recipe_ids
+                page = self.get_ranked_page(filter_handler.filter_recipe_ids(recipe_ids, filters))
+                recipes = recipe_cards.get_cards(page.object_list)
+            elif search_type in ('ingredient', 'ingredient_any'):
+                # 'ingredient' requires every ingredient, 'ingredient_any' ranks partial matches
+                matches, terms_count = search_cache.cached_search(
+                    search_type, search_elements, False,
+                    lambda: search_handler.find_ingredient_matches(
+                        search_elements, is_sub_recipe=False, match_all=search_type == 'ingredient'))
+                search_ids = [recipe_id for recipe_id, _ in matches]
+                page = self.get_ranked_page(filter_handler.filter_matches(matches, filters))
+                recipes = search_handler.with_match_scores(recipe_cards.get_cards, page.object_list, terms_count)
+                if search_type == 'ingredient_any':
+                    context['searched_ingredients'] = terms_count
+            elif search_type == 'pantry':
+                # "What can I cook": recipes ranked by the share of their ingredients in the pantry
+                matches = search_cache.cached_search(
+                    search_type, search_elements, False,
+                    lambda: pantry_index.search(search_elements, is_sub_recipe=False))
+                search_ids = [match.recipe_id for match in matches]
+                page = self.get_ranked_page(filter_handler.filter_matches(matches, filters))
+                recipes = search_handler.with_pantry_coverage(recipe_cards.get_cards, page.object_list)
+                context['pantry_search'] = True
             else:
                 return JsonResponse({'error': 'Invalid search type'}, status=400)
         else:
-            recipes = self.model.objects.filter(is_sub_recipe=False)
-
-        return render(request, 'recipes/partials/recipe_list.html', {'recipes': recipes})
-
-
-class RecipeDetailView(DetailView):
+            search_ids = None
+            page = self.get_list_page(self.get_queryset())
+            recipes = page.object_list
+        if search_elements and not search_ids and not self.is_next_page_request():
+            context.update(self.get_spelling_context(search_elements, search_type))
+        if search_elements and search_handler.is_truncated(search_ids):
+            # The results and facet counts only cover the best matches
+            context['results_limit'] = search_handler.SEARCH_RESULTS_LIMIT
+        if not self.is_next_page_request():
+            # Refresh the facet counts of the filters form along with the results (out-of-band swap)
+            filter_form = self.get_filter_form()
+            filter_form.set_facet_counts(filter_handler.get_facet_counts(
+                filters, search_type if search_elements else None, search_elements, search_ids))
+            context['filter_form'] = filter_form
+            context['facets_oob'] = True
+        context['recipes'] = recipes
+        context['next_page_url'] = self.get_next_page_url(page)
+        if self.is_next_page_request():
+            return render(request, 'recipes/partials/recipe_cards.html', context)
+        return render(request, 'recipes/partials/recipe_list.html', context)
+
+
+class RecipeDetailView(ConditionalGetMixin, DetailView):
     """
     View for recipe details, also displays related recipes
     """
     model = Recipe
+    validator_namespace = 'recipe_detail'
 
     def get_object(self, queryset=None):
-        # Try to get cached data
-        cache_key = f'recipe_detail_{self.kwargs.get("pk")}'
-        response = recipes_handler.get_cached_object(cache_key)
-        
-        #if response is None:
-            # If not in cache, get fresh data and cache it
-        queryset = self.get_queryset().prefetch_related('steps', 'ingredients', 'parent_recipe', 'categories', 'tags')
-        response = super().get_object(queryset)
-        print(response.sub_recipe.all())
-        success, error_message = recipes_handler.set_cached_object(cache_key, response, timeout=60 * 60)  # Cache for 1 hour
-        if not success:
-            raise Exception(f"Failed to set cache: {error_message}")
-        return response
+        # A read-only RecipeDetail cached as plain tuples (see handlers/recipe_details.py)
+        recipe = recipe_details.get_detail('recipe_detail', self.kwargs.get('pk'))
+        if recipe is None:
+            raise Http404('No recipe found matching the query')
+        return recipe
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['can_edit'] = self.can_edit_recipe()
-        print(context)
         return context
     
 
@@ -109,7 +162,7 @@ class RecipeDetailView(DetailView):
         """
         Determines if the user can edit the recipe.
         """
-        return self.request.user.id == self.object.author.id or self.request.user.is_staff or self.request.user.is_superuser
+        return self.request.user.id == self.object.author_id or self.request.user.is_staff or self.request.user.is_superuser
 
 
 
@@ -143,8 +196,6 @@ class RecipeCreateView(RegisteredUserAuthRequired, CreateView):
                                                             self.intermidiate_table)
                 # Save many-to-many relationships for categories and tags
                 form.save_m2m()  
-                # Clear the cache for recipe list to ensure new recipe appears
-                transaction.on_commit(lambda: recipes_handler.invalidate_recipe_cache())
         except ValueError as ve:
             # attach the error to the form and return invalid
             form.add_error(None, str(ve))
@@ -199,8 +250,6 @@ class RecipeUpdateView(RegisteredUserAuthRequired, UpdateView):
                         if not success:     
                             raise ValueError(error_message)
                 form.save_m2m()  # Save many-to-many relationships for categories and tags
-                record_id = f'recipe_detail_{self.object.id}'
-                transaction.on_commit(lambda: recipes_handler.invalidate_recipe_cache(record_id))
         except ValueError as ve:
             # attach the error to the form and return invalid
             form.add_error(None, str(ve))
@@ -225,24 +274,11 @@ class RecipeDeleteView(DeleteView):
     model = Recipe
     success_url = reverse_lazy('recipes:home')
 
-    def delete(self, request, *args, **kwargs):
-        """ 
-        Handles the deletion of a recipe.
-        This method overrides the default delete method to ensure that the recipe is deleted
-        and the cache is invalidated for both the recipe detail and the recipe list.
-        """
-        # Invalidate cache for this recipe and the recipe list
-        cache_key_detail = f'recipe_detail_{self.kwargs.get("pk")}'
-        recipes_handler.invalidate_recipe_cache(cache_key_detail)
-
-        return super().delete(request, *args, **kwargs)
-    
-
     def post(self, request, *args, **kwargs):
         """
         Handles the POST request for deleting a recipe.
-        This method overrides the default post method to ensure that the recipe is deleted
-        and the cache is invalidated for both the recipe detail and the recipe list.
+        Only the author can delete the recipe, the caches showing it are invalidated by the
+        model signals once the delete is committed.
         """
         if self.request.user == self.get_object().author:
             return self.delete(request, *args, **kwargs)
@@ -250,7 +286,7 @@ class RecipeDeleteView(DeleteView):
             return HttpResponseForbidden()
 
 
-class IngredientsPartialView(RegisteredUserAuthRequired, View):
+class IngredientsPartialView(RegisteredUserAuthRequired, ConditionalGetMixin, View):
     """
     Handles ingredient modal requests for both new and existing recipes.
     Supports both GET (display form) and POST (save ingredients).
@@ -258,13 +294,14 @@ class IngredientsPartialView(RegisteredUserAuthRequired, View):
 
     model = Recipe
     form_class = RecipeIngredientForm
-    template_name = 'recipes/html_modals/ingredients_modal.html'
+    validator_namespace = 'ingredients_form'
 
     def get(self, request, *args, **kwargs):
-        pk = kwargs.get('pk')
-        context = self._get_ingredients_context(pk)
-        
-        return render(request, self.template_name, context)
+        # Cached as rendered HTML (see handlers/recipe_modals.py)
+        html = recipe_modals.get_modal_html('ingredients', kwargs.get('pk'))
+        if html is None:
+            raise Http404('No recipe found matching the query')
+        return HttpResponse(html)
     
     def post(self, request, *args, **kwargs):
         pk = kwargs.get('pk')
@@ -276,23 +313,6 @@ class IngredientsPartialView(RegisteredUserAuthRequired, View):
         return JsonResponse(error_response, status=400)
 
 
-    def _get_ingredients_context(self, pk=None):
-        if pk:
-            cache_key = f'recipe_ingredients_{pk}'
-            context = recipes_handler.get_cached_object(cache_key)
-            if not context:
-                recipe = self.model.objects.get(id=pk)
-                context = recipes_handler.fetch_partial_recipe_context_data_for_get(recipe, 'ingredients')
-                recipes_handler.set_cached_object(cache_key, context)
-        else:
-            cache_key = f'recipe_ingredients'
-            context = recipes_handler.get_cached_object(cache_key)
-            if not context:
-                context = recipes_handler.fetch_partial_recipe_context_data_for_get(None,'ingredients', extra_forms=1)
-                recipes_handler.set_cached_object(cache_key, context)
-        return context
- 
-
     def _handle_update_post_request(self, request, pk):
         """
         Handles the POST request for updating ingredients of an existing recipe.
@@ -307,10 +327,6 @@ class IngredientsPartialView(RegisteredUserAuthRequired, View):
             ingredients_formset = context.get('ingredients_formset')
             if ingredients_formset.is_valid():
                 ingredients_formset.save()
-                ingredients_cache_key = f'recipe_ingredients_{pk}'
-                recipe_ingredients_cache_key = f'recipe_detail_{pk}'
-                recipes_handler.invalidate_recipe_cache(recipe_ingredients_cache_key)
-                recipes_handler.invalidate_recipe_cache(ingredients_cache_key)
 
                 updated_ingredients = [
                     {
@@ -341,7 +357,7 @@ class IngredientsPartialView(RegisteredUserAuthRequired, View):
         
 
 
-class StepsPartialView(RegisteredUserAuthRequired, View):
+class StepsPartialView(RegisteredUserAuthRequired, ConditionalGetMixin, View):
     """
     Handles steps modal requests for both new and existing recipes.
     Supports both GET (display form) and POST (save steps).
@@ -349,13 +365,14 @@ class StepsPartialView(RegisteredUserAuthRequired, View):
 
     model = Recipe
     form_class = RecipeStepForm
-    template_name = 'recipes/html_modals/steps_modal.html'
+    validator_namespace = 'steps_form'
 
     def get(self, request, *args, **kwargs):
-        pk = kwargs.get('pk')
-        context = self._get_steps_context(pk)
-        
-        return render(request, self.template_name, context)
+        # Cached as rendered HTML (see handlers/recipe_modals.py)
+        html = recipe_modals.get_modal_html('steps', kwargs.get('pk'))
+        if html is None:
+            raise Http404('No recipe found matching the query')
+        return HttpResponse(html)
     
     def post(self, request, *args, **kwargs):
         pk = kwargs.get('pk')
@@ -367,23 +384,6 @@ class StepsPartialView(RegisteredUserAuthRequired, View):
         return JsonResponse(error_response, status=400)
 
 
-    def _get_steps_context(self, pk=None):
-        if pk:
-            cache_key = f'recipe_steps_{pk}'
-            context = recipes_handler.get_cached_object(cache_key)
-            if not context:
-                recipe = self.model.objects.get(id=pk)
-                context = recipes_handler.fetch_partial_recipe_context_data_for_get(recipe, 'steps')
-                recipes_handler.set_cached_object(cache_key, context)
-        else:
-            cache_key = f'recipe_steps'
-            context = recipes_handler.get_cached_object(cache_key)
-            if not context:
-                context = recipes_handler.fetch_partial_recipe_context_data_for_get(None, 'steps', extra_forms=1)
-                recipes_handler.set_cached_object(cache_key, context)
-        return context
-
-
     def _handle_update_post_request(self, request, pk):
         """
         Handles the POST request for updating steps of an existing recipe.
@@ -398,10 +398,6 @@ class StepsPartialView(RegisteredUserAuthRequired, View):
             steps_formset = context.get('steps_formset')
             if steps_formset.is_valid():
                 steps_formset.save()
-                ingredients_cache_key = f'recipe_steps_{pk}'
-                recipe_ingredients_cache_key = f'recipe_detail_{pk}'
-                recipes_handler.invalidate_recipe_cache(recipe_ingredients_cache_key)
-                recipes_handler.invalidate_recipe_cache(ingredients_cache_key)
 
                 updated_steps = [
                     {
@@ -430,3 +426,18 @@ class StepsPartialView(RegisteredUserAuthRequired, View):
             return JsonResponse(error_response)
         
 
+
+
+class IngredientAutocompleteView(View):
+    """
+    Suggests known ingredient names for the ingredient modal and the ingredient search box,
+    most used first (see indexes/ingredient_index.py).
+    """
+
+    def get(self, request, *args, **kwargs):
+        prefix = request.GET.get('q', '')
+        try:
+            limit = min(int(request.GET.get('limit', SUGGESTIONS_LIMIT)), 50)
+        except ValueError:
+            limit = SUGGESTIONS_LIMIT
+        return JsonResponse({'suggestions': ingredient_index.suggest(prefix, max(limit, 1))})
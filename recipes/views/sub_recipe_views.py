@@ -1,26 +1,32 @@
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.urls import reverse_lazy
 from django.shortcuts import render, redirect
-from django.core.cache import cache
 from django.db import transaction, IntegrityError
 
 from utils.helpers.mixins import RegisteredUserAuthRequired
 from ..models.recipe_models import RecipeSubRecipe, Recipe
 from ..forms.recipe_forms import SubRecipeCreateForm, SubRecipeUpdateForm
-from ..handlers import recipes_handler
-from ..handlers.recipes_handler import invalidate_recipe_cache
+from ..handlers import search_handler, search_cache, recipe_cards, recipe_details
+from ..handlers.conditional import ConditionalGetMixin
+from ..handlers.pagination import KeysetPaginationMixin
+from ..indexes.pantry_index import pantry_index
+from .mixins import SpellingSuggestionMixin
 
-class SubRecipeListView(ListView):
+class SubRecipeListView(ConditionalGetMixin, SpellingSuggestionMixin, KeysetPaginationMixin, ListView):
     """
     View to display all sub recipes, it also handles search functionality.
     """
     model = Recipe
+    validator_namespace = 'sub_recipe_list'
     template_name = 'sub_recipes/sub_recipe_home.html'
     context_object_name = 'sub_recipes'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        page = self.get_list_page(self.object_list)
+        context['sub_recipes'] = page.object_list
+        context['next_page_url'] = self.get_next_page_url(page)
         context['search_url'] = 'recipes:sub_recipe_search'
         return context
     
@@ -31,31 +37,54 @@ class SubRecipeListView(ListView):
         return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
-        cache_key = 'sub_recipe_list_queryset'
-        cached_queryset_data = cache.get(cache_key)
-        if cached_queryset_data is None:
-            queryset = super().get_queryset()
-            queryset = queryset.filter(is_sub_recipe=True).prefetch_related('ingredients', 'steps')
-            cache.set(cache_key, queryset, timeout=60 * 15)
-            return queryset
-        return cached_queryset_data
+        return super().get_queryset().filter(is_sub_recipe=True)
+
+    def get_list_page(self, queryset):
+        page = self.get_cached_keyset_page(queryset, 'sub_recipe_list')
+        return page._replace(object_list=recipe_cards.get_cards(page.object_list))
 
     def search(self, request):
         search = request.GET.get('search_text')
-        search_type = request.GET.get('searchType')
+        search_type = (request.GET.get('searchType') or 'title').lower()
+        context = {}
         if search:
-            if search_type.lower() == 'title':
-                sub_recipes = self.model.objects.filter(title__icontains=search, is_sub_recipe=True)
+            if search_type == 'title':
+                sub_recipe_ids = search_cache.cached_search(
+                    search_type, search, True,
+                    lambda: search_handler.search_recipe_ids(search, is_sub_recipe=True))
+                search_ids = sub_recipe_ids
+                page = self.get_ranked_page(sub_recipe_ids)
+                sub_recipes = recipe_cards.get_cards(page.object_list)
+            elif search_type == 'pantry':
+                matches = search_cache.cached_search(
+                    search_type, search, True,
+                    lambda: pantry_index.search(search, is_sub_recipe=True))
+                search_ids = matches
+                page = self.get_ranked_page(matches)
+                sub_recipes = search_handler.with_pantry_coverage(recipe_cards.get_cards, page.object_list)
+                context['pantry_search'] = True
             else:
-                sub_ingredients_to_search = [ingredient.strip() for ingredient in search.split(',') if ingredient.strip()]
-
-                query_set = self.model.objects.filter(is_sub_recipe=True)
-                for ingredient in sub_ingredients_to_search:
-                    query_set = query_set.filter(ingredients__name__icontains=ingredient)
-                sub_recipes = query_set.distinct()
+                matches, terms_count = search_cache.cached_search(
+                    search_type, search, True,
+                    lambda: search_handler.find_ingredient_matches(
+                        search, is_sub_recipe=True, match_all=search_type != 'ingredient_any'))
+                search_ids = matches
+                page = self.get_ranked_page(matches)
+                sub_recipes = search_handler.with_match_scores(recipe_cards.get_cards, page.object_list, terms_count)
+                if search_type == 'ingredient_any':
+                    context['searched_ingredients'] = terms_count
         else:
-            sub_recipes = self.model.objects.filter(is_sub_recipe=True)
-        return render(request, 'recipes/partials/sub_recipe_list.html', {'sub_recipes': sub_recipes})
+            page = self.get_list_page(self.get_queryset())
+            sub_recipes = page.object_list
+        if search and not sub_recipes and not self.is_next_page_request():
+            context.update(self.get_spelling_context(search, search_type))
+        if search and search_handler.is_truncated(search_ids):
+            context['results_limit'] = search_handler.SEARCH_RESULTS_LIMIT
+        context['sub_recipes'] = sub_recipes
+        context['next_page_url'] = self.get_next_page_url(page)
+        if self.is_next_page_request():
+            return render(request, 'recipes/partials/sub_recipe_cards.html', context)
+        return render(request, 'recipes/partials/sub_recipe_list.html', context)
 
 
 class SubRecipeCreateView(RegisteredUserAuthRequired, CreateView):
@@ -82,7 +111,6 @@ class SubRecipeCreateView(RegisteredUserAuthRequired, CreateView):
                 if sub_recipes:
                     form.save_recipe_sub_recipe_relationship(self.object, sub_recipes, 
                                                                     self.intermidiate_table)
-            transaction.on_commit(lambda: recipes_handler.invalidate_recipe_cache(is_subrecipe=True))
         except ValueError as ve:
             # attach the error to the form and return invalid
             form.add_error(None, str(ve))
@@ -98,22 +126,20 @@ class SubRecipeCreateView(RegisteredUserAuthRequired, CreateView):
         return redirect(self.object.get_absolute_url())
 
 
-class SubRecipeDetailView(DetailView):
+class SubRecipeDetailView(ConditionalGetMixin, DetailView):
     """"
     View for sub recipe details, also displays related main recipes.
     """
     model = Recipe
+    validator_namespace = 'sub_recipe_detail'
     template_name = 'sub_recipes/subrecipe_detail.html'
 
     def get_object(self, queryset=None):
-        cache_key = f'sub_recipe_detail_{self.kwargs.get("pk")}'
-        cached_object_data = cache.get(cache_key)
-        if cached_object_data is None:
-            queryset = self.get_queryset().prefetch_related('ingredients', 'steps', 'parent_recipe')
-            response = super().get_object(queryset)
-            cache.set(cache_key, response, timeout=60 * 60)
-            return response
-        return cached_object_data
+        # A read-only RecipeDetail cached as plain tuples (see handlers/recipe_details.py)
+        sub_recipe = recipe_details.get_detail('sub_recipe_detail', self.kwargs.get('pk'))
+        if sub_recipe is None:
+            raise Http404('No sub recipe found matching the query')
+        return sub_recipe
     
 
     def get_context_data(self, **kwargs):
@@ -128,7 +154,7 @@ class SubRecipeDetailView(DetailView):
         """
         Determines if the user can edit the recipe.
         """
-        return self.request.user.id == self.object.author.id or self.request.user.is_staff or self.request.user.is_superuser
+        return self.request.user.id == self.object.author_id or self.request.user.is_staff or self.request.user.is_superuser
 
 
 class SubRecipeUpdateView(RegisteredUserAuthRequired, UpdateView):
@@ -150,7 +176,6 @@ class SubRecipeUpdateView(RegisteredUserAuthRequired, UpdateView):
         try:
             with transaction.atomic():
                 self.object = form.save()
-                sub_recipe_id = f'sub_recipe_detail_{self.object.pk}'
                 if 'sub_recipes' in form.changed_data:
                     existing_sub_recipes = set(self.object.sub_recipe.all())
                     new_sub_recipes = set(form.cleaned_data.get('sub_recipes'))
@@ -171,8 +196,6 @@ class SubRecipeUpdateView(RegisteredUserAuthRequired, UpdateView):
                         )
                         if not success:
                             raise ValueError(message)
-                    # Invalidate cache for this sub recipe
-            transaction.on_commit(lambda: recipes_handler.invalidate_recipe_cache(sub_recipe_id, is_subrecipe=True))
         except ValueError as ve:
             # attach the error to the form and return invalid
             form.add_error(None, str(ve))
@@ -197,22 +220,10 @@ class SubRecipeDeleteView(RegisteredUserAuthRequired, DeleteView):
     model = Recipe
     success_url = reverse_lazy('recipes:sub_recipes')
 
-    def delete(self, request, *args, **kwargs):
-        """ 
-        Handles the deletion of a sub recipe.
-        This method overrides the default delete method to ensure that the sin recipe is deleted
-        and the cache is invalidated for both the detail and list sub recipes.
-        """
-        # Invalidate cache for this recipe and the recipe list
-        cache_key_detail = f'sub_recipe_detail_{self.kwargs.get("pk")}'
-        recipes_handler.invalidate_recipe_cache(cache_key_detail, is_subrecipe=True)
-        return super().delete(request, *args, **kwargs)
-    
-
     def post(self, request, *args, **kwargs):
         """
         Handles the POST request for deleting a sub recipe.
-        This method overrides the default post method to ensure that the sub recipe is deleted
-        and the cache is invalidated for both the detail and list sub recipes.
+        The caches showing the sub recipe (including its parent recipes) are invalidated by the
+        model signals once the delete is committed.
         """
         return self.delete(request, *args, **kwargs)
\ No newline at end of file
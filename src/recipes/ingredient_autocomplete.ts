@@ -0,0 +1,65 @@
+export class IngredientAutocomplete {
+    private datalist: HTMLDataListElement;
+    private debounceTimer: number | undefined;
+    private controller: AbortController | null = null;
+    private static readonly DEBOUNCE_MS = 120;
+
+    constructor() {
+        this.datalist = document.createElement('datalist');
+        this.datalist.id = 'ingredient-suggestions';
+        document.body.appendChild(this.datalist);
+        // Delegated, so ingredient rows added to the modal later are covered too
+        document.addEventListener('input', (event) => {
+            const target = event.target as HTMLElement;
+            if (target instanceof HTMLInputElement && target.dataset.autocompleteUrl) {
+                this.scheduleSuggestions(target);
+            }
+        });
+    }
+
+    private scheduleSuggestions(input: HTMLInputElement): void {
+        if (!this.isIngredientInput(input)) {
+            input.removeAttribute('list');
+            return;
+        }
+        input.setAttribute('list', this.datalist.id);
+        window.clearTimeout(this.debounceTimer);
+        this.debounceTimer = window.setTimeout(() => this.fetchSuggestions(input), IngredientAutocomplete.DEBOUNCE_MS);
+    }
+
+    private isIngredientInput(input: HTMLInputElement): boolean {
+        // The search box only completes ingredient searches
+        const searchType = input.form?.querySelector<HTMLSelectElement>('select[name="searchType"]');
+        return !searchType || searchType.value.startsWith('ingredient');
+    }
+
+    private async fetchSuggestions(input: HTMLInputElement): Promise<void> {
+        // Comma separated searches complete their last ingredient
+        const separator = input.value.lastIndexOf(',');
+        const head = separator >= 0 ? input.value.slice(0, separator + 1) + ' ' : '';
+        const prefix = input.value.slice(separator + 1).trim();
+        if (!prefix) {
+            this.datalist.innerHTML = '';
+            return;
+        }
+
+        this.controller?.abort();
+        this.controller = new AbortController();
+        const url = `${input.dataset.autocompleteUrl}?q=${encodeURIComponent(prefix)}`;
+        try {
+            const response = await fetch(url, { signal: this.controller.signal });
+            if (!response.ok) return;
+            const result: { suggestions: string[] } = await response.json();
+            this.datalist.innerHTML = '';
+            result.suggestions.forEach(suggestion => {
+                const option = document.createElement('option');
+                option.value = head + suggestion;
+                this.datalist.appendChild(option);
+            });
+        } catch (error) {
+            if (!(error instanceof DOMException && error.name === 'AbortError')) {
+                console.error('Failed to fetch ingredient suggestions', error);
+            }
+        }
+    }
+}
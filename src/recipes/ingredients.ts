@@ -264,16 +264,16 @@ export class IngredientsManager extends BaseFormManager<Ingredient> {
 
         let formsetDiv = this.htmlModal.querySelector<HTMLElement>('#ingredients-formset');
         let totalFormsInput = this.htmlModal.querySelector<HTMLInputElement>('#id_ingredients-TOTAL_FORMS');
-        let emptyForm = this.htmlForm.querySelector<HTMLElement>('#empty-form');
-        if (!formsetDiv || !totalFormsInput || !emptyForm) {
+        // The page hosting the modals carries the empty row once (see handlers/recipe_modals.py)
+        let emptyRow = document.querySelector<HTMLTemplateElement>('#empty-ingredient-row');
+        if (!formsetDiv || !totalFormsInput || !emptyRow) {
             console.error('Required elements not found.');
             return;
         }
         
         let totalForms = parseInt(totalFormsInput.value, 10);
         
-        const newForm = emptyForm.cloneNode(true) as HTMLElement;
-        newForm.style.display = 'block';
+        const newForm = emptyRow.content.firstElementChild!.cloneNode(true) as HTMLElement;
         const formElements = newForm.querySelectorAll('input, select, label');
 
         formElements.forEach((element: Element) => {
@@ -2,12 +2,14 @@ import { RecipeManager } from './recipes.js';
 import { FilterPanelManager } from './filter_panel.js';
 import { IngredientsManager } from './ingredients.js';
 import { StepsManager } from './recipe_steps.js';
+import { IngredientAutocomplete } from './ingredient_autocomplete.js';
 import { FormManagerConfig } from './interfaces/recipe_items_interfaces.js'
 import { RecipeObjectType , RecipeType} from './enums.js';
 
 
 document.addEventListener('DOMContentLoaded', () => {
     new FilterPanelManager();
+    new IngredientAutocomplete();
     const form = document.querySelector('#recipe-form, #sub-recipe-form');
     if (form) {
         new RecipeManager(form.id);
@@ -177,8 +177,9 @@ export class StepsManager  extends BaseFormManager<Step>{
         const mainForm = this.htmlModal!;
         let formsetDiv = mainForm.querySelector<HTMLElement>('#steps-formset');
         let totalFormsInput = mainForm.querySelector<HTMLInputElement>('#id_steps-TOTAL_FORMS');
-        let emptyForm = mainForm.querySelector<HTMLElement>('#empty-step-form');
-        if (!formsetDiv || !totalFormsInput || !emptyForm) {
+        // The page hosting the modals carries the empty row once (see handlers/recipe_modals.py)
+        let emptyRow = document.querySelector<HTMLTemplateElement>('#empty-step-row');
+        if (!formsetDiv || !totalFormsInput || !emptyRow) {
             console.error('Required elements not found.');
             return;
         }
@@ -186,8 +187,7 @@ export class StepsManager  extends BaseFormManager<Step>{
         let totalForms = parseInt(totalFormsInput.value, 10);
 
         // Deep clone to maintain exact structure
-        const newStepForm = emptyForm.cloneNode(true) as HTMLElement;
-        newStepForm.style.display = 'block';
+        const newStepForm = emptyRow.content.firstElementChild!.cloneNode(true) as HTMLElement;
 
         // Update form IDs and names
         const formElements = newStepForm.querySelectorAll('input, textarea, label');
@@ -0,0 +1,73 @@
+var __awaiter = (this && this.__awaiter) || function (thisArg, _arguments, P, generator) {
+    function adopt(value) { return value instanceof P ? value : new P(function (resolve) { resolve(value); }); }
+    return new (P || (P = Promise))(function (resolve, reject) {
+        function fulfilled(value) { try { step(generator.next(value)); } catch (e) { reject(e); } }
+        function rejected(value) { try { step(generator["throw"](value)); } catch (e) { reject(e); } }
+        function step(result) { result.done ? resolve(result.value) : adopt(result.value).then(fulfilled, rejected); }
+        step((generator = generator.apply(thisArg, _arguments || [])).next());
+    });
+};
+export class IngredientAutocomplete {
+    constructor() {
+        this.controller = null;
+        this.datalist = document.createElement('datalist');
+        this.datalist.id = 'ingredient-suggestions';
+        document.body.appendChild(this.datalist);
+        // Delegated, so ingredient rows added to the modal later are covered too
+        document.addEventListener('input', (event) => {
+            const target = event.target;
+            if (target instanceof HTMLInputElement && target.dataset.autocompleteUrl) {
+                this.scheduleSuggestions(target);
+            }
+        });
+    }
+    scheduleSuggestions(input) {
+        if (!this.isIngredientInput(input)) {
+            input.removeAttribute('list');
+            return;
+        }
+        input.setAttribute('list', this.datalist.id);
+        window.clearTimeout(this.debounceTimer);
+        this.debounceTimer = window.setTimeout(() => this.fetchSuggestions(input), IngredientAutocomplete.DEBOUNCE_MS);
+    }
+    isIngredientInput(input) {
+        var _a;
+        // The search box only completes ingredient searches
+        const searchType = (_a = input.form) === null || _a === void 0 ? void 0 : _a.querySelector('select[name="searchType"]');
+        return !searchType || searchType.value.startsWith('ingredient');
+    }
+    fetchSuggestions(input) {
+        return __awaiter(this, void 0, void 0, function* () {
+            var _a;
+            // Comma separated searches complete their last ingredient
+            const separator = input.value.lastIndexOf(',');
+            const head = separator >= 0 ? input.value.slice(0, separator + 1) + ' ' : '';
+            const prefix = input.value.slice(separator + 1).trim();
+            if (!prefix) {
+                this.datalist.innerHTML = '';
+                return;
+            }
+            (_a = this.controller) === null || _a === void 0 ? void 0 : _a.abort();
+            this.controller = new AbortController();
+            const url = `${input.dataset.autocompleteUrl}?q=${encodeURIComponent(prefix)}`;
+            try {
+                const response = yield fetch(url, { signal: this.controller.signal });
+                if (!response.ok)
+                    return;
+                const result = yield response.json();
+                this.datalist.innerHTML = '';
+                result.suggestions.forEach(suggestion => {
+                    const option = document.createElement('option');
+                    option.value = head + suggestion;
+                    this.datalist.appendChild(option);
+                });
+            }
+            catch (error) {
+                if (!(error instanceof DOMException && error.name === 'AbortError')) {
+                    console.error('Failed to fetch ingredient suggestions', error);
+                }
+            }
+        });
+    }
+}
+IngredientAutocomplete.DEBOUNCE_MS = 120;
@@ -243,14 +243,14 @@ export class IngredientsManager extends BaseFormManager {
     addItemToForm() {
         let formsetDiv = this.htmlModal.querySelector('#ingredients-formset');
         let totalFormsInput = this.htmlModal.querySelector('#id_ingredients-TOTAL_FORMS');
-        let emptyForm = this.htmlForm.querySelector('#empty-form');
-        if (!formsetDiv || !totalFormsInput || !emptyForm) {
+        // The page hosting the modals carries the empty row once (see handlers/recipe_modals.py)
+        let emptyRow = document.querySelector('#empty-ingredient-row');
+        if (!formsetDiv || !totalFormsInput || !emptyRow) {
             console.error('Required elements not found.');
             return;
         }
         let totalForms = parseInt(totalFormsInput.value, 10);
-        const newForm = emptyForm.cloneNode(true);
-        newForm.style.display = 'block';
+        const newForm = emptyRow.content.firstElementChild.cloneNode(true);
         const formElements = newForm.querySelectorAll('input, select, label');
         formElements.forEach((element) => {
             if (element instanceof HTMLInputElement || element instanceof HTMLSelectElement) {
@@ -169,15 +169,15 @@ export class StepsManager extends BaseFormManager {
         const mainForm = this.htmlModal;
         let formsetDiv = mainForm.querySelector('#steps-formset');
         let totalFormsInput = mainForm.querySelector('#id_steps-TOTAL_FORMS');
-        let emptyForm = mainForm.querySelector('#empty-step-form');
-        if (!formsetDiv || !totalFormsInput || !emptyForm) {
+        // The page hosting the modals carries the empty row once (see handlers/recipe_modals.py)
+        let emptyRow = document.querySelector('#empty-step-row');
+        if (!formsetDiv || !totalFormsInput || !emptyRow) {
             console.error('Required elements not found.');
             return;
         }
         let totalForms = parseInt(totalFormsInput.value, 10);
         // Deep clone to maintain exact structure
-        const newStepForm = emptyForm.cloneNode(true);
-        newStepForm.style.display = 'block';
+        const newStepForm = emptyRow.content.firstElementChild.cloneNode(true);
         // Update form IDs and names
         const formElements = newStepForm.querySelectorAll('input, textarea, label');
         formElements.forEach((element) => {
@@ -0,0 +1,45 @@
+import zlib
+
+from django_redis.compressors.base import BaseCompressor
+from django_redis.exceptions import CompressorError
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+RAW, ZLIB, LZ4 = b'\x00', b'\x01', b'\x02'
+
+
+class ThresholdCompressor(BaseCompressor):
+    """
+    Compressor of the django-redis cache (see settings.CACHES['redis']).
+
+    Only values longer than ``min_length`` are compressed: generations, ids and small cards gain
+    nothing from it and would pay the CPU on every read. They are compressed with lz4 (pinned in
+    requirements.txt); zlib at its fastest level is only the fallback of an environment installed
+    without it. Values are tagged with a one byte prefix, so a zlib value stays readable once lz4 is
+    installed, and values stored before the compressor was set are still read as is.
+    """
+    min_length = 1024
+    zlib_level = 1
+
+    def compress(self, value: bytes) -> bytes:
+        if len(value) <= self.min_length:
+            return RAW + value
+        if lz4 is not None:
+            return LZ4 + lz4.frame.compress(value)
+        return ZLIB + zlib.compress(value, self.zlib_level)
+
+    def decompress(self, value: bytes) -> bytes:
+        tag, data = value[:1], value[1:]
+        try:
+            if tag == RAW:
+                return data
+            if tag == ZLIB:
+                return zlib.decompress(data)
+            if tag == LZ4 and lz4 is not None:
+                return lz4.frame.decompress(data)
+        except Exception as error:
+            raise CompressorError(error) from error
+        raise CompressorError(f'Unknown compression tag {tag!r}')
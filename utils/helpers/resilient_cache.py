@@ -0,0 +1,337 @@
+import os
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django_redis.exceptions import ConnectionInterrupted
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+# What an unreachable or overloaded cache server raises, other errors (pickling for instance) are not outages
+FAILURES = (ConnectionInterrupted, RedisConnectionError, RedisTimeoutError, OSError)
+PROBE_KEY = 'resilient_cache:probe'
+# Keys unlinked per command when the whole cache is flushed
+FLUSH_BATCH = 1000
+
+
+class CircuitBreaker:
+    """
+    Per-process state of a ``ResilientCache``, shared by the backend instances of every thread.
+
+    Closed while the primary cache answers, open after ``failure_threshold`` consecutive failures.
+    While open, a background thread probes the primary every ``probe_interval`` seconds (half-open)
+    and closes the circuit as soon as it answers again. Keys written while open, or whose write failed
+    while closed, are remembered (up to ``max_dirty_keys``, beyond which every key is) so they can be
+    dropped from the primary first.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int, probe_interval: float, max_dirty_keys: int):
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.max_dirty_keys = max_dirty_keys
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self.dirty = set()
+        self.dirty_overflow = False
+        self.prober_pid = None
+        self.lock = threading.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def record_success(self) -> None:
+        if self.failures:
+            with self.lock:
+                self.failures = 0
+
+    def record_failure(self) -> bool:
+        """
+        Counts a failure of the primary, returns True when it trips the circuit.
+        """
+        with self.lock:
+            self.failures += 1
+            if self.state != self.CLOSED or self.failures < self.failure_threshold:
+                return False
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            return True
+
+    def mark_dirty(self, keys) -> None:
+        with self.lock:
+            self._mark_dirty(keys, False)
+
+    def _mark_dirty(self, keys, overflow: bool) -> None:
+        self.dirty_overflow |= overflow
+        if not self.dirty_overflow:
+            self.dirty.update(keys)
+        if self.dirty_overflow or len(self.dirty) > self.max_dirty_keys:
+            self.dirty.clear()
+            self.dirty_overflow = True
+
+    @property
+    def has_dirty(self) -> bool:
+        return bool(self.dirty) or self.dirty_overflow
+
+    def flush_dirty(self, flush) -> bool:
+        """
+        Hands the remembered keys to ``flush(keys, everything)``. Returns False, and keeps them
+        remembered, when ``flush`` fails.
+        """
+        with self.lock:
+            dirty, overflow = self.dirty, self.dirty_overflow
+            self.dirty, self.dirty_overflow = set(), False
+        if not dirty and not overflow:
+            return True
+        try:
+            flush(dirty, overflow)
+        except Exception:
+            with self.lock:
+                self._mark_dirty(dirty, overflow)
+            return False
+        return True
+
+    def try_close(self, flush) -> bool:
+        """
+        Flushes the remembered keys until none are left, then closes the circuit. Returns False,
+        and stays open, when ``flush`` fails.
+        """
+        self.state = self.HALF_OPEN
+        while True:
+            with self.lock:
+                if not self.has_dirty:
+                    self.state, self.failures, self.opened_at = self.CLOSED, 0, None
+                    return True
+            if not self.flush_dirty(flush):
+                with self.lock:
+                    self.state = self.OPEN
+                return False
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips,
+            'open_seconds': round(time.monotonic() - self.opened_at, 1) if self.opened_at else 0,
+            'dirty_keys': len(self.dirty),
+            'dirty_overflow': self.dirty_overflow,
+        }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(alias: str, failure_threshold: int, probe_interval: float, max_dirty_keys: int) -> CircuitBreaker:
+    with _breakers_lock:
+        if alias not in _breakers:
+            _breakers[alias] = CircuitBreaker(failure_threshold, probe_interval, max_dirty_keys)
+        return _breakers[alias]
+
+
+class ResilientCache(BaseCache):
+    """
+    Cache backend turning an outage of another cache alias (the Redis cache) into slower pages
+    instead of failed ones.
+
+    Operations go to the primary alias while its circuit is closed. A failure is answered from a
+    bounded in-process LocMem cache, and ``FAILURE_THRESHOLD`` consecutive failures open the circuit:
+    every operation then uses the local cache at once, without waiting for a timeout, until the
+    background probe finds the primary reachable again (see ``CircuitBreaker``).
+
+    Local values live at most ``FALLBACK_TIMEOUT`` seconds. Each process has its own local cache, so
+    this bounds how long an invalidation made by another process is missed during an outage. Before
+    the circuit closes, the keys written while it was open are deleted from the primary, so values it
+    kept from before the outage (generations, sessions) are not served again. Writes failing while the
+    circuit stays closed are deleted the same way, by the next operation the primary answers.
+
+    Settings::
+
+        'default': {
+            'BACKEND': 'utils.helpers.resilient_cache.ResilientCache',
+            'LOCATION': 'redis',  # alias of the primary cache
+            'OPTIONS': {'FAILURE_THRESHOLD': 5, 'PROBE_INTERVAL': 5, 'FALLBACK_MAX_ENTRIES': 5000,
+                        'FALLBACK_TIMEOUT': 60, 'MAX_DIRTY_KEYS': 10000},
+        }
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.primary_alias = location or 'redis'
+        self.fallback_timeout = options.get('FALLBACK_TIMEOUT', 60)
+        self.breaker = get_breaker(self.primary_alias, options.get('FAILURE_THRESHOLD', 5),
+                                   options.get('PROBE_INTERVAL', 5), options.get('MAX_DIRTY_KEYS', 10000))
+        # LocMem caches of the same name share their storage, so every thread of the process sees it
+        self.fallback = LocMemCache(f'resilient:{self.primary_alias}', {
+            'TIMEOUT': self.fallback_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('FALLBACK_MAX_ENTRIES', 5000)},
+        })
+
+    @property
+    def primary(self) -> BaseCache:
+        return caches[self.primary_alias]
+
+    def redis_client(self, available_only: bool = True):
+        """
+        Redis client of the primary cache, None when it is not a Redis cache or, unless
+        ``available_only`` is False, while the circuit is open.
+        """
+        if available_only and not self.breaker.closed:
+            return None
+        return get_redis_client(self.primary, available_only)
+
+    # Circuit
+
+    def _call(self, operation, fallback, written=()):
+        """
+        Returns ``operation()`` run on the primary while the circuit is closed, ``fallback()`` run on
+        the local cache otherwise or when the primary fails.
+        """
+        if self.breaker.closed:
+            try:
+                result = operation()
+            except FAILURES:
+                if self.breaker.record_failure():
+                    # Whatever is left from a previous outage may have changed since
+                    self.fallback.clear()
+                    self._ensure_prober()
+            else:
+                self.breaker.record_success()
+                if self.breaker.has_dirty:
+                    self.breaker.flush_dirty(self._flush)
+                return result
+        elif self.breaker.prober_pid != os.getpid():
+            # Opened before the worker was forked
+            self._ensure_prober()
+        if written:
+            self.breaker.mark_dirty(written)
+        return fallback()
+
+    def _ensure_prober(self) -> None:
+        with self.breaker.lock:
+            if self.breaker.prober_pid == os.getpid():
+                return
+            self.breaker.prober_pid = os.getpid()
+        threading.Thread(target=self._probe, name='resilient-cache-probe', daemon=True).start()
+
+    def _probe(self) -> None:
+        try:
+            while not self.breaker.closed:
+                time.sleep(self.breaker.probe_interval)
+                try:
+                    self.primary.get(PROBE_KEY)
+                except Exception:
+                    continue
+                self.breaker.try_close(self._flush)
+        finally:
+            self.breaker.prober_pid = None
+
+    def _flush(self, keys, everything: bool) -> None:
+        if not everything:
+            self.primary.delete_many(list(keys))
+            return
+        client = get_redis_client(self.primary, available_only=False)
+        if client is None:
+            # Not a Redis cache, nothing else lives in it
+            self.primary.clear()
+            return
+        # The Redis database is shared (two-tier stats, pub/sub, other clients): FLUSHDB would empty
+        # it, only the keys of the cache go. The filter sets use its prefix and are rebuilt lazily.
+        batch = []
+        for key in client.scan_iter(match=self.primary.make_key('*'), count=FLUSH_BATCH):
+            batch.append(key)
+            if len(batch) == FLUSH_BATCH:
+                client.unlink(*batch)
+                batch = []
+        if batch:
+            client.unlink(*batch)
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.fallback_timeout
+        return min(timeout, self.fallback_timeout)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        return self._call(lambda: self.primary.get(key, default, version=version),
+                          lambda: self.fallback.get(key, default, version=version))
+
+    def get_many(self, keys, version=None):
+        return self._call(lambda: self.primary.get_many(keys, version=version),
+                          lambda: self.fallback.get_many(keys, version=version))
+
+    def has_key(self, key, version=None):
+        return self._call(lambda: self.primary.has_key(key, version=version),
+                          lambda: self.fallback.has_key(key, version=version))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call(lambda: self.primary.set(key, value, timeout, version=version),
+                          lambda: self.fallback.set(key, value, self._local_timeout(timeout), version=version),
+                          written=[key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call(lambda: self.primary.set_many(data, timeout, version=version),
+                          lambda: self.fallback.set_many(data, self._local_timeout(timeout), version=version),
+                          written=list(data))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call(lambda: self.primary.add(key, value, timeout, version=version),
+                          lambda: self.fallback.add(key, value, self._local_timeout(timeout), version=version),
+                          written=[key])
+
+    def incr(self, key, delta=1, version=None):
+        return self._call(lambda: self.primary.incr(key, delta, version=version),
+                          lambda: self.fallback.incr(key, delta, version=version),
+                          written=[key])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call(lambda: self.primary.touch(key, timeout, version=version),
+                          lambda: self.fallback.touch(key, self._local_timeout(timeout), version=version))
+
+    def delete(self, key, version=None):
+        return self._call(lambda: self.primary.delete(key, version=version),
+                          lambda: self.fallback.delete(key, version=version),
+                          written=[key])
+
+    def delete_many(self, keys, version=None):
+        return self._call(lambda: self.primary.delete_many(keys, version=version),
+                          lambda: self.fallback.delete_many(keys, version=version),
+                          written=list(keys))
+
+    def clear(self):
+        self.fallback.clear()
+        if self.breaker.closed:
+            try:
+                return self.primary.clear()
+            except FAILURES:
+                self.breaker.record_failure()
+        with self.breaker.lock:
+            self.breaker._mark_dirty((), True)
+
+    def stats(self) -> dict:
+        return self.breaker.stats()
+
+
+def get_redis_client(backend, available_only: bool = True):
+    """
+    Returns the redis-py client behind a cache backend, or None when it is not a Redis cache
+    (or its circuit is open, unless ``available_only`` is False) or the client cannot be set up.
+    """
+    try:
+        if isinstance(backend, ResilientCache):
+            return backend.redis_client(available_only)
+        if hasattr(backend, '_cache') and hasattr(backend._cache, 'get_client'):
+            return backend._cache.get_client(write=True)
+        if hasattr(backend, 'client') and hasattr(backend.client, 'get_client'):
+            # django-redis
+            return backend.client.get_client(write=True)
+    except Exception:
+        return None
+    return None
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from django.core.cache import cache as default_cache
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.has_result = False
+        self.result = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same cache key, so that only one of them
+    reaches the database.
+
+    Inside a process, callers of a key that is already being computed wait for that call and
+    share its result. Across processes, the first caller takes a short-lived lock with
+    ``cache.add``; the others poll the cache for the value it stores and only compute it
+    themselves if it does not show up within ``wait_timeout`` seconds.
+
+    ``cache`` may also be a callable returning the cache, resolved on every call.
+    """
+
+    def __init__(self, cache=None, lock_timeout=10, wait_timeout=5, poll_interval=0.05):
+        self._cache = cache or default_cache
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    @property
+    def cache(self):
+        return self._cache() if callable(self._cache) else self._cache
+
+    def get_or_compute(self, key: str, compute, timeout=None):
+        """
+        Returns the value computed by ``compute()`` for the key, storing it in the cache
+        for ``timeout`` seconds. The cache must already have been checked by the caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+        if not is_leader:
+            call.done.wait(self.wait_timeout)
+            return call.result if call.has_result else compute()
+        try:
+            call.result = self._compute_across_processes(key, compute, timeout)
+            call.has_result = True
+            return call.result
+        finally:
+            call.done.set()
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _compute_across_processes(self, key, compute, timeout):
+        lock_key = f'{key}:lock'
+        if self.cache.add(lock_key, 1, self.lock_timeout):
+            try:
+                value = compute()
+                self.cache.set(key, value, timeout)
+                return value
+            finally:
+                self.cache.delete(lock_key)
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = self.cache.get(key)
+            if value is not None:
+                return value
+        value = compute()
+        self.cache.set(key, value, timeout)
+        return value
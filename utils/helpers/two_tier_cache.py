@@ -0,0 +1,372 @@
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+from utils.helpers.resilient_cache import get_redis_client
+
+CHANNEL = 'two_tier_cache:invalidate'
+STATS_KEY = 'two_tier_cache:stats'
+CLEAR_ALL = '*'
+
+
+class LocalLRU:
+    """
+    Bounded in-process LRU of pickled values: evicts the least recently used entries until the
+    total size of the pickles fits in ``max_bytes``. Values are stored pickled, so callers never
+    share (and mutate) the same object across requests.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+        Returns the pickled value, or None when missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes, ttl: float) -> None:
+        with self._lock:
+            self._drop(key)
+            if len(data) > self.max_item_bytes or ttl <= 0:
+                return
+            self._entries[key] = (time.monotonic() + ttl, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def delete(self, keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ProcessTier:
+    """
+    State shared by every thread of a process: Django creates one cache backend instance per thread,
+    but the local tier, its listener and its counters must exist once per process.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.local = LocalLRU(max_bytes, max_item_bytes)
+        self.origin = uuid.uuid4().hex
+        self.counters = Counter()
+        self.flushed = Counter()
+        self.listener_pid = None
+        self.lock = threading.Lock()
+
+
+_process_tiers = {}
+_process_tiers_lock = threading.Lock()
+
+
+def get_process_tier(alias: str, max_bytes: int, max_item_bytes: int) -> ProcessTier:
+    with _process_tiers_lock:
+        if alias not in _process_tiers:
+            _process_tiers[alias] = ProcessTier(max_bytes, max_item_bytes)
+        return _process_tiers[alias]
+
+
+class TwoTierCache(BaseCache):
+    """
+    Cache backend serving hot keys from a per-process LRU (first tier) in front of another cache
+    alias, normally the Redis ``default`` cache (second tier).
+
+    Every write or delete goes to the second tier, then is broadcast on a Redis pub/sub channel:
+    a listener thread in every process drops its local copy of the keys as soon as the message
+    arrives. Local copies also expire after ``LOCAL_TIMEOUT`` seconds, which bounds staleness if a
+    message is lost; the local tier is cleared whenever the listener reconnects.
+
+    Settings::
+
+        'two_tier': {
+            'BACKEND': 'utils.helpers.two_tier_cache.TwoTierCache',
+            'LOCATION': 'default',  # alias of the second tier
+            'OPTIONS': {'MAX_BYTES': 32 * 1024 * 1024, 'MAX_ITEM_BYTES': 1024 * 1024, 'LOCAL_TIMEOUT': 60},
+        }
+
+    Without Redis behind it (tests, local development on LocMemCache) there is no broadcast,
+    so the local tier is only safe with a single process.
+    """
+    # Seconds between two flushes of the hit counters to the shared stats hash
+    stats_interval = 10
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.remote_alias = location or 'default'
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self.tier = get_process_tier(self.remote_alias, options.get('MAX_BYTES', 32 * 1024 * 1024),
+                                     options.get('MAX_ITEM_BYTES', 1024 * 1024))
+        self.local = self.tier.local
+        self.counters = self.tier.counters
+
+    @property
+    def remote(self) -> BaseCache:
+        return caches[self.remote_alias]
+
+    def redis_client(self, available_only: bool = True):
+        """
+        Redis client of the second tier, or None when it is not a Redis cache (or is unavailable,
+        see ``ResilientCache``).
+        """
+        return get_redis_client(self.remote, available_only)
+
+    # Local tier
+
+    def _local_ttl(self, timeout) -> float:
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.remote.default_timeout
+        return self.local_timeout if timeout is None else min(self.local_timeout, timeout)
+
+    def _remember(self, key: str, value, timeout=DEFAULT_TIMEOUT) -> None:
+        try:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        self.local.set(key, data, self._local_ttl(timeout))
+
+    def _recall(self, key: str):
+        data = self.local.get(key)
+        return None if data is None else pickle.loads(data)
+
+    # Invalidation broadcast
+
+    def _ensure_listener(self) -> None:
+        # Started lazily in every worker: threads do not survive the fork of a preloading server
+        if self.tier.listener_pid == os.getpid():
+            return
+        with self.tier.lock:
+            if self.tier.listener_pid == os.getpid():
+                return
+            self.tier.listener_pid = os.getpid()
+            self.local.clear()
+            if self.redis_client(available_only=False) is not None:
+                # While Redis is down the listener retries every second
+                threading.Thread(target=self._listen, name='two-tier-cache-listener', daemon=True).start()
+
+    def _publish(self, keys: list) -> None:
+        client = self.redis_client()
+        if client is None:
+            return
+        try:
+            client.publish(CHANNEL, json.dumps({'origin': self.tier.origin, 'keys': keys}))
+        except Exception:
+            # The other workers drop their copy when it expires locally
+            pass
+
+    def _listen(self) -> None:
+        flushed_at = time.monotonic()
+        while True:
+            try:
+                pubsub = self.redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Messages may have been missed while disconnected
+                self.local.clear()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._handle_message(message['data'])
+                    if time.monotonic() - flushed_at >= self.stats_interval:
+                        self.flush_stats()
+                        flushed_at = time.monotonic()
+            except Exception:
+                time.sleep(1)
+
+    def _handle_message(self, data) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get('origin') == self.tier.origin:
+            return
+        keys = message.get('keys', [])
+        if CLEAR_ALL in keys:
+            self.local.clear()
+        else:
+            self.local.delete(keys)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        self._ensure_listener()
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._recall(local_key)
+        if value is not None:
+            self.counters['local_hits'] += 1
+            return value
+        value = self.remote.get(key, version=version)
+        if value is None:
+            self.counters['misses'] += 1
+            return default
+        self.counters['remote_hits'] += 1
+        self._remember(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._ensure_listener()
+        found, missing = {}, []
+        for key in keys:
+            value = self._recall(self.make_and_validate_key(key, version=version))
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        self.counters['local_hits'] += len(found)
+        if missing:
+            remote_values = self.remote.get_many(missing, version=version)
+            for key, value in remote_values.items():
+                self._remember(self.make_and_validate_key(key, version=version), value)
+            found.update(remote_values)
+            self.counters['remote_hits'] += len(remote_values)
+            self.counters['misses'] += len(missing) - len(remote_values)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        local_key = self.make_and_validate_key(key, version=version)
+        self.remote.set(key, value, timeout, version=version)
+        self._remember(local_key, value, timeout)
+        self._publish([local_key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        failed = self.remote.set_many(data, timeout, version=version)
+        local_keys = []
+        for key, value in data.items():
+            local_key = self.make_and_validate_key(key, version=version)
+            local_keys.append(local_key)
+            if key not in failed:
+                self._remember(local_key, value, timeout)
+        self._publish(local_keys)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        added = self.remote.add(key, value, timeout, version=version)
+        if added:
+            local_key = self.make_and_validate_key(key, version=version)
+            self._remember(local_key, value, timeout)
+            self._publish([local_key])
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        self._ensure_listener()
+        value = self.remote.incr(key, delta, version=version)
+        local_key = self.make_and_validate_key(key, version=version)
+        self.local.delete([local_key])
+        self._publish([local_key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.touch(key, timeout, version=version)
+
+    def has_key(self, key, version=None):
+        return self.local.get(self.make_and_validate_key(key, version=version)) is not None \
+            or self.remote.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self._ensure_listener()
+        local_key = self.make_and_validate_key(key, version=version)
+        self.local.delete([local_key])
+        deleted = self.remote.delete(key, version=version)
+        self._publish([local_key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        self._ensure_listener()
+        local_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        self.local.delete(local_keys)
+        self.remote.delete_many(keys, version=version)
+        self._publish(local_keys)
+
+    def clear(self):
+        self.local.clear()
+        self.remote.clear()
+        self._publish([CLEAR_ALL])
+
+    # Hit ratios
+
+    def stats(self) -> dict:
+        """
+        Hit counts and ratios of both tiers in this process.
+        """
+        return dict(describe_counters(self.counters), local_entries=len(self.local), local_bytes=self.local.size)
+
+    def flush_stats(self) -> None:
+        """
+        Adds the counts since the last flush to the stats hash shared by every process.
+        """
+        client = self.redis_client()
+        # Request threads count without the lock: subtracting from the live counters could see
+        # them change size mid-iteration, and the listener calling this would reconnect
+        with self.tier.lock:
+            delta = Counter(dict(self.counters)) - self.tier.flushed
+        if client is None or not delta:
+            return
+        pipeline = client.pipeline()
+        for name, count in delta.items():
+            pipeline.hincrby(STATS_KEY, name, count)
+        pipeline.execute()
+        with self.tier.lock:
+            self.tier.flushed.update(delta)
+
+    def shared_stats(self) -> dict:
+        """
+        Hit counts and ratios of every process, as of their last flush.
+        """
+        client = self.redis_client()
+        if client is None:
+            return {}
+        try:
+            counts = Counter({name.decode(): int(count) for name, count in client.hgetall(STATS_KEY).items()})
+        except Exception:
+            return {}
+        return describe_counters(counts)
+
+
+def describe_counters(counters: Counter) -> dict:
+    lookups = counters['local_hits'] + counters['remote_hits'] + counters['misses']
+    return {
+        'lookups': lookups,
+        'local_hits': counters['local_hits'],
+        'remote_hits': counters['remote_hits'],
+        'misses': counters['misses'],
+        # Share of all lookups served by the local tier, and of the local misses served by Redis
+        'local_hit_ratio': counters['local_hits'] / lookups if lookups else 0.0,
+        'remote_hit_ratio': counters['remote_hits'] / (lookups - counters['local_hits'])
+        if lookups > counters['local_hits'] else 0.0,
+    }
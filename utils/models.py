@@ -1,7 +1,7 @@
 from django.db import models
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.core.files.storage import default_storage
-from PIL import Image, ExifTags
+from PIL import ExifTags, Image, ImageOps
 from pillow_heif import register_heif_opener
 from io import BytesIO
 import os
@@ -22,18 +22,20 @@ class AbstractImageModel(models.Model): #
     def create_thumbnail(self, folder, image_name, size=(600, 600)):
         if not self.picture:
             return
+        with self.picture.open('rb'):
+            pipeline = ImagePipeline(self.picture, max_size=size)
+        return self.save_thumbnail(pipeline, folder, image_name, size)
+
+    def save_thumbnail(self, pipeline, folder, image_name, size=(600, 600)):
+        """
+        Stores the thumbnail of an already decoded picture, see ImagePipeline.
+        """
         image_name = image_name.split('/')[1]
-        self.picture.seek(0)
-        img = Image.open(self.picture)
-        img = ImageHandler.fix_image_orientation(img)
-        img.thumbnail(size)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        buffer = BytesIO()
-        img.save(buffer, format='JPEG', quality=90)
-        buffer.seek(0)
         thumb_name = f'{folder}/{image_name}'
-        default_storage.save(thumb_name, ContentFile(buffer.read()))
+        # Saving over an existing file would store it under another name than get_thumbnail_url expects
+        if default_storage.exists(thumb_name):
+            default_storage.delete(thumb_name)
+        default_storage.save(thumb_name, pipeline.encode(thumb_name, size, quality=90))
         return thumb_name
 
     def get_thumbnail_url(self, folder):
@@ -50,46 +52,52 @@ class AbstractImageModel(models.Model): #
         # If a new image is being uploaded, rename it to a user-friendly name
         super().save(*args, **kwargs)
 
+class ImagePipeline:
+    """
+    Decodes an image once and encodes every output (converted original, thumbnails) from that frame.
+
+    ``max_size`` is the largest output needed, JPEG sources are then decoded in draft mode: the
+    decoder scales by 1/2, 1/4 or 1/8 while decoding, which is several times faster than a full
+    decode followed by a resize. The EXIF orientation is applied once, to the decoded frame.
+    """
+    # EXIF orientations rotating the picture by 90 degrees
+    TRANSPOSED = (5, 6, 7, 8)
+
+    def __init__(self, source, max_size=None):
+        image = Image.open(source)
+        transposed = image.getexif().get(ExifTags.Base.Orientation) in self.TRANSPOSED
+        # Size of the picture as shown, the frame may be decoded at a smaller scale
+        self.size = image.size[::-1] if transposed else image.size
+        if max_size and image.format == 'JPEG':
+            image.draft('RGB', max_size[::-1] if transposed else max_size)
+        image.load()
+        ImageOps.exif_transpose(image, in_place=True)
+        self.frame = image if image.mode == 'RGB' else image.convert('RGB')
+
+    def encode(self, name, size=None, format='JPEG', **options) -> File:
+        """
+        Returns the frame, scaled down to fit ``size``, encoded as a file ready for a storage.
+        The encoded buffer is handed over as is, without copying it into bytes.
+        """
+        frame = self.frame
+        if size and (frame.width > size[0] or frame.height > size[1]):
+            ratio = min(size[0] / frame.width, size[1] / frame.height)
+            target = (max(1, round(frame.width * ratio)), max(1, round(frame.height * ratio)))
+            # Same resampling as Image.thumbnail
+            frame = frame.resize(target, Image.Resampling.BICUBIC, reducing_gap=2.0)
+        buffer = BytesIO()
+        frame.save(buffer, format=format, **options)
+        buffer.seek(0)
+        output = File(buffer, name=name)
+        with buffer.getbuffer() as view:
+            output.size = view.nbytes
+        return output
+
+
 class ImageHandler():
     def __init__(self, image):
         self.image = image
 
-    @staticmethod
-    def convert_to_jpeg(image: models.ImageField) -> ContentFile:
-        """
-        Convert an image from HEIC to JPEG format.
-        """
-        try:
-            img = Image.open(image)
-            img = img.convert('RGB')
-            buffer = BytesIO()
-            img.save(buffer, format='JPEG', quality=95)
-            buffer.seek(0)
-            pic_name = image.name.rsplit('.', 1)[0] + '.jpg'
-            return ContentFile(buffer.read(), name=pic_name)
-        except Exception as e:
-            print(f'Error converting image: {e}')
-            return None
-        
-    @staticmethod
-    def fix_image_orientation(img):
-        try:
-            for orientation in ExifTags.TAGS.keys():
-                if ExifTags.TAGS[orientation] == 'Orientation':
-                    break
-            exif = img._getexif()
-            if exif is not None:
-                orientation_value = exif.get(orientation, None)
-                if orientation_value == 3:
-                    img = img.rotate(180, expand=True)
-                elif orientation_value == 6:
-                    img = img.rotate(270, expand=True)
-                elif orientation_value == 8:
-                    img = img.rotate(90, expand=True)
-        except Exception as e:
-            print(f'Error fixing orientation: {e}')
-        return img
-    
     @staticmethod
     def slugify_name(name):
         new_name = str(name)
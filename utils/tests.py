@@ -1,3 +1,240 @@
-from django.test import TestCase
+import json
+import os
+import time
+import zlib
+from io import BytesIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from PIL import ExifTags, Image
+
+from utils.helpers.redis_compressors import ThresholdCompressor, LZ4, ZLIB
+from utils.helpers.resilient_cache import CircuitBreaker
+from utils.helpers.two_tier_cache import LocalLRU, CHANNEL
+from utils.models import ImagePipeline
+
+TWO_TIER_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'two_tier': {'BACKEND': 'utils.helpers.two_tier_cache.TwoTierCache', 'LOCATION': 'default'},
+}
+
+
+class LocalLRUTestCase(SimpleTestCase):
+
+    def test_evicts_least_recently_used_by_size(self):
+        lru = LocalLRU(max_bytes=10, max_item_bytes=8)
+        lru.set('a', b'1234', 60)
+        lru.set('b', b'1234', 60)
+        lru.get('a')
+        lru.set('c', b'1234', 60)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (b'1234', None, b'1234'))
+        self.assertEqual(lru.size, 8)
+        lru.set('d', b'123456789', 60)
+        self.assertIsNone(lru.get('d'))
+
+    def test_expired_entries_are_dropped(self):
+        lru = LocalLRU(max_bytes=10, max_item_bytes=10)
+        lru.set('a', b'1', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.size, 0)
+
+
+@override_settings(CACHES=TWO_TIER_CACHES)
+class TwoTierCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = caches['two_tier']
+        self.cache.clear()
+        self.cache.counters.clear()
+
+    def test_second_read_is_served_locally(self):
+        caches['default'].set('recipe', {'title': 'Bread'})
+        self.assertEqual(self.cache.get('recipe'), {'title': 'Bread'})
+        caches['default'].delete('recipe')
+        self.assertEqual(self.cache.get('recipe'), {'title': 'Bread'})
+        stats = self.cache.stats()
+        self.assertEqual((stats['local_hits'], stats['remote_hits'], stats['misses']), (1, 1, 0))
+        self.assertEqual(stats['local_hit_ratio'], 0.5)
+
+    def test_local_copies_are_not_shared(self):
+        self.cache.set('ids', [1, 2])
+        self.cache.get('ids').append(3)
+        self.assertEqual(self.cache.get('ids'), [1, 2])
+
+    def test_writes_and_broadcasts_drop_local_copies(self):
+        self.cache.set('generation', 1)
+        self.cache.incr('generation')
+        self.assertEqual(self.cache.get('generation'), 2)
+        self.cache.tier.local.set(self.cache.make_key('other'), b'stale', 60)
+        self.cache._handle_message(json.dumps({'origin': 'another worker', 'keys': [self.cache.make_key('other')]}))
+        self.assertIsNone(self.cache.local.get(self.cache.make_key('other')))
+
+
+@skipUnless(os.getenv('REDIS_URL'), 'needs a Redis server (REDIS_URL)')
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.getenv('REDIS_URL'),
+                'KEY_PREFIX': 'test'},
+    'two_tier': {'BACKEND': 'utils.helpers.two_tier_cache.TwoTierCache', 'LOCATION': 'default'},
+})
+class TwoTierCachePubSubTestCase(SimpleTestCase):
+
+    def test_other_workers_invalidations_drop_the_local_copy(self):
+        cache = caches['two_tier']
+        cache.get('warm up')
+        # Wait for the listener to subscribe (which clears the local tier)
+        time.sleep(0.5)
+        cache.set('recipe', 'Bread')
+        key = cache.make_key('recipe')
+        self.assertIsNotNone(cache.local.get(key))
+        cache.redis_client().publish(CHANNEL, json.dumps({'origin': 'another worker', 'keys': [key]}))
+        deadline = time.monotonic() + 3
+        while cache.local.get(key) is not None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIsNone(cache.local.get(key))
+        self.assertEqual(cache.get('recipe'), 'Bread')
+        cache.delete('recipe')
+
+
+class ThresholdCompressorTestCase(SimpleTestCase):
+
+    def test_only_large_values_are_compressed(self):
+        compressor = ThresholdCompressor(options={})
+        small, large = b'x' * 100, b'x' * 10_000
+        self.assertEqual(len(compressor.compress(small)), len(small) + 1)
+        self.assertLess(len(compressor.compress(large)), 1000)
+        for value in (small, large):
+            self.assertEqual(compressor.decompress(compressor.compress(value)), value)
+
+    def test_lz4_is_used_and_zlib_values_stay_readable(self):
+        compressor = ThresholdCompressor(options={})
+        large = b'x' * 10_000
+        self.assertEqual(compressor.compress(large)[:1], LZ4)
+        self.assertEqual(compressor.decompress(ZLIB + zlib.compress(large)), large)
+
+
+def resilient_caches(primary: dict) -> dict:
+    return {
+        'redis': primary,
+        'default': {'BACKEND': 'utils.helpers.resilient_cache.ResilientCache', 'LOCATION': 'redis'},
+    }
+
+
+class ResilientCacheTestCase(SimpleTestCase):
+
+    def get_cache(self, max_dirty_keys=100):
+        cache = caches['default']
+        cache.breaker = CircuitBreaker(failure_threshold=2, probe_interval=60, max_dirty_keys=max_dirty_keys)
+        # Probed by the tests themselves
+        cache.breaker.prober_pid = os.getpid()
+        cache.fallback.clear()
+        return cache
+
+    # Nothing listens on port 1
+    @override_settings(CACHES=resilient_caches({'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                'LOCATION': 'redis://127.0.0.1:1'}))
+    def test_outage_opens_the_circuit_and_serves_the_local_cache(self):
+        cache = self.get_cache()
+        cache.set('recipe', 'Bread')
+        self.assertEqual(cache.get('recipe'), None)
+        self.assertEqual(cache.breaker.state, CircuitBreaker.OPEN)
+        cache.set('recipe', 'Bread')
+        self.assertEqual(cache.get('recipe'), 'Bread')
+        self.assertTrue(cache.add('lock', 1))
+        self.assertEqual(cache.get_many(['recipe', 'lock']), {'recipe': 'Bread', 'lock': 1})
+        self.assertIsNone(cache.redis_client())
+        self.assertEqual(cache.breaker.dirty, {'recipe', 'lock'})
+
+    @override_settings(CACHES=resilient_caches({'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                'LOCATION': 'resilient primary'}))
+    def test_recovery_drops_the_keys_written_during_the_outage(self):
+        cache = self.get_cache()
+        caches['redis'].set_many({'generation': 1, 'untouched': 1})
+        cache.breaker.record_failure()
+        cache.breaker.record_failure()
+        cache.set('generation', 2)
+        self.assertEqual(cache.get('generation'), 2)
+        self.assertEqual(caches['redis'].get('generation'), 1)
+        self.assertTrue(cache.breaker.try_close(cache._flush))
+        self.assertTrue(cache.breaker.closed)
+        self.assertIsNone(cache.get('generation'))
+        self.assertEqual(cache.get('untouched'), 1)
+
+    @override_settings(CACHES=resilient_caches({'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                'LOCATION': 'resilient primary'}))
+    def test_too_many_keys_written_during_the_outage_clear_the_primary(self):
+        cache = self.get_cache(max_dirty_keys=2)
+        caches['redis'].set('untouched', 1)
+        cache.breaker.record_failure()
+        cache.breaker.record_failure()
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertTrue(cache.breaker.dirty_overflow)
+        self.assertTrue(cache.breaker.try_close(cache._flush))
+        self.assertIsNone(cache.get('untouched'))
+
+    @override_settings(CACHES=resilient_caches({'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                'LOCATION': 'resilient primary'}))
+    def test_failed_writes_while_closed_are_dropped_once_the_primary_answers(self):
+        cache = self.get_cache()
+        caches['redis'].set('generation', 1)
+        with mock.patch.object(caches['redis'], 'delete', side_effect=OSError):
+            cache.delete('generation')
+        self.assertTrue(cache.breaker.closed)
+        self.assertEqual(cache.breaker.dirty, {'generation'})
+        self.assertIsNone(cache.get('untouched'))
+        self.assertFalse(cache.breaker.has_dirty)
+        self.assertIsNone(cache.get('generation'))
+
+
+@skipUnless(os.getenv('REDIS_URL'), 'needs a Redis server (REDIS_URL)')
+class ResilientCacheRedisTestCase(SimpleTestCase):
+
+    @override_settings(CACHES=resilient_caches({'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                'LOCATION': os.getenv('REDIS_URL'), 'KEY_PREFIX': 'test'}))
+    def test_flushing_every_key_keeps_the_rest_of_the_database(self):
+        cache = caches['default']
+        cache.breaker = CircuitBreaker(failure_threshold=2, probe_interval=60, max_dirty_keys=2)
+        cache.breaker.prober_pid = os.getpid()
+        client = cache.redis_client()
+        client.hset('two_tier_cache:stats', 'misses', 1)
+        caches['redis'].set('untouched', 1)
+        cache.breaker.record_failure()
+        cache.breaker.record_failure()
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertTrue(cache.breaker.try_close(cache._flush))
+        self.assertIsNone(cache.get('untouched'))
+        self.assertEqual(client.hget('two_tier_cache:stats', 'misses'), b'1')
+        client.delete('two_tier_cache:stats')
+
+
+class ImagePipelineTestCase(SimpleTestCase):
+
+    def jpeg(self, size, orientation=1):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = orientation
+        buffer = BytesIO()
+        Image.new('RGB', size, (90, 140, 60)).save(buffer, format='JPEG', exif=exif)
+        buffer.seek(0)
+        return buffer
+
+    def test_jpeg_is_draft_decoded_and_oriented_once(self):
+        # Rotated by 90 degrees: stored landscape, shown portrait
+        pipeline = ImagePipeline(self.jpeg((4000, 3000), orientation=6), max_size=(600, 600))
+        # Decoded at 1/4 scale, the smallest reduction still covering the thumbnail
+        self.assertEqual(pipeline.frame.size, (750, 1000))
+        # The size of the picture itself, as shown
+        self.assertEqual(pipeline.size, (3000, 4000))
+        thumbnail = pipeline.encode('thumb.jpg', (600, 600))
+        self.assertEqual(thumbnail.size, len(thumbnail.read()))
+        thumbnail.seek(0)
+        self.assertEqual(Image.open(thumbnail).size, (450, 600))
+
+    def test_outputs_share_one_frame(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (1200, 800), (200, 80, 40, 128)).save(buffer, format='PNG')
+        pipeline = ImagePipeline(buffer)
+        self.assertEqual(pipeline.frame.mode, 'RGB')
+        original = pipeline.encode('photo.jpg', quality=95)
+        self.assertEqual(Image.open(original).size, (1200, 800))
+        self.assertEqual(Image.open(pipeline.encode('thumb.jpg', (600, 600))).size, (600, 400))
@@ -1,3 +1,30 @@
+from django.conf import settings
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.core.cache import caches
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views import View
 
-# Create your views here.
+from utils.helpers.resilient_cache import ResilientCache
+from utils.helpers.two_tier_cache import TwoTierCache
+
+
+class CacheStatsView(UserPassesTestMixin, View):
+    """
+    Staff only: hit ratios of the local and Redis tiers of the two-tier caches,
+    for the worker serving the request and for all workers, and the circuit state
+    of the resilient caches in this worker.
+    """
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        stats = {}
+        for alias in settings.CACHES:
+            cache = caches[alias]
+            if isinstance(cache, TwoTierCache):
+                stats[alias] = {'worker': cache.stats(), 'all_workers': cache.shared_stats()}
+            elif isinstance(cache, ResilientCache):
+                stats[alias] = {'circuit': cache.stats()}
+        return JsonResponse(stats)